@@ -3,10 +3,12 @@ from agents.market_analyst_agent import MarketAnalystAgent
 from agents.news_sentiment_agent import NewsSentimentAgent
 from agents.risk_management_agent import RiskManagementAgent
 from agents.execution_agent import ExecutionAgent
+from agents.orchestrator_agent import OrchestratorAgent
 
 __all__ = [
     "MarketAnalystAgent",
     "NewsSentimentAgent",
     "RiskManagementAgent",
-    "ExecutionAgent"
+    "ExecutionAgent",
+    "OrchestratorAgent"
 ]
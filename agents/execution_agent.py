@@ -2,13 +2,49 @@
 Execution Agent
 Makes final buy/sell/hold decisions and simulates trade execution.
 """
-from typing import Dict, Any, List
-from openai import OpenAI
-from core.base_agent import BaseAgent, AgentRole, AgentDecision
+from typing import Dict, Any, List, Optional, Set
+from core.base_agent import BaseAgent, AgentRole, AgentDecision, SharedMemory
+from core.llm_client import AsyncLLMClient, get_llm_client, completed_json_fields, is_reasoning_model
+from core.llm_schemas import ExecutionLLMResult, response_format, text_format
 from tools.tool_registry import ToolRegistry
 from config import get_settings
 from datetime import datetime
-import json
+import asyncio
+import textwrap
+
+
+# Static instructions and decision rules, built once; only the agent inputs
+# vary per call, which also keeps the prompt prefix cacheable server-side
+SYSTEM_PROMPT = textwrap.dedent("""
+    You are an active trading execution agent. The Market Analyst is your PRIMARY signal source - trust its BUY/SELL recommendations when confidence >0.55. News and Risk being 'hold' usually means neutral/approved, not negative. Make decisive trades when Market Analyst is confident.
+    
+    DECISION RULES (Market Analyst is PRIMARY - trust it when confident):
+    1. If Market Analyst = BUY with confidence >=0.65 AND Risk does NOT reject → BUY with quantity >=10
+    2. If Market Analyst = SELL with confidence >=0.65 AND you have position → SELL with quantity >0
+    3. If Market Analyst = BUY with confidence >=0.55 AND sentiment is not negative AND Risk does NOT reject → BUY with quantity >=5
+    4. If Market Analyst = SELL with confidence >=0.55 AND you have position → SELL with quantity >0
+    5. Only HOLD if Market Analyst confidence <0.55 OR Risk explicitly rejects OR signals strongly conflict
+    
+    Quantity Rules:
+    - BUY: Use the Recommended Quantity as base, minimum 5 shares, maximum 100 shares or the Recommended Quantity
+    - SELL: If you have position, sell the Recommended Quantity or all if closing position
+    
+    Provide:
+    1. Final decision: "buy", "sell", or "hold" (prefer buy/sell when analyst is confident)
+    2. Quantity: positive integer if buy/sell (minimum 5 for buy), 0 if hold
+    3. Rationale: brief explanation (2 sentences)
+    4. Confidence: 0.0-1.0
+""").strip()
+
+PROMPT_TEMPLATE = textwrap.dedent("""
+    Agent Inputs:
+    - Market Analyst: {analyst} (confidence: {analyst_conf:.2f}) - PRIMARY SIGNAL
+    - News Sentiment: {sentiment} (confidence: {sentiment_conf:.2f}) - SECONDARY (often neutral)
+    - Risk Manager: {risk} (confidence: {risk_conf:.2f}) - VALIDATION ONLY
+    - Current Price: ${price:.2f}
+    - Recommended Quantity: {quantity} shares
+    - Portfolio Value: ${portfolio_value:,.2f}
+""").strip()
 
 
 class ExecutionAgent(BaseAgent):
@@ -17,7 +53,12 @@ class ExecutionAgent(BaseAgent):
     Synthesizes inputs from other agents and executes paper trades.
     """
     
-    def __init__(self, tool_registry: ToolRegistry, shared_memory: Dict[str, Any] = None):
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        shared_memory: SharedMemory = None,
+        llm_client: Optional[AsyncLLMClient] = None
+    ):
         super().__init__(
             agent_id="execution_001",
             role=AgentRole.EXECUTION,
@@ -27,43 +68,126 @@ class ExecutionAgent(BaseAgent):
         )
         self.tool_registry = tool_registry
         self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        self.client = llm_client or get_llm_client()
         self.model = self.settings.openai_model
+        self._default_symbol = self.settings.default_tickers[0]
+        self._paper_trading = self.settings.paper_trading
+        # Trades started from a streamed decision; referenced until they are recorded and logged
+        self._trades_in_flight: Set[asyncio.Task] = set()
     
     async def reason(self, context: Dict[str, Any]) -> AgentDecision:
         """
         Synthesize decisions from other agents and execute trades.
         This is the final decision-making agent that coordinates execution.
         """
-        symbols = context.get("symbols", self.settings.default_tickers)
-        symbol = symbols[0] if symbols else self.settings.default_tickers[0]
+        inputs = await self._gather_inputs(context)
+        
+        # Speculatively fetch the current position while the LLM is thinking;
+        # it is only needed (to size a sell) if the decision is not hold
+        inputs["position_prefetch"] = asyncio.create_task(
+            self.tool_registry.call_tool_cached_result("risk_portfolio.get_position_info", symbol=inputs["symbol"])
+        )
+        
+        # Stream the reply so the trade starts as soon as decision and quantity
+        # are complete, while the model is still writing the rationale
+        trade_task = None
+        streamed = {}
+        try:
+            result_text = ""
+            async for event in self.client.response_stream(**self._response_request(inputs)):
+                if event.type == "response.completed":
+                    inputs["response_id"] = event.response.id
+                if event.type != "response.output_text.delta":
+                    continue
+                result_text += event.delta
+                if trade_task is None:
+                    fields = completed_json_fields(result_text, ("decision", "quantity"))
+                    if len(fields) == 2:
+                        streamed = {"decision": str(fields["decision"]).lower(), "quantity": int(fields["quantity"])}
+                        trade_task = self._keep_trade(asyncio.create_task(
+                            self._execute_trade(inputs, streamed["decision"], streamed["quantity"])
+                        ))
+            llm_result = self._parse_llm_result(result_text)
+        except asyncio.CancelledError:
+            # Round cancelled mid-stream: a recorded trade is still recorded and logged
+            trade_task = self._settle_streamed_trade(inputs, trade_task)
+            if trade_task is not None:
+                self._keep_trade(asyncio.create_task(self._finalize(
+                    inputs, self._streamed_result(streamed, "round cancelled"), trade_task
+                )))
+            raise
+        except Exception as e:
+            llm_result = self._error_result(e)
+            trade_task = self._settle_streamed_trade(inputs, trade_task)
+            if trade_task is not None:
+                llm_result = self._streamed_result(streamed, e)
+        
+        if trade_task is None:
+            return await self._finalize(inputs, llm_result, None)
+        # Once a trade is under way, finish recording it even if the round is cancelled meanwhile
+        return await asyncio.shield(self._keep_trade(asyncio.create_task(
+            self._finalize(inputs, llm_result, trade_task)
+        )))
+    
+    def _keep_trade(self, task: asyncio.Task) -> asyncio.Task:
+        """Hold a reference to a trade task until it finishes."""
+        self._trades_in_flight.add(task)
+        task.add_done_callback(self._trades_in_flight.discard)
+        return task
+    
+    @staticmethod
+    def _settle_streamed_trade(inputs: Dict[str, Any], trade_task: Optional[asyncio.Task]) -> Optional[asyncio.Task]:
+        """
+        After a failed or cancelled stream, cancel a started trade that has not reached record_trade.
+        Returns the task if the trade is being (or was) recorded, else None.
+        """
+        if trade_task is None or inputs.get("trade_submitted"):
+            return trade_task
+        trade_task.cancel()
+        return None
+    
+    @staticmethod
+    def _streamed_result(streamed: Dict[str, Any], error: Any) -> Dict[str, Any]:
+        """LLM result for a trade executed from streamed fields when the rest of the reply failed."""
+        return {
+            **streamed,
+            "rationale": f"Executed from the streamed decision; the rest of the reply failed: {error}",
+            "confidence": 0.0
+        }
+    
+    async def reason_batch(self, contexts: List[Dict[str, Any]]) -> List[AgentDecision]:
+        """Synthesize and execute several contexts, via the OpenAI Batch API when enabled."""
+        if self.settings.use_batch_api and len(contexts) > 1:
+            return await self._reason_batch_llm(contexts, self.settings.batch_poll_interval_seconds)
+        return await super().reason_batch(contexts)
+    
+    async def _gather_inputs(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather price, portfolio, position size and the other agents' decisions."""
+        symbol = (context.get("symbols") or [self._default_symbol])[0]
         
-        # Get latest price
-        price_result = await self.tool_registry.call_tool("market_data.get_latest_price", symbol=symbol)
-        price_data = price_result.get("result", {}) if price_result.get("success") else {}
+        # Get latest price and portfolio state (independent, fetched concurrently)
+        price_data, portfolio_data = await self.tool_registry.call_tools_batch_results([
+            ("market_data.get_latest_price", {"symbol": symbol}),
+            ("risk_portfolio.get_portfolio_value", {})
+        ], cached=True)
         current_price = price_data.get("price", 0)
         
         # Gather decisions from shared memory (set by other agents in previous round)
         # In practice, this would come from agent messages
-        analyst_decision = context.get("analyst_decision", {})
-        sentiment_decision = context.get("sentiment_decision", {})
-        risk_decision = context.get("risk_decision", {})
+        analyst_decision = self._decision_summary(context.get("analyst_decision"))
+        sentiment_decision = self._decision_summary(context.get("sentiment_decision"))
+        risk_decision = self._decision_summary(context.get("risk_decision"))
         
         # Get market sentiment from shared memory
-        news_sentiment = self.shared_memory.get("news_sentiment", {}).get(symbol, {})
-        
-        # Get portfolio state
-        portfolio_result = await self.tool_registry.call_tool("risk_portfolio.get_portfolio_value")
-        portfolio_data = portfolio_result.get("result", {}) if portfolio_result.get("success") else {}
+        news_sentiment = self.shared_memory().get("news_sentiment", {}).get(symbol, {})
         
         # Calculate position size if buying
-        position_size_result = await self.tool_registry.call_tool(
+        position_size_data = await self.tool_registry.call_tool_result(
             "risk_portfolio.calculate_position_size",
             symbol=symbol,
             entry_price=current_price,
             stop_loss=current_price * 0.95  # 5% stop loss
         )
-        position_size_data = position_size_result.get("result", {}) if position_size_result.get("success") else {}
         recommended_quantity = position_size_data.get("recommended_quantity", 0)
         
         # Synthesize decision using LLM
@@ -79,103 +203,157 @@ class ExecutionAgent(BaseAgent):
             "news_sentiment": news_sentiment.get("sentiment", "neutral"),
             "recommended_quantity": recommended_quantity,
             "portfolio_value": portfolio_data.get("total_value", 0),
-            "paper_trading": self.settings.paper_trading
+            "paper_trading": self._paper_trading
         }
         
-        # Extract decision values
-        analyst_decision_val = analyst_decision.get('decision', 'hold').lower()
-        analyst_conf = analyst_decision.get('confidence', 0.5)
-        sentiment_decision_val = sentiment_decision.get('decision', 'hold').lower()
-        sentiment_conf = sentiment_decision.get('confidence', 0.5)
-        risk_decision_val = risk_decision.get('decision', 'hold').lower()
-        risk_conf = risk_decision.get('confidence', 0.5)
-        
-        # Risk Manager's recommendation is often "hold" but check if it's actually rejecting
-        risk_rejects = risk_decision_val == "reject" or risk_decision.get("data", {}).get("risk_data", {}).get("risk_level") == "high"
-        
-        prompt = f"""
-        You are an active trading execution agent. Make decisive trading decisions based on market signals.
-        
-        Agent Inputs:
-        - Market Analyst: {analyst_decision_val.upper()} (confidence: {analyst_conf:.2f}) - PRIMARY SIGNAL
-        - News Sentiment: {sentiment_decision_val.upper()} (confidence: {sentiment_conf:.2f}) - SECONDARY (often neutral)
-        - Risk Manager: {risk_decision_val.upper()} (confidence: {risk_conf:.2f}) - VALIDATION ONLY
-        - Current Price: ${current_price:.2f}
-        - Recommended Quantity: {recommended_quantity} shares
-        - Portfolio Value: ${portfolio_data.get('total_value', 0):,.2f}
-        
-        DECISION RULES (Market Analyst is PRIMARY - trust it when confident):
-        1. If Market Analyst = BUY with confidence >=0.65 AND Risk does NOT reject → BUY with quantity >=10
-        2. If Market Analyst = SELL with confidence >=0.65 AND you have position → SELL with quantity >0
-        3. If Market Analyst = BUY with confidence >=0.55 AND sentiment is not negative AND Risk does NOT reject → BUY with quantity >=5
-        4. If Market Analyst = SELL with confidence >=0.55 AND you have position → SELL with quantity >0
-        5. Only HOLD if Market Analyst confidence <0.55 OR Risk explicitly rejects OR signals strongly conflict
-        
-        IMPORTANT: 
-        - Market Analyst is the PRIMARY signal source - trust it when confidence >0.55
-        - News/Sentiment being "hold" is OK - it just means neutral, not negative
-        - Risk Manager saying "hold" usually means "no objection" (not reject)
-        - BE DECISIVE: If Market Analyst is confident (>0.6), make the trade even if others are neutral
-        
-        Quantity Rules:
-        - BUY: Use {recommended_quantity} as base, minimum 5 shares, maximum 100 shares or {recommended_quantity}
-        - SELL: If you have position, sell {recommended_quantity} or all if closing position
-        
-        Provide:
-        1. Final decision: "buy", "sell", or "hold" (prefer buy/sell when analyst is confident)
-        2. Quantity: positive integer if buy/sell (minimum 5 for buy), 0 if hold
-        3. Rationale: brief explanation (2 sentences)
-        4. Confidence: 0.0-1.0
-        
-        Format as JSON: {{"decision": "buy/sell/hold", "quantity": 0, "rationale": "...", "confidence": 0.0-1.0}}
+        return {
+            "symbol": symbol,
+            "current_price": current_price,
+            "portfolio_data": portfolio_data,
+            "analyst_decision": analyst_decision,
+            "sentiment_decision": sentiment_decision,
+            "risk_decision": risk_decision,
+            "recommended_quantity": recommended_quantity,
+            "synthesis_context": synthesis_context
+        }
+    
+    @staticmethod
+    def _decision_summary(decision: Optional[AgentDecision]) -> Dict[str, Any]:
+        """Another agent's decision and confidence, or an empty dict if it has none."""
+        return decision.summary() if decision else {}
+    
+    def _completion_request(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion request synthesizing the final decision."""
+        analyst_decision = inputs["analyst_decision"]
+        sentiment_decision = inputs["sentiment_decision"]
+        risk_decision = inputs["risk_decision"]
+        
+        prompt = PROMPT_TEMPLATE.format_map({
+            "analyst": analyst_decision.get("decision", "hold").upper(),
+            "analyst_conf": analyst_decision.get("confidence", 0.5),
+            "sentiment": sentiment_decision.get("decision", "hold").upper(),
+            "sentiment_conf": sentiment_decision.get("confidence", 0.5),
+            "risk": risk_decision.get("decision", "hold").upper(),
+            "risk_conf": risk_decision.get("confidence", 0.5),
+            "price": inputs["current_price"],
+            "quantity": inputs["recommended_quantity"],
+            "portfolio_value": inputs["portfolio_data"].get("total_value", 0)
+        })
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.6,  # Increased to allow more decisive action
+            "max_tokens": 160,  # The schema reply is ~80-120 tokens
+            "response_format": response_format(ExecutionLLMResult)
+        }
+    
+    def _response_request(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the Responses API request for the synthesis call.
+        Single-turn, so the response is not stored on OpenAI's servers.
         """
+        request = self._completion_request(inputs)
+        params = {
+            "model": request["model"],
+            "input": request["messages"],
+            "max_output_tokens": request["max_tokens"],
+            "text": text_format(ExecutionLLMResult),
+            "store": False
+        }
+        if is_reasoning_model(self.model):
+            # Reasoning models reject temperature; reasoning tokens count as output
+            params["reasoning"] = {"effort": self.settings.openai_reasoning_effort}
+            params["max_output_tokens"] += self.settings.reasoning_token_budget
+        else:
+            params["temperature"] = request["temperature"]
+        return params
+    
+    def _parse_llm_result(self, result_text: str) -> Dict[str, Any]:
+        """Validate the schema-constrained LLM response."""
+        return ExecutionLLMResult.model_validate_json(result_text).model_dump()
+    
+    def _error_result(self, error: Any) -> Dict[str, Any]:
+        """LLM result used when the synthesis call fails."""
+        return {
+            "decision": "hold",
+            "quantity": 0,
+            "rationale": f"Error in decision synthesis: {str(error)}",
+            "confidence": 0.0
+        }
+    
+    async def _execute_trade(self, inputs: Dict[str, Any], final_decision: str, quantity: int) -> tuple:
+        """
+        Record the trade and send its alert if it is not a hold and risk approves.
+        Returns (decision, quantity, trade_result), with trade_result None if nothing executed.
+        """
+        symbol = inputs["symbol"]
+        current_price = inputs["current_price"]
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an active trading execution agent. The Market Analyst is your PRIMARY signal source - trust its BUY/SELL recommendations when confidence >0.55. News and Risk being 'hold' usually means neutral/approved, not negative. Make decisive trades when Market Analyst is confident. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6,  # Increased to allow more decisive action
-                max_tokens=350
-            )
-            
-            result_text = response.choices[0].message.content
-            try:
-                llm_result = json.loads(result_text)
-            except:
-                llm_result = {
-                    "decision": "hold",
-                    "quantity": 0,
-                    "rationale": "Insufficient consensus from agents",
-                    "confidence": 0.3
-                }
-        except Exception as e:
-            llm_result = {
-                "decision": "hold",
-                "quantity": 0,
-                "rationale": f"Error in decision synthesis: {str(e)}",
-                "confidence": 0.0
-            }
+        position_prefetch = inputs.get("position_prefetch")
+        if final_decision == "sell" and quantity > 0:
+            # Never try to sell more shares than are held
+            position = await (position_prefetch or self.tool_registry.call_tool_cached_result(
+                "risk_portfolio.get_position_info", symbol=symbol
+            ))
+            quantity = min(quantity, int(position.get("quantity") or 0))
+        elif position_prefetch:
+            # Speculation not needed for buys and holds
+            position_prefetch.cancel()
         
-        final_decision = llm_result.get("decision", "hold").lower()
-        quantity = int(llm_result.get("quantity", 0))
+        if final_decision not in ["buy", "sell"] or quantity <= 0 or inputs["risk_decision"].get("decision") == "reject":
+            return final_decision, quantity, None
         
-        # Execute trade if not hold and risk approved
-        if final_decision in ["buy", "sell"] and quantity > 0 and risk_decision.get("decision") != "reject":
-            # Record trade in portfolio
-            trade_result = await self.tool_registry.call_tool(
-                "risk_portfolio.record_trade",
-                symbol=symbol,
-                action=final_decision,
-                quantity=quantity,
-                price=current_price,
-                timestamp=datetime.now().isoformat()
+        # Record trade and send alert concurrently; from here on the trade must not be abandoned
+        inputs["trade_submitted"] = True
+        trade_result, _ = await self.tool_registry.call_tools_batch([
+            ("risk_portfolio.record_trade", {
+                "symbol": symbol,
+                "action": final_decision,
+                "quantity": quantity,
+                "price": current_price,
+                "timestamp": datetime.now().isoformat()
+            }),
+            ("notification.send_trade_alert", {
+                "message": f"Executed {final_decision.upper()} {quantity} shares of {symbol} at ${current_price:.2f}",
+                "title": "Trade Executed"
+            })
+        ])
+        # The trade changed the portfolio; don't serve a stale cached value
+        self.tool_registry.invalidate_cache("risk_portfolio.get_portfolio_value")
+        self.tool_registry.invalidate_cache("risk_portfolio.get_position_info")
+        return final_decision, quantity, trade_result
+    
+    async def _finalize(
+        self,
+        inputs: Dict[str, Any],
+        llm_result: Dict[str, Any],
+        trade_task: Optional[asyncio.Task] = None
+    ) -> AgentDecision:
+        """
+        Execute the trade (if any), then record and log the decision.
+        A trade_task already started from the streamed decision takes precedence.
+        """
+        symbol = inputs["symbol"]
+        current_price = inputs["current_price"]
+        analyst_decision = inputs["analyst_decision"]
+        sentiment_decision = inputs["sentiment_decision"]
+        risk_decision = inputs["risk_decision"]
+        
+        if trade_task is None:
+            trade_task = self._execute_trade(
+                inputs,
+                llm_result.get("decision", "hold").lower(),
+                int(llm_result.get("quantity", 0))
             )
-            
-            # Log trade execution
-            await self.tool_registry.call_tool(
+        final_decision, quantity, trade_result = await trade_task
+        
+        if trade_result is not None:
+            trade_result = trade_result.as_dict()
+            self._log_in_background(self.tool_registry.call_tool(
                 "logging_metrics.log_trade_execution",
                 symbol=symbol,
                 action=final_decision,
@@ -183,14 +361,7 @@ class ExecutionAgent(BaseAgent):
                 price=current_price,
                 agent_id=self.agent_id,
                 rationale=llm_result.get("rationale", "")
-            )
-            
-            # Send trade alert
-            await self.tool_registry.call_tool(
-                "notification.send_trade_alert",
-                message=f"Executed {final_decision.upper()} {quantity} shares of {symbol} at ${current_price:.2f}",
-                title="Trade Executed"
-            )
+            ))
         else:
             trade_result = {"message": "No trade executed"}
         
@@ -216,22 +387,29 @@ class ExecutionAgent(BaseAgent):
                 "quantity": quantity,
                 "price": current_price,
                 "trade_result": trade_result,
-                "synthesis_context": synthesis_context
+                "synthesis_context": inputs["synthesis_context"],
+                "response_id": inputs.get("response_id")
             }
         )
         
         # Log decision
-        await self.tool_registry.call_tool(
+        self._log_in_background(self.tool_registry.call_tool(
             "logging_metrics.log_agent_decision",
             agent_id=self.agent_id,
             agent_role=self.role.value,
             decision=final_decision,
             rationale=rationale,
             confidence=float(llm_result.get("confidence", 0.5))
-        )
+        ))
         
         return agent_decision
     
+    async def aclose(self):
+        """Wait for in-flight trades, then background logging calls."""
+        if self._trades_in_flight:
+            await asyncio.gather(*self._trades_in_flight, return_exceptions=True)
+        await super().aclose()
+    
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """Get tools available to this agent."""
         return self.tool_registry.get_tools()  # Execution agent has access to all tools
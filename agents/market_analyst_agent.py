@@ -2,12 +2,32 @@
 Market Analyst Agent
 Analyzes real-time market data and technical indicators.
 """
-from typing import Dict, Any, List
-from openai import OpenAI
-from core.base_agent import BaseAgent, AgentRole, AgentDecision
+from typing import Dict, Any, List, Optional, Sequence
+from core.base_agent import BaseAgent, AgentRole, AgentDecision, SharedMemory
+from core.llm_client import AsyncLLMClient, get_llm_client
+from core.llm_schemas import AnalystLLMResult, response_format
 from tools.tool_registry import ToolRegistry
+from tools.indicators import compute_indicators
 from config import get_settings
-import json
+import orjson
+import textwrap
+
+
+# Static instructions, built once; only the market data varies per call
+SYSTEM_PROMPT = textwrap.dedent("""
+    You are a quantitative market analyst. From the market data provide:
+    1. Market assessment (bullish/bearish/neutral)
+    2. Key technical signals (2-3 sentences)
+    3. Confidence level (0-1)
+    4. Recommendation (buy/sell/hold)
+""").strip()
+
+PROMPT_TEMPLATE = textwrap.dedent("""
+    Symbol: {symbol}
+    Current Price: ${price}
+    Technical Indicators: {indicators}
+    Trend Analysis: {trend}
+""").strip()
 
 
 class MarketAnalystAgent(BaseAgent):
@@ -16,7 +36,15 @@ class MarketAnalystAgent(BaseAgent):
     Uses technical indicators and price action to assess market conditions.
     """
     
-    def __init__(self, tool_registry: ToolRegistry, shared_memory: Dict[str, Any] = None):
+    # MCP servers whose tools this agent may use
+    _allowed_servers = frozenset({"market_data", "strategy_reasoning", "logging_metrics"})
+    
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        shared_memory: SharedMemory = None,
+        llm_client: Optional[AsyncLLMClient] = None
+    ):
         super().__init__(
             agent_id="market_analyst_001",
             role=AgentRole.MARKET_ANALYST,
@@ -26,34 +54,54 @@ class MarketAnalystAgent(BaseAgent):
         )
         self.tool_registry = tool_registry
         self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        self.client = llm_client or get_llm_client()
         self.model = self.settings.openai_model
+        self._default_symbol = self.settings.default_tickers[0]
     
     async def reason(self, context: Dict[str, Any]) -> AgentDecision:
         """
         Analyze market conditions for given symbols.
         Uses market data and technical analysis tools.
         """
-        symbols = context.get("symbols", self.settings.default_tickers)
-        symbol = symbols[0] if symbols else self.settings.default_tickers[0]
+        inputs = await self._gather_inputs(context)
         
-        # Gather market data using tools
-        price_result = await self.tool_registry.call_tool("market_data.get_latest_price", symbol=symbol)
-        candles_result = await self.tool_registry.call_tool("market_data.fetch_intraday_candles", symbol=symbol, interval="15min", limit=100)
+        try:
+            response = await self.client.chat_completion(**self._completion_request(inputs))
+            llm_result = self._parse_llm_result(response.choices[0].message.content)
+        except Exception as e:
+            llm_result = self._error_result(e)
         
-        price_data = price_result.get("result", {}) if price_result.get("success") else {}
-        candles_data = candles_result.get("result", {}) if candles_result.get("success") else {}
+        return await self._finalize(inputs, llm_result)
+    
+    async def reason_batch(self, contexts: List[Dict[str, Any]]) -> List[AgentDecision]:
+        """Analyze several contexts, via the OpenAI Batch API when enabled."""
+        if self.settings.use_batch_api and len(contexts) > 1:
+            return await self._reason_batch_llm(contexts, self.settings.batch_poll_interval_seconds)
+        return await super().reason_batch(contexts)
+    
+    async def _gather_inputs(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather market data, indicators and trend analysis for the LLM."""
+        symbol = (context.get("symbols") or [self._default_symbol])[0]
+        
+        # Gather market data using tools (independent calls, fetched concurrently)
+        price_data, candles_data = await self.tool_registry.call_tools_batch_results([
+            ("market_data.get_latest_price", {"symbol": symbol}),
+            ("market_data.fetch_intraday_candles", {"symbol": symbol, "interval": "15min", "limit": 100})
+        ], cached=True)
         
         # Compute technical indicators
         candles = candles_data.get("candles", [])
-        if candles:
+        if candles and self.settings.local_indicators:
+            # In-process NumPy math avoids a tool round trip
+            indicators = compute_indicators([c["close"] for c in candles], ["rsi", "sma", "ema", "macd"])
+        elif candles:
             closes = [c["close"] for c in candles]
-            indicators_result = await self.tool_registry.call_tool(
+            indicators_data = await self.tool_registry.call_tool_result(
                 "strategy_reasoning.compute_technical_indicators",
                 prices=closes,
                 indicators=["rsi", "sma", "ema", "macd"]
             )
-            indicators = indicators_result.get("result", {}).get("indicators", {}) if indicators_result.get("success") else {}
+            indicators = indicators_data.get("indicators", {})
         else:
             indicators = {}
         
@@ -65,60 +113,57 @@ class MarketAnalystAgent(BaseAgent):
             "recent_candles": candles[-5:] if candles else []
         }
         
-        trend_result = await self.tool_registry.call_tool(
+        trend_analysis = await self.tool_registry.call_tool_result(
             "strategy_reasoning.analyze_market_trend",
             symbol=symbol,
             price_data=analysis_data
         )
-        trend_analysis = trend_result.get("result", {}) if trend_result.get("success") else {}
-        
-        # Use LLM to synthesize analysis
-        prompt = f"""
-        You are a market analyst. Analyze the following market data for {symbol}:
-        
-        Current Price: ${price_data.get('price', 'N/A')}
-        Technical Indicators:
-        {json.dumps(indicators, indent=2)}
-        
-        Trend Analysis: {trend_analysis.get('trend', 'neutral')}
-        
-        Provide:
-        1. Market assessment (bullish/bearish/neutral)
-        2. Key technical signals (2-3 sentences)
-        3. Confidence level (0-1)
-        4. Recommendation (buy/sell/hold signal)
-        
-        Format as JSON: {{"assessment": "...", "signals": "...", "confidence": 0.0-1.0, "recommendation": "..."}}
-        """
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a quantitative market analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=300
-            )
-            
-            result_text = response.choices[0].message.content
-            try:
-                llm_result = json.loads(result_text)
-            except:
-                llm_result = {
-                    "assessment": "neutral",
-                    "signals": "Insufficient data for analysis",
-                    "confidence": 0.5,
-                    "recommendation": "hold"
-                }
-        except Exception as e:
-            llm_result = {
-                "assessment": "unknown",
-                "signals": f"Error in analysis: {str(e)}",
-                "confidence": 0.0,
-                "recommendation": "hold"
-            }
+        return {
+            "symbol": symbol,
+            "price_data": price_data,
+            "indicators": indicators,
+            "trend_analysis": trend_analysis
+        }
+    
+    def _completion_request(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion request synthesizing the analysis."""
+        prompt = PROMPT_TEMPLATE.format_map({
+            "symbol": inputs["symbol"],
+            "price": inputs["price_data"].get("price", "N/A"),
+            "indicators": orjson.dumps(inputs["indicators"]).decode(),
+            "trend": inputs["trend_analysis"].get("trend", "neutral")
+        })
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 128,
+            "response_format": response_format(AnalystLLMResult)
+        }
+    
+    def _parse_llm_result(self, result_text: str) -> Dict[str, Any]:
+        """Validate the schema-constrained LLM response."""
+        return AnalystLLMResult.model_validate_json(result_text).model_dump()
+    
+    def _error_result(self, error: Any) -> Dict[str, Any]:
+        """LLM result used when the analysis call fails."""
+        return {
+            "assessment": "unknown",
+            "signals": f"Error in analysis: {str(error)}",
+            "confidence": 0.0,
+            "recommendation": "hold"
+        }
+    
+    async def _finalize(self, inputs: Dict[str, Any], llm_result: Dict[str, Any]) -> AgentDecision:
+        """Record and log the decision derived from the LLM result."""
+        symbol = inputs["symbol"]
+        price_data = inputs["price_data"]
+        indicators = inputs["indicators"]
         
         # Build rationale
         rationale = f"""
@@ -142,25 +187,22 @@ class MarketAnalystAgent(BaseAgent):
                 "symbol": symbol,
                 "price": price_data.get("price"),
                 "indicators": indicators,
-                "trend_analysis": trend_analysis
+                "trend_analysis": inputs["trend_analysis"]
             }
         )
         
         # Log decision
-        await self.tool_registry.call_tool(
+        self._log_in_background(self.tool_registry.call_tool(
             "logging_metrics.log_agent_decision",
             agent_id=self.agent_id,
             agent_role=self.role.value,
             decision=decision,
             rationale=rationale,
             confidence=confidence
-        )
+        ))
         
         return agent_decision
     
-    def get_available_tools(self) -> List[Dict[str, Any]]:
-        """Get tools available to this agent."""
-        return [
-            tool for tool in self.tool_registry.get_tools()
-            if tool["server"] in ["market_data", "strategy_reasoning", "logging_metrics"]
-        ]
+    def get_available_tools(self) -> Sequence[Dict[str, Any]]:
+        """Get tools available to this agent (the registry's memoized tuple, not a copy)."""
+        return self.tool_registry.get_tools_for_servers(self._allowed_servers)
@@ -2,12 +2,62 @@
 News & Sentiment Agent
 Fetches financial news and analyzes sentiment.
 """
-from typing import Dict, Any, List
-from openai import OpenAI
-from core.base_agent import BaseAgent, AgentRole, AgentDecision
+from typing import Dict, Any, List, Optional, Sequence
+from core.base_agent import BaseAgent, AgentRole, AgentDecision, SharedMemory
+from core.llm_client import AsyncLLMClient, get_llm_client
+from core.llm_schemas import SentimentLLMResult, response_format
 from tools.tool_registry import ToolRegistry
 from config import get_settings
-import json
+import hashlib
+import re
+import textwrap
+
+
+# Static instructions, built once; only the news data varies per call
+SYSTEM_PROMPT = textwrap.dedent("""
+    You are a financial news sentiment analyst. From the news data provide:
+    1. Overall sentiment assessment (positive/negative/neutral)
+    2. Key themes from news (2-3 sentences)
+    3. Impact on trading recommendation (buy/sell/hold)
+    4. Confidence level (0-1)
+""").strip()
+
+PROMPT_TEMPLATE = textwrap.dedent("""
+    Symbol: {symbol}
+    Articles Found: {articles_count}
+    Sentiment Score: {score} (range: -1 to 1)
+    Key Keywords: {keywords}
+    Recent Articles:
+    {articles_summary}
+""").strip()
+
+HTML_TAG = re.compile(r"<[^>]+>")
+
+
+def _compact_articles(articles: List[Dict[str, Any]], n: int) -> List[Dict[str, Any]]:
+    """
+    Bound the article payload sent to tools and the LLM.
+    Keeps the first n unique URLs with HTML stripped and title/description truncated.
+    """
+    seen = set()
+    compact = []
+    for article in articles:
+        url = article.get("url", "")
+        url_hash = hashlib.blake2b(url.encode(), digest_size=8).digest()
+        if url and url_hash in seen:
+            continue
+        seen.add(url_hash)
+        title = HTML_TAG.sub("", article.get("title") or "")[:120]
+        description = HTML_TAG.sub("", article.get("description") or "")[:200]
+        compact.append({
+            "title": title,
+            "description": description,
+            "url": url,
+            "published_time": article.get("published_time", "")
+        })
+        if len(compact) >= n:
+            break
+    return compact
 
 
 class NewsSentimentAgent(BaseAgent):
@@ -16,7 +66,15 @@ class NewsSentimentAgent(BaseAgent):
     Uses news search and sentiment analysis to gauge market sentiment.
     """
     
-    def __init__(self, tool_registry: ToolRegistry, shared_memory: Dict[str, Any] = None):
+    # MCP servers whose tools this agent may use
+    _allowed_servers = frozenset({"news_search", "logging_metrics"})
+    
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        shared_memory: SharedMemory = None,
+        llm_client: Optional[AsyncLLMClient] = None
+    ):
         super().__init__(
             agent_id="news_sentiment_001",
             role=AgentRole.NEWS_SENTIMENT,
@@ -26,90 +84,99 @@ class NewsSentimentAgent(BaseAgent):
         )
         self.tool_registry = tool_registry
         self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        self.client = llm_client or get_llm_client()
         self.model = self.settings.openai_model
+        self._default_symbol = self.settings.default_tickers[0]
     
     async def reason(self, context: Dict[str, Any]) -> AgentDecision:
         """
         Analyze news sentiment for given symbols.
         Fetches news and performs sentiment analysis.
         """
-        symbols = context.get("symbols", self.settings.default_tickers)
-        symbol = symbols[0] if symbols else self.settings.default_tickers[0]
-        
-        # Fetch news using tools
-        news_result = await self.tool_registry.call_tool("news_search.get_ticker_news", symbol=symbol, count=10)
-        news_data = news_result.get("result", {}) if news_result.get("success") else {}
-        articles = news_data.get("articles", [])
+        inputs = await self._gather_inputs(context)
         
-        # Analyze sentiment
-        sentiment_result = await self.tool_registry.call_tool(
-            "news_search.summarize_news_sentiment",
-            symbol=symbol,
-            news_articles=articles
-        )
-        sentiment_data = sentiment_result.get("result", {}) if sentiment_result.get("success") else {}
+        try:
+            response = await self.client.chat_completion(**self._completion_request(inputs))
+            llm_result = self._parse_llm_result(response.choices[0].message.content)
+        except Exception as e:
+            llm_result = self._error_result(e)
         
-        # Extract keywords
-        keywords_result = await self.tool_registry.call_tool(
-            "news_search.extract_news_keywords",
-            articles=articles[:5] if articles else []
-        )
-        keywords = keywords_result.get("result", {}).get("keywords", []) if keywords_result.get("success") else []
+        return await self._finalize(inputs, llm_result)
+    
+    async def reason_batch(self, contexts: List[Dict[str, Any]]) -> List[AgentDecision]:
+        """Analyze several contexts, via the OpenAI Batch API when enabled."""
+        if self.settings.use_batch_api and len(contexts) > 1:
+            return await self._reason_batch_llm(contexts, self.settings.batch_poll_interval_seconds)
+        return await super().reason_batch(contexts)
+    
+    async def _gather_inputs(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather news, sentiment score and keywords for the LLM."""
+        symbol = (context.get("symbols") or [self._default_symbol])[0]
         
-        # Use LLM to synthesize sentiment analysis
+        # Fetch news using tools
+        news_data = await self.tool_registry.call_tool_cached_result("news_search.get_ticker_news", symbol=symbol, count=10)
+        articles = _compact_articles(news_data.get("articles", []), n=10)
+        
+        # Analyze sentiment and extract keywords (both only need the articles)
+        sentiment_data, keywords_data = await self.tool_registry.call_tools_batch_results([
+            ("news_search.summarize_news_sentiment", {"symbol": symbol, "news_articles": articles}),
+            ("news_search.extract_news_keywords", {"articles": articles[:5] if articles else []})
+        ])
+        keywords = keywords_data.get("keywords", [])
+        
+        return {
+            "symbol": symbol,
+            "articles": articles,
+            "sentiment_data": sentiment_data,
+            "keywords": keywords,
+            "timestamp": context.get("timestamp")
+        }
+    
+    def _completion_request(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion request synthesizing sentiment analysis."""
+        articles = inputs["articles"]
         articles_summary = "\n".join([
             f"- {a.get('title', '')}: {a.get('description', '')[:100]}..."
             for a in articles[:5]
         ]) if articles else "No news articles found"
         
-        prompt = f"""
-        You are a financial news sentiment analyst. Analyze news sentiment for {symbol}:
-        
-        Articles Found: {len(articles)}
-        Sentiment Score: {sentiment_data.get('sentiment_score', 0)} (range: -1 to 1)
-        Key Keywords: {', '.join(keywords[:5])}
-        
-        Recent Articles:
-        {articles_summary}
-        
-        Provide:
-        1. Overall sentiment assessment (positive/negative/neutral)
-        2. Key themes from news (2-3 sentences)
-        3. Impact on trading recommendation (buy/sell/hold)
-        4. Confidence level (0-1)
-        
-        Format as JSON: {{"sentiment": "...", "themes": "...", "recommendation": "...", "confidence": 0.0-1.0}}
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a financial news analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=300
-            )
-            
-            result_text = response.choices[0].message.content
-            try:
-                llm_result = json.loads(result_text)
-            except:
-                llm_result = {
-                    "sentiment": "neutral",
-                    "themes": "Limited news data available",
-                    "recommendation": "hold",
-                    "confidence": 0.3
-                }
-        except Exception as e:
-            llm_result = {
-                "sentiment": "neutral",
-                "themes": f"Error in sentiment analysis: {str(e)}",
-                "recommendation": "hold",
-                "confidence": 0.0
-            }
+        prompt = PROMPT_TEMPLATE.format_map({
+            "symbol": inputs["symbol"],
+            "articles_count": len(articles),
+            "score": inputs["sentiment_data"].get("sentiment_score", 0),
+            "keywords": ", ".join(inputs["keywords"][:5]),
+            "articles_summary": articles_summary
+        })
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.4,
+            "max_tokens": 128,
+            "response_format": response_format(SentimentLLMResult)
+        }
+    
+    def _parse_llm_result(self, result_text: str) -> Dict[str, Any]:
+        """Validate the schema-constrained LLM response."""
+        return SentimentLLMResult.model_validate_json(result_text).model_dump()
+    
+    def _error_result(self, error: Any) -> Dict[str, Any]:
+        """LLM result used when the sentiment call fails."""
+        return {
+            "sentiment": "neutral",
+            "themes": f"Error in sentiment analysis: {str(error)}",
+            "recommendation": "hold",
+            "confidence": 0.0
+        }
+    
+    async def _finalize(self, inputs: Dict[str, Any], llm_result: Dict[str, Any]) -> AgentDecision:
+        """Record, share and log the decision derived from the LLM result."""
+        symbol = inputs["symbol"]
+        articles = inputs["articles"]
+        sentiment_data = inputs["sentiment_data"]
         
         # Build rationale
         rationale = f"""
@@ -125,12 +192,15 @@ class NewsSentimentAgent(BaseAgent):
         confidence = float(llm_result.get("confidence", 0.3))
         
         # Update shared memory
-        self.shared_memory["news_sentiment"][symbol] = {
-            "sentiment": llm_result.get("sentiment"),
-            "score": sentiment_data.get("sentiment_score", 0),
-            "articles_count": len(articles),
-            "timestamp": context.get("timestamp")
-        }
+        self.shared_memory.update("news_sentiment", {
+            **self.shared_memory().get("news_sentiment", {}),
+            symbol: {
+                "sentiment": llm_result.get("sentiment"),
+                "score": sentiment_data.get("sentiment_score", 0),
+                "articles_count": len(articles),
+                "timestamp": inputs["timestamp"]
+            }
+        })
         
         # Record decision
         agent_decision = self.record_decision(
@@ -141,25 +211,22 @@ class NewsSentimentAgent(BaseAgent):
                 "symbol": symbol,
                 "sentiment_data": sentiment_data,
                 "articles_count": len(articles),
-                "keywords": keywords
+                "keywords": inputs["keywords"]
             }
         )
         
         # Log decision
-        await self.tool_registry.call_tool(
+        self._log_in_background(self.tool_registry.call_tool(
             "logging_metrics.log_agent_decision",
             agent_id=self.agent_id,
             agent_role=self.role.value,
             decision=decision,
             rationale=rationale,
             confidence=confidence
-        )
+        ))
         
         return agent_decision
     
-    def get_available_tools(self) -> List[Dict[str, Any]]:
-        """Get tools available to this agent."""
-        return [
-            tool for tool in self.tool_registry.get_tools()
-            if tool["server"] in ["news_search", "logging_metrics"]
-        ]
+    def get_available_tools(self) -> Sequence[Dict[str, Any]]:
+        """Get tools available to this agent (the registry's memoized tuple, not a copy)."""
+        return self.tool_registry.get_tools_for_servers(self._allowed_servers)
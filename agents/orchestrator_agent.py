@@ -0,0 +1,146 @@
+"""
+Orchestrator Agent
+Fuses the analyst, sentiment and execution LLM calls into one request.
+"""
+from typing import Dict, Any, List, Optional
+from core.base_agent import AgentDecision
+from core.llm_schemas import FusedLLMResult, response_format
+from agents.market_analyst_agent import MarketAnalystAgent
+from agents.news_sentiment_agent import NewsSentimentAgent
+from agents.execution_agent import ExecutionAgent
+from agents.risk_management_agent import RiskManagementAgent
+import asyncio
+import logging
+import orjson
+
+
+log = logging.getLogger(__name__)
+
+
+class OrchestratorAgent:
+    """
+    Orchestrator Agent - One LLM call for the analyst, sentiment and execution roles.
+    Reuses each agent's tool gathering and bookkeeping; the agents remain the fallback.
+    """
+
+    def __init__(
+        self,
+        analyst: MarketAnalystAgent,
+        sentiment: NewsSentimentAgent,
+        execution: ExecutionAgent,
+        risk: Optional[RiskManagementAgent] = None
+    ):
+        self.analyst = analyst
+        self.sentiment = sentiment
+        self.execution = execution
+        self.risk = risk
+        self.client = execution.client
+        self.model = execution.model
+
+    async def reason_fused(self, context: Dict[str, Any]) -> List[AgentDecision]:
+        """
+        Run one fused reasoning round for the context's symbol.
+        Returns the analyst, sentiment, risk (if any) and execution decisions.
+        """
+        # Tool gathering for every role (and the risk agent) runs concurrently
+        risk_call = self.risk.reason(context) if self.risk else asyncio.sleep(0)
+        analyst_inputs, sentiment_inputs, execution_inputs, risk_decision = await asyncio.gather(
+            self.analyst._gather_inputs(context),
+            self.sentiment._gather_inputs(context),
+            self.execution._gather_inputs(context),
+            risk_call
+        )
+        if risk_decision is not None:
+            execution_inputs["risk_decision"] = risk_decision.summary()
+            execution_inputs["synthesis_context"]["risk_recommendation"] = risk_decision.decision
+            execution_inputs["synthesis_context"]["risk_confidence"] = risk_decision.confidence
+
+        try:
+            response = await self.client.chat_completion(
+                **self._completion_request(analyst_inputs, sentiment_inputs, execution_inputs)
+            )
+            fused = FusedLLMResult.model_validate_json(response.choices[0].message.content)
+            analyst_result = fused.analyst.model_dump()
+            sentiment_result = fused.sentiment.model_dump()
+            execution_result = fused.execution.model_dump()
+        except Exception as e:
+            log.warning("Fused reasoning failed, falling back to separate agent calls: %s", e, exc_info=True)
+            analyst_result, sentiment_result = await asyncio.gather(
+                self._separate_llm_result(self.analyst, analyst_inputs),
+                self._separate_llm_result(self.sentiment, sentiment_inputs)
+            )
+            execution_result = None
+
+        # Split the reply back into per-agent decisions
+        analyst_decision, sentiment_decision = await asyncio.gather(
+            self.analyst._finalize(analyst_inputs, analyst_result),
+            self.sentiment._finalize(sentiment_inputs, sentiment_result)
+        )
+        execution_inputs["analyst_decision"] = analyst_decision.summary()
+        execution_inputs["sentiment_decision"] = sentiment_decision.summary()
+        if execution_result is None:
+            execution_result = await self._separate_llm_result(self.execution, execution_inputs)
+        execution_decision = await self.execution._finalize(execution_inputs, execution_result)
+
+        decisions = [analyst_decision, sentiment_decision]
+        if risk_decision is not None:
+            decisions.append(risk_decision)
+        decisions.append(execution_decision)
+        return decisions
+
+    async def _separate_llm_result(self, agent, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback: the agent's own LLM call for its inputs."""
+        try:
+            response = await agent.client.chat_completion(**agent._completion_request(inputs))
+            return agent._parse_llm_result(response.choices[0].message.content)
+        except Exception as e:
+            return agent._error_result(e)
+
+    def _completion_request(
+        self,
+        analyst_inputs: Dict[str, Any],
+        sentiment_inputs: Dict[str, Any],
+        execution_inputs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build one request carrying the shared context once for all three roles."""
+        articles = sentiment_inputs["articles"]
+        articles_summary = "\n".join([
+            f"- {a.get('title', '')}: {a.get('description', '')[:100]}"
+            for a in articles[:5]
+        ]) if articles else "No news articles found"
+        risk_decision = execution_inputs["risk_decision"]
+
+        prompt = f"""
+        Symbol: {analyst_inputs['symbol']}
+        Current Price: ${execution_inputs['current_price']:.2f}
+
+        Technical Indicators:
+        {orjson.dumps(analyst_inputs['indicators']).decode()}
+        Trend Analysis: {analyst_inputs['trend_analysis'].get('trend', 'neutral')}
+
+        News ({len(articles)} articles, sentiment score {sentiment_inputs['sentiment_data'].get('sentiment_score', 0)}):
+        Key Keywords: {', '.join(sentiment_inputs['keywords'][:5])}
+        {articles_summary}
+
+        Risk Manager: {risk_decision.get('decision', 'hold').upper()} (confidence: {risk_decision.get('confidence', 0.5):.2f})
+        Recommended Quantity: {execution_inputs['recommended_quantity']} shares
+        Portfolio Value: ${execution_inputs['portfolio_data'].get('total_value', 0):,.2f}
+
+        Answer as three roles:
+        1. analyst: technical assessment, key signals (2-3 sentences), confidence 0-1, buy/sell/hold
+        2. sentiment: news sentiment, key themes (2-3 sentences), buy/sell/hold, confidence 0-1
+        3. execution: final decision from the analyst (primary signal when confidence >0.55) and
+           sentiment views; hold if Risk Manager rejects. Buy at least 5 shares, at most 100 or the
+           recommended quantity; quantity 0 for hold. Rationale in 2 sentences, confidence 0-1.
+        """
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a trading desk acting as market analyst, news sentiment analyst and execution trader. Respond with valid JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.4,
+            "max_tokens": 416,  # The per-role budgets combined
+            "response_format": response_format(FusedLLMResult)
+        }
@@ -2,12 +2,33 @@
 Risk Management Agent
 Enforces position sizing and risk limits.
 """
-from typing import Dict, Any, List
-from openai import OpenAI
-from core.base_agent import BaseAgent, AgentRole, AgentDecision
+from typing import Dict, Any, List, Optional, Sequence
+from core.base_agent import BaseAgent, AgentRole, AgentDecision, SharedMemory
+from core.llm_client import AsyncLLMClient, get_llm_client
+from core.llm_schemas import RiskLLMResult, response_format
 from tools.tool_registry import ToolRegistry
 from config import get_settings
-import json
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import orjson
+import textwrap
+
+
+# Static prompt parts, built once; only the risk context varies per call
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a risk management analyst. Respond with valid JSON only."}
+
+PROMPT_TEMPLATE = textwrap.dedent("""
+    You are a risk management analyst. Assess the risk for this trade:
+
+    {risk_context}
+
+    Provide:
+    1. Risk assessment (approve/caution/reject)
+    2. Key risk considerations (2-3 sentences)
+    3. Recommended action (buy/sell/hold/modify)
+    4. Confidence level (0-1)
+""").strip()
 
 
 class RiskManagementAgent(BaseAgent):
@@ -16,7 +37,15 @@ class RiskManagementAgent(BaseAgent):
     Validates trades against risk constraints before execution.
     """
     
-    def __init__(self, tool_registry: ToolRegistry, shared_memory: Dict[str, Any] = None):
+    # MCP servers whose tools this agent may use
+    _allowed_servers = frozenset({"risk_portfolio", "notification", "logging_metrics"})
+    
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        shared_memory: SharedMemory = None,
+        llm_client: Optional[AsyncLLMClient] = None
+    ):
         super().__init__(
             agent_id="risk_management_001",
             role=AgentRole.RISK_MANAGEMENT,
@@ -26,14 +55,41 @@ class RiskManagementAgent(BaseAgent):
         )
         self.tool_registry = tool_registry
         self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        self.client = llm_client or get_llm_client()
         self.model = self.settings.openai_model
+        # Normalized risk context hash -> LLM result; expires so market moves get a fresh assessment
+        self.llm_cache: TTLCache = TTLCache(maxsize=256, ttl=self.settings.risk_llm_cache_ttl)
     
     async def reason(self, context: Dict[str, Any]) -> AgentDecision:
         """
         Assess risk for proposed trades.
         Checks against risk limits and portfolio constraints.
         """
+        inputs = await self._gather_inputs(context)
+        
+        # Unchanged risk situations reuse the previous assessment instead of a new LLM call
+        cache_key = self._llm_cache_key(inputs)
+        llm_result = self.llm_cache.get(cache_key)
+        if llm_result is not None:
+            return await self._finalize(inputs, dict(llm_result))
+        
+        try:
+            response = await self.client.chat_completion(**self._completion_request(inputs))
+            llm_result = self._parse_llm_result(response.choices[0].message.content)
+        except Exception as e:
+            return await self._finalize(inputs, self._error_result(e))
+        
+        self.llm_cache[cache_key] = llm_result
+        return await self._finalize(inputs, dict(llm_result))
+    
+    async def reason_batch(self, contexts: List[Dict[str, Any]]) -> List[AgentDecision]:
+        """Assess several contexts, via the OpenAI Batch API when enabled."""
+        if self.settings.use_batch_api and len(contexts) > 1:
+            return await self._reason_batch_llm(contexts, self.settings.batch_poll_interval_seconds)
+        return await super().reason_batch(contexts)
+    
+    async def _gather_inputs(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather portfolio state and the proposed trade's risk checks for the LLM."""
         # Get proposed trade from context (from other agents)
         proposed_trade = context.get("proposed_trade", {})
         symbol = proposed_trade.get("symbol") or context.get("symbols", [self.settings.default_tickers[0]])[0]
@@ -41,99 +97,115 @@ class RiskManagementAgent(BaseAgent):
         quantity = proposed_trade.get("quantity")
         price = proposed_trade.get("price")
         
-        # Get current portfolio state
-        portfolio_result = await self.tool_registry.call_tool("risk_portfolio.get_portfolio_value")
-        portfolio_data = portfolio_result.get("result", {}) if portfolio_result.get("success") else {}
-        
-        # Get position info if exists
-        position_result = await self.tool_registry.call_tool("risk_portfolio.get_position_info", symbol=symbol)
-        position_data = position_result.get("result", {}) if position_result.get("success") else {}
+        # Position and allocation, plus trade risk and limits for a proposed trade
+        # (the trade value is known up front, so every call is independent)
+        calls = [
+            ("risk_portfolio.get_position_info", {"symbol": symbol}),
+            ("risk_portfolio.get_portfolio_allocation", {})
+        ]
+        assess_trade = action in ["buy", "sell"] and price
+        if assess_trade:
+            calls += [
+                ("risk_portfolio.assess_trade_risk", {"symbol": symbol, "action": action, "quantity": quantity, "price": price}),
+                ("risk_portfolio.check_risk_limits", {"symbol": symbol, "trade_value": (quantity or 0) * price})
+            ]
         
-        # Assess trade risk
-        if action in ["buy", "sell"] and price:
-            risk_result = await self.tool_registry.call_tool(
-                "risk_portfolio.assess_trade_risk",
-                symbol=symbol,
-                action=action,
-                quantity=quantity,
-                price=price
-            )
-            risk_data = risk_result.get("result", {}) if risk_result.get("success") else {}
-            
-            # Check risk limits
-            trade_value = (quantity or 0) * price
-            limits_result = await self.tool_registry.call_tool(
-                "risk_portfolio.check_risk_limits",
-                symbol=symbol,
-                trade_value=trade_value
-            )
-            limits_data = limits_result.get("result", {}) if limits_result.get("success") else {}
+        # Fetch the portfolio state and the calls above concurrently
+        portfolio_data, results = await asyncio.gather(
+            self.tool_registry.call_tool_cached_result("risk_portfolio.get_portfolio_value"),
+            self.tool_registry.call_tools_batch_results(calls)
+        )
+        position_data, allocation_data = results[:2]
+        if assess_trade:
+            risk_data, limits_data = results[2:]
         else:
             risk_data = {"risk_score": 0.0, "risk_level": "low", "risk_factors": []}
             limits_data = {"is_valid": True, "violations": []}
         
-        # Get portfolio allocation
-        allocation_result = await self.tool_registry.call_tool("risk_portfolio.get_portfolio_allocation")
-        allocation_data = allocation_result.get("result", {}) if allocation_result.get("success") else {}
-        
-        # Use LLM to synthesize risk assessment
-        risk_context = {
+        return {
             "symbol": symbol,
             "action": action,
+            "portfolio_data": portfolio_data,
+            "allocation_data": allocation_data,
+            "risk_data": risk_data,
+            "limits_data": limits_data
+        }
+    
+    def _risk_context(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Risk facts the LLM assesses."""
+        risk_data = inputs["risk_data"]
+        limits_data = inputs["limits_data"]
+        return {
+            "symbol": inputs["symbol"],
+            "action": inputs["action"],
             "risk_score": risk_data.get("risk_score", 0),
             "risk_level": risk_data.get("risk_level", "low"),
             "risk_factors": risk_data.get("risk_factors", []),
             "limits_valid": limits_data.get("is_valid", True),
             "violations": limits_data.get("violations", []),
-            "portfolio_value": portfolio_data.get("total_value", 0),
-            "current_allocation": allocation_data
+            "portfolio_value": inputs["portfolio_data"].get("total_value", 0),
+            "current_allocation": inputs["allocation_data"]
         }
+    
+    def _llm_cache_key(self, inputs: Dict[str, Any]) -> str:
+        """Hash of the risk context, rounded so near-identical states share a key."""
+        risk_context = self._risk_context(inputs)
+        risk_context["risk_score"] = round(risk_context["risk_score"] or 0, 2)
+        risk_context["portfolio_value"] = round((risk_context["portfolio_value"] or 0) / 100) * 100
+        # Allocation percentages to whole points, without the unrounded total that moves every tick
+        allocation = risk_context["current_allocation"] or {}
+        risk_context["current_allocation"] = {
+            "cash_pct": round(allocation.get("cash_pct") or 0),
+            "positions": {symbol: round(pct) for symbol, pct in (allocation.get("positions") or {}).items()}
+        }
+        encoded = orjson.dumps(risk_context, option=orjson.OPT_SORT_KEYS, default=str)
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+    
+    def _completion_request(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion request synthesizing the risk assessment."""
+        prompt = PROMPT_TEMPLATE.format_map({
+            "risk_context": orjson.dumps(self._risk_context(inputs), option=orjson.OPT_INDENT_2).decode()
+        })
         
-        prompt = f"""
-        You are a risk management analyst. Assess the risk for this trade:
-        
-        {json.dumps(risk_context, indent=2)}
-        
-        Provide:
-        1. Risk assessment (approve/caution/reject)
-        2. Key risk considerations (2-3 sentences)
-        3. Recommended action (buy/sell/hold/modify)
-        4. Confidence level (0-1)
-        
-        Format as JSON: {{"assessment": "...", "considerations": "...", "recommendation": "...", "confidence": 0.0-1.0}}
-        """
+        return {
+            "model": self.model,
+            "messages": [
+                SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.2,
+            "max_tokens": 250,
+            "response_format": response_format(RiskLLMResult)
+        }
+    
+    def _parse_llm_result(self, result_text: str) -> Dict[str, Any]:
+        """Validate the schema-constrained LLM response."""
+        return RiskLLMResult.model_validate_json(result_text).model_dump()
+    
+    def _error_result(self, error: Any) -> Dict[str, Any]:
+        """LLM result used when the risk call fails."""
+        return {
+            "assessment": "caution",
+            "considerations": f"Error in risk analysis: {str(error)}",
+            "recommendation": "hold",
+            "confidence": 0.0
+        }
+    
+    async def _finalize(self, inputs: Dict[str, Any], llm_result: Dict[str, Any]) -> AgentDecision:
+        """Alert, record and log the decision derived from the LLM result."""
+        symbol = inputs["symbol"]
+        action = inputs["action"]
+        portfolio_data = inputs["portfolio_data"]
+        risk_data = inputs["risk_data"]
+        limits_data = inputs["limits_data"]
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a risk management analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=250
-            )
-            
-            result_text = response.choices[0].message.content
-            try:
-                llm_result = json.loads(result_text)
-            except:
-                llm_result = {
-                    "assessment": "approve" if risk_data.get("risk_level") == "low" else "caution",
-                    "considerations": "Risk assessment based on portfolio constraints",
-                    "recommendation": action,
-                    "confidence": 0.7
-                }
-        except Exception as e:
-            llm_result = {
-                "assessment": "caution",
-                "considerations": f"Error in risk analysis: {str(e)}",
-                "recommendation": "hold",
-                "confidence": 0.0
-            }
+        # A rejected assessment is the decision itself, so the execution agent's veto sees it
+        if llm_result.get("assessment") == "reject":
+            recommendation = "reject"
+        else:
+            recommendation = llm_result.get("recommendation", action)
         
         # Build rationale
-        recommendation = llm_result.get("recommendation", action)
         rationale = f"""
         Risk Assessment for {symbol} ({action.upper()}):
         - Risk Level: {risk_data.get('risk_level', 'unknown').upper()}
@@ -168,20 +240,17 @@ class RiskManagementAgent(BaseAgent):
         )
         
         # Log decision
-        await self.tool_registry.call_tool(
+        self._log_in_background(self.tool_registry.call_tool(
             "logging_metrics.log_agent_decision",
             agent_id=self.agent_id,
             agent_role=self.role.value,
             decision=recommendation,
             rationale=rationale,
             confidence=float(llm_result.get("confidence", 0.5))
-        )
+        ))
         
         return agent_decision
     
-    def get_available_tools(self) -> List[Dict[str, Any]]:
-        """Get tools available to this agent."""
-        return [
-            tool for tool in self.tool_registry.get_tools()
-            if tool["server"] in ["risk_portfolio", "notification", "logging_metrics"]
-        ]
+    def get_available_tools(self) -> Sequence[Dict[str, Any]]:
+        """Get tools available to this agent (the registry's memoized tuple, not a copy)."""
+        return self.tool_registry.get_tools_for_servers(self._allowed_servers)
@@ -13,6 +13,23 @@ class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str = "your_openai_key_here"
     openai_model: str = "gpt-4o-mini"
+    openai_reasoning_effort: str = "medium"  # Used for reasoning models (o-series, gpt-5)
+    reasoning_token_budget: int = 2000       # Extra output tokens reserved for reasoning
+    
+    # LLM rate limiting (shared across agents)
+    llm_max_concurrent_requests: int = 8
+    llm_max_requests_per_minute: int = 500
+    llm_max_tokens_per_minute: int = 200000
+    
+    # OpenAI Batch API (multi-symbol rounds, ~50% cheaper, asynchronous)
+    use_batch_api: bool = False
+    batch_poll_interval_seconds: float = 30.0
+    
+    # Fuse analyst, sentiment and execution LLM calls into one request
+    fused_reasoning: bool = False
+    
+    # Continuous mode: deadline for one (non-batch) round
+    round_timeout_seconds: float = 120.0
     
     # Polygon API
     polygon_api_key: str = ""
@@ -24,11 +41,21 @@ class Settings(BaseSettings):
     pushover_user_key: str = ""
     pushover_api_token: str = ""
     
+    # Compute technical indicators in-process instead of via the strategy tool
+    local_indicators: bool = True
+    
+    # Seconds the trading floor reuses position prices between rounds
+    price_cache_ttl: float = 10.0
+    
+    # Seconds a risk assessment is reused for an unchanged (rounded) risk context
+    risk_llm_cache_ttl: float = 300.0
+    
     # Trading Configuration
     initial_capital: float = 100000.0
     max_position_size: float = 0.1  # 10% of portfolio
     risk_per_trade: float = 0.02    # 2% risk per trade
     paper_trading: bool = True
+    trade_history_maxlen: int = 10000  # Most recent trades kept by the risk server
     
     # Logging
     log_level: str = "INFO"
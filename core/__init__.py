@@ -1,11 +1,21 @@
 """Core agent framework package."""
-from core.base_agent import BaseAgent, AgentRole, AgentMessage, AgentDecision
+from core.base_agent import BaseAgent, AgentRole, AgentMessage, AgentDecision, SharedMemory
 from core.agent_manager import AgentManager
+from core.llm_client import AsyncLLMClient, get_llm_client
+from core.llm_schemas import AnalystLLMResult, SentimentLLMResult, RiskLLMResult, ExecutionLLMResult, FusedLLMResult
 
 __all__ = [
     "BaseAgent",
     "AgentRole",
     "AgentMessage",
     "AgentDecision",
-    "AgentManager"
+    "SharedMemory",
+    "AgentManager",
+    "AsyncLLMClient",
+    "get_llm_client",
+    "AnalystLLMResult",
+    "SentimentLLMResult",
+    "RiskLLMResult",
+    "ExecutionLLMResult",
+    "FusedLLMResult"
 ]
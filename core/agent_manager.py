@@ -2,10 +2,16 @@
 Agent Manager: Orchestrates multi-agent communication and coordination.
 Implements message passing and shared memory patterns.
 """
-from typing import Dict, List, Optional
-from core.base_agent import BaseAgent, AgentMessage, AgentDecision
+from typing import AsyncIterator, Deque, Dict, List, Mapping, Optional
+from core.base_agent import BaseAgent, AgentRole, AgentMessage, AgentDecision, SharedMemory
 from datetime import datetime
+from collections import deque
 import asyncio
+import heapq
+import logging
+
+
+log = logging.getLogger(__name__)
 
 
 class AgentManager:
@@ -16,85 +22,146 @@ class AgentManager:
     
     def __init__(self):
         self.agents: Dict[str, BaseAgent] = {}
-        self.shared_memory: Dict[str, any] = {
+        self.shared_memory = SharedMemory({
             "portfolio": {},
             "market_data": {},
             "news_sentiment": {},
             "active_trades": [],
             "trade_history": []
-        }
-        self.message_bus: List[AgentMessage] = []
+        })
+        self.message_bus: Deque[AgentMessage] = deque(maxlen=10000)
     
     def register_agent(self, agent: BaseAgent):
         """Register an agent with the manager."""
         agent.shared_memory = self.shared_memory
         self.agents[agent.agent_id] = agent
-        print(f"Registered agent: {agent.name} ({agent.agent_id})")
+        log.info("Registered agent: %s (%s)", agent.name, agent.agent_id)
     
     def broadcast_message(self, message: AgentMessage):
         """Broadcast message to all relevant agents."""
         self.message_bus.append(message)
         
-        # Deliver to intended recipients
-        for agent_id, agent in self.agents.items():
-            if message.recipient is None:  # Broadcast
-                agent.receive_message(message)
-            elif message.recipient == agent_id:  # Direct message
-                agent.receive_message(message)
+        # Deliver to intended recipients; agents share the one message object
+        if message.recipient is None:  # Broadcast
+            for agent in self.agents.values():
+                agent.message_queue.append(message)
+        else:  # Direct message
+            agent = self.agents.get(message.recipient)
+            if agent is not None:
+                agent.message_queue.append(message)
     
     async def orchestrate_round(self, context: Dict[str, any]) -> List[AgentDecision]:
         """
         Orchestrate one round of agent reasoning.
-        Agents reason in sequence and later agents can access earlier decisions.
+        Independent agents reason concurrently (fan-out); the Execution agent
+        runs afterwards so it can access their decisions (fan-in).
+        """
+        return [decision async for decision in self.stream_round(context)]
+    
+    async def stream_round(self, context: Dict[str, any]) -> AsyncIterator[AgentDecision]:
+        """
+        orchestrate_round, yielding each decision as soon as its agent finishes.
+        Independent agents arrive in completion order, the Execution agent last.
         """
-        decisions = []
-        
         # Clear message bus for this round
         self.message_bus.clear()
         
-        # Run each agent's reasoning in sequence
-        # Later agents (especially Execution) need access to earlier decisions
-        for agent_id, agent in self.agents.items():
-            try:
-                decision = await agent.reason(context)
-                decisions.append(decision)
-                
-                # Update context with this agent's decision for subsequent agents
-                # This allows Execution agent to see decisions from other agents
-                if agent.role.value == "market_analyst":
-                    context["analyst_decision"] = decision.__dict__ if hasattr(decision, '__dict__') else {}
-                elif agent.role.value == "news_sentiment":
-                    context["sentiment_decision"] = decision.__dict__ if hasattr(decision, '__dict__') else {}
-                elif agent.role.value == "risk_management":
-                    context["risk_decision"] = decision.__dict__ if hasattr(decision, '__dict__') else {}
-                
-                # Agent may have sent messages during reasoning
-                # Process any messages it wants to broadcast
-                
-            except Exception as e:
-                print(f"Error in agent {agent.name}: {e}")
-                # Record error decision
-                decision = agent.record_decision(
-                    decision="ERROR",
-                    rationale=f"Agent encountered an error: {str(e)}",
-                    confidence=0.0,
-                    data={"error": str(e)}
-                )
-                decisions.append(decision)
+        # Market Analyst, News Sentiment and Risk Management don't depend on
+        # each other, so their LLM and tool latencies overlap
+        independent_agents = [a for a in self.agents.values() if a.role != AgentRole.EXECUTION]
+        execution_agents = [a for a in self.agents.values() if a.role == AgentRole.EXECUTION]
         
-        return decisions
+        for next_decision in asyncio.as_completed(
+            [self._run_agent(agent, context) for agent in independent_agents]
+        ):
+            yield await next_decision
+        
+        # Execution agent needs access to the decisions gathered above
+        for agent in execution_agents:
+            yield await self._run_agent(agent, context)
+    
+    async def orchestrate_batch(self, contexts: List[Dict[str, any]]) -> List[List[AgentDecision]]:
+        """
+        Orchestrate one round over several contexts (e.g. one per symbol).
+        Each agent reasons over all contexts at once, so LLM agents can submit
+        a single Batch API job per phase instead of one request per symbol.
+        Returns the decisions grouped per context.
+        """
+        self.message_bus.clear()
+        
+        independent_agents = [a for a in self.agents.values() if a.role != AgentRole.EXECUTION]
+        execution_agents = [a for a in self.agents.values() if a.role == AgentRole.EXECUTION]
+        
+        per_agent = list(await asyncio.gather(
+            *(self._run_agent_batch(agent, contexts) for agent in independent_agents)
+        ))
+        
+        # Execution agent needs access to the decisions gathered above
+        for agent in execution_agents:
+            per_agent.append(await self._run_agent_batch(agent, contexts))
+        
+        return [list(decisions) for decisions in zip(*per_agent)]
+    
+    async def _run_agent(self, agent: BaseAgent, context: Dict[str, any]) -> AgentDecision:
+        """Run one agent's reasoning, recording an error decision on failure."""
+        try:
+            decision = await agent.reason(context)
+            self._share_decision(agent, decision, context)
+            return decision
+        except Exception as e:
+            return self._error_decision(agent, e)
+    
+    async def _run_agent_batch(self, agent: BaseAgent, contexts: List[Dict[str, any]]) -> List[AgentDecision]:
+        """Run one agent over several contexts, recording error decisions on failure."""
+        try:
+            decisions = await agent.reason_batch(contexts)
+            for decision, context in zip(decisions, contexts):
+                self._share_decision(agent, decision, context)
+            return decisions
+        except Exception as e:
+            return [self._error_decision(agent, e) for _ in contexts]
+    
+    def _share_decision(self, agent: BaseAgent, decision: AgentDecision, context: Dict[str, any]):
+        """Update context with this agent's decision for subsequent agents."""
+        # This allows Execution agent to see decisions from other agents
+        # (the decision objects themselves; consumers read only what they need)
+        if agent.role.value == "market_analyst":
+            context["analyst_decision"] = decision
+        elif agent.role.value == "news_sentiment":
+            context["sentiment_decision"] = decision
+        elif agent.role.value == "risk_management":
+            context["risk_decision"] = decision
+    
+    def _error_decision(self, agent: BaseAgent, error: Exception) -> AgentDecision:
+        """Record an error decision for an agent that failed to reason."""
+        log.error("Error in agent %s: %s", agent.name, error, exc_info=error)
+        return agent.record_decision(
+            decision="ERROR",
+            rationale=f"Agent encountered an error: {str(error)}",
+            confidence=0.0,
+            data={"error": str(error)}
+        )
+    
+    async def aclose(self):
+        """Drain every agent's background logging calls."""
+        await asyncio.gather(*(agent.aclose() for agent in self.agents.values()))
     
     def get_all_decisions(self) -> List[AgentDecision]:
         """Get all decisions from all agents."""
-        all_decisions = []
-        for agent in self.agents.values():
-            all_decisions.extend(agent.decision_history)
-        return sorted(all_decisions, key=lambda d: d.timestamp)
+        # Each history is already in timestamp order, so a linear merge suffices
+        return list(heapq.merge(
+            *(agent.decision_history for agent in self.agents.values()),
+            key=lambda d: d.timestamp
+        ))
     
     def get_agent_statuses(self) -> List[Dict[str, any]]:
         """Get status of all agents."""
         return [agent.get_status() for agent in self.agents.values()]
     
+    def memory(self) -> Mapping[str, any]:
+        """Current read-only snapshot of shared memory."""
+        return self.shared_memory()
+    
     def update_shared_memory(self, key: str, value: any):
         """Update shared memory (e.g., portfolio state)."""
-        self.shared_memory[key] = value
+        self.shared_memory.update(key, value)
@@ -3,10 +3,13 @@ Base Agent Framework for Autonomous Trading Agents.
 Implements agentic AI patterns with LLM-based reasoning.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, Deque, Dict, List, Any, Mapping, Optional, Sequence, Set
+from collections import deque
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
+from types import MappingProxyType
+import asyncio
 import uuid
 
 
@@ -18,10 +21,10 @@ class AgentRole(str, Enum):
     EXECUTION = "execution"
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentMessage:
     """Message passed between agents."""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
     sender: str = ""
     recipient: Optional[str] = None  # None means broadcast
     content: Dict[str, Any] = field(default_factory=dict)
@@ -29,7 +32,7 @@ class AgentMessage:
     message_type: str = "information"
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentDecision:
     """Structured decision output from an agent."""
     agent_id: str
@@ -37,8 +40,42 @@ class AgentDecision:
     decision: str
     rationale: str  # Chain-of-thought reasoning summary (not raw CoT)
     confidence: float  # 0.0 to 1.0
-    data: Dict[str, Any] = field(default_factory=dict)
+    data: Optional[Dict[str, Any]] = None
     timestamp: datetime = field(default_factory=datetime.now)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Decision and confidence only, as other agents consume them."""
+        return {"decision": self.decision, "confidence": self.confidence}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict of the fields; unlike asdict, data is shared rather than deep-copied."""
+        return {
+            "agent_id": self.agent_id,
+            "agent_role": self.agent_role,
+            "decision": self.decision,
+            "rationale": self.rationale,
+            "confidence": self.confidence,
+            "data": self.data,
+            "timestamp": self.timestamp
+        }
+
+
+class SharedMemory:
+    """
+    State shared between agents, updated copy-on-write.
+    Calling it returns a read-only snapshot; updates swap in a new snapshot atomically.
+    """
+    
+    def __init__(self, initial: Optional[Mapping[str, Any]] = None):
+        self._snapshot: Mapping[str, Any] = MappingProxyType(dict(initial or {}))
+    
+    def __call__(self) -> Mapping[str, Any]:
+        """Current snapshot; never mutated after it is published."""
+        return self._snapshot
+    
+    def update(self, key: str, value: Any):
+        """Publish a new snapshot with key set to value."""
+        self._snapshot = MappingProxyType({**self._snapshot, key: value})
 
 
 class BaseAgent(ABC):
@@ -54,16 +91,21 @@ class BaseAgent(ABC):
         name: str,
         description: str,
         tools: List[Any] = None,
-        shared_memory: Optional[Dict[str, Any]] = None
+        shared_memory: Optional[SharedMemory] = None
     ):
         self.agent_id = agent_id
         self.role = role
         self.name = name
         self.description = description
         self.tools = tools or []
-        self.shared_memory = shared_memory or {}
-        self.message_queue: List[AgentMessage] = []
-        self.decision_history: List[AgentDecision] = []
+        self.shared_memory = shared_memory if isinstance(shared_memory, SharedMemory) else SharedMemory(shared_memory)
+        # Bounded so long-running continuous mode doesn't grow memory without limit
+        self.message_queue: Deque[AgentMessage] = deque(maxlen=1000)
+        self.decision_history: Deque[AgentDecision] = deque(maxlen=1000)
+        self.decisions_made = 0
+        
+        # Fire-and-forget logging calls, drained by aclose()
+        self._pending_logs: Set[asyncio.Task] = set()
         
     def receive_message(self, message: AgentMessage):
         """Receive a message from another agent or system."""
@@ -98,11 +140,23 @@ class BaseAgent(ABC):
             decision=decision,
             rationale=rationale,
             confidence=confidence,
-            data=data or {}
+            data=data
         )
         self.decision_history.append(agent_decision)
+        self.decisions_made += 1
         return agent_decision
     
+    def _log_in_background(self, call: Awaitable):
+        """Run a non-critical logging call without holding up the decision."""
+        task = asyncio.ensure_future(call)
+        self._pending_logs.add(task)
+        task.add_done_callback(self._pending_logs.discard)
+    
+    async def aclose(self):
+        """Wait for background logging calls to finish."""
+        if self._pending_logs:
+            await asyncio.gather(*self._pending_logs, return_exceptions=True)
+    
     @abstractmethod
     async def reason(self, context: Dict[str, Any]) -> AgentDecision:
         """
@@ -112,8 +166,39 @@ class BaseAgent(ABC):
         """
         pass
     
+    async def reason_batch(self, contexts: List[Dict[str, Any]]) -> List[AgentDecision]:
+        """
+        Reason over several contexts (e.g. one per symbol).
+        Default runs reason() concurrently; agents may batch their LLM calls.
+        """
+        return list(await asyncio.gather(*(self.reason(context) for context in contexts)))
+    
+    async def _reason_batch_llm(self, contexts: List[Dict[str, Any]], poll_interval: float) -> List[AgentDecision]:
+        """
+        Batched reasoning for LLM agents split into phases.
+        Expects _gather_inputs, _completion_request, _parse_llm_result,
+        _error_result and _finalize, plus an AsyncLLMClient as self.client.
+        """
+        all_inputs = await asyncio.gather(*(self._gather_inputs(context) for context in contexts))
+        requests = {str(i): self._completion_request(inputs) for i, inputs in enumerate(all_inputs)}
+        
+        try:
+            results = await self.client.batch_chat_completions(requests, poll_interval=poll_interval)
+            batch_error = None
+        except Exception as e:
+            results, batch_error = {}, e
+        
+        decisions = []
+        for i, inputs in enumerate(all_inputs):
+            try:
+                llm_result = self._parse_llm_result(results[str(i)])
+            except Exception as e:
+                llm_result = self._error_result(batch_error or e)
+            decisions.append(await self._finalize(inputs, llm_result))
+        return decisions
+    
     @abstractmethod
-    def get_available_tools(self) -> List[Dict[str, Any]]:
+    def get_available_tools(self) -> Sequence[Dict[str, Any]]:
         """Return list of available tools for this agent."""
         pass
     
@@ -131,6 +216,6 @@ class BaseAgent(ABC):
             "role": self.role.value,
             "name": self.name,
             "pending_messages": len(self.message_queue),
-            "decisions_made": len(self.decision_history),
+            "decisions_made": self.decisions_made,
             "tools_count": tools_count
         }
@@ -0,0 +1,302 @@
+"""
+Async LLM Client: Shared, rate-limited access to the OpenAI API.
+Mirrors the OpenAI cookbook's parallel request processor: requests are
+throttled against requests-per-minute and tokens-per-minute budgets, capped
+in concurrency, and retried with exponential backoff on transient errors,
+behind a circuit breaker that stops calls while the provider is failing.
+"""
+from typing import Any, AsyncIterator, Dict, List, Sequence
+from functools import lru_cache
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, InternalServerError
+from config import get_settings
+from core.resilience import CircuitBreaker, backoff_delay
+import asyncio
+import httpx
+import importlib.util
+import io
+import json
+import re
+import time
+
+
+# Transient provider errors worth retrying (APITimeoutError is an APIConnectionError)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); fall back to HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+REASONING_MODEL_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+
+
+def is_reasoning_model(model: str) -> bool:
+    """Whether the model accepts the Responses API reasoning parameter."""
+    return model.startswith(REASONING_MODEL_PREFIXES)
+
+
+def completed_json_fields(partial_text: str, keys: Sequence[str]) -> Dict[str, Any]:
+    """
+    Extract top-level scalar fields already complete in a partial JSON reply.
+    A string is complete at its closing quote; a number once a delimiter follows it.
+    """
+    fields = {}
+    for key in keys:
+        match = re.search(
+            r'"%s"\s*:\s*(?:"((?:[^"\\]|\\.)*)"|(-?\d+(?:\.\d+)?)\s*[,}\n])' % re.escape(key),
+            partial_text
+        )
+        if match:
+            if match.group(1) is not None:
+                fields[key] = json.loads(f'"{match.group(1)}"')
+            else:
+                fields[key] = json.loads(match.group(2))
+    return fields
+
+
+class CapacityBucket:
+    """Token bucket that refills continuously up to a per-minute capacity."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.refill_rate = self.capacity / 60.0  # units per second
+        self.last_update = time.monotonic()
+
+    def try_consume(self, amount: float) -> float:
+        """
+        Consume capacity if available.
+        Returns 0 on success, otherwise the seconds to wait before retrying.
+        """
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.last_update) * self.refill_rate)
+        self.last_update = now
+
+        # Requests larger than the whole bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            self.available -= amount
+            return 0.0
+        return (amount - self.available) / self.refill_rate
+
+
+class AsyncLLMClient:
+    """
+    Rate-limited wrapper around AsyncOpenAI shared by all agents.
+    Never blocks the event loop; concurrent agents overlap their LLM latency.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrent_requests: int = 8,
+        max_requests_per_minute: int = 500,
+        max_tokens_per_minute: int = 200000,
+        max_attempts: int = 4
+    ):
+        self.api_key = api_key
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_attempts = max_attempts
+        self.request_bucket = CapacityBucket(max_requests_per_minute)
+        self.token_bucket = CapacityBucket(max_tokens_per_minute)
+        self.breaker = CircuitBreaker("openai", fail_max=5, reset_timeout=30.0)
+
+        # Bound to the running event loop on first use
+        self._loop = None
+        self._client: AsyncOpenAI = None
+        self._semaphore: asyncio.Semaphore = None
+
+    def _bind_loop(self):
+        """(Re)create loop-bound resources when called from a new event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            # One pooled HTTP/2 connection set multiplexes every agent's requests
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+        """Rough token estimate for a request (~4 characters per token)."""
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        return prompt_chars // 4 + max_tokens
+
+    async def _wait_for_capacity(self, tokens: int):
+        """Wait until both the request and token budgets allow one more call."""
+        while True:
+            wait = self.request_bucket.try_consume(1)
+            if wait == 0:
+                wait = self.token_bucket.try_consume(tokens)
+                if wait == 0:
+                    return
+                # Give back the request slot while waiting for tokens
+                self.request_bucket.available += 1
+            await asyncio.sleep(wait)
+
+    async def _backoff_or_raise(self, error: Exception, attempt: int, started: bool = False):
+        """Sleep before the next attempt, or re-raise if out of attempts or mid-stream."""
+        # Content already yielded cannot be replayed
+        if started or attempt == self.max_attempts - 1:
+            # One failed call counts once towards the breaker, however many attempts it made;
+            # rate limits mean the provider is up, just busy
+            if not isinstance(error, RateLimitError):
+                self.breaker.record_failure()
+            raise error
+        await asyncio.sleep(backoff_delay(attempt))
+
+    async def chat_completion(self, model: str, messages: List[Dict[str, Any]], max_tokens: int = 300, **kwargs):
+        """
+        Create a chat completion, throttled and retried on transient errors.
+        Returns the raw OpenAI response object.
+        """
+        self._bind_loop()
+        tokens = self.estimate_tokens(messages, max_tokens)
+
+        for attempt in range(self.max_attempts):
+            self.breaker.check()
+            await self._wait_for_capacity(tokens)
+            try:
+                async with self._semaphore:
+                    response = await self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        **kwargs
+                    )
+                self.breaker.record_success()
+                return response
+            except RETRYABLE_ERRORS as e:
+                await self._backoff_or_raise(e, attempt)
+
+    async def chat_completion_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 300,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+        Throttled like chat_completion; transient errors are retried before the first chunk.
+        """
+        self._bind_loop()
+        tokens = self.estimate_tokens(messages, max_tokens)
+        started = False
+
+        for attempt in range(self.max_attempts):
+            self.breaker.check()
+            await self._wait_for_capacity(tokens)
+            try:
+                async with self._semaphore:
+                    stream = await self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        **kwargs
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+                self.breaker.record_success()
+                return
+            except RETRYABLE_ERRORS as e:
+                await self._backoff_or_raise(e, attempt, started)
+
+    async def response_stream(
+        self,
+        model: str,
+        input: List[Dict[str, Any]],
+        max_output_tokens: int = 300,
+        **kwargs
+    ) -> AsyncIterator[Any]:
+        """
+        Stream a Responses API call, yielding its events as they arrive.
+        Callers read output_text deltas and the id of the completed response,
+        which (for stored responses) can be passed back as previous_response_id.
+        """
+        self._bind_loop()
+        tokens = self.estimate_tokens(input, max_output_tokens)
+        started = False
+
+        for attempt in range(self.max_attempts):
+            self.breaker.check()
+            await self._wait_for_capacity(tokens)
+            try:
+                async with self._semaphore:
+                    stream = await self._client.responses.create(
+                        model=model,
+                        input=input,
+                        max_output_tokens=max_output_tokens,
+                        stream=True,
+                        **kwargs
+                    )
+                    async for event in stream:
+                        started = True
+                        yield event
+                self.breaker.record_success()
+                return
+            except RETRYABLE_ERRORS as e:
+                await self._backoff_or_raise(e, attempt, started)
+
+    async def batch_chat_completions(
+        self,
+        requests: Dict[str, Dict[str, Any]],
+        poll_interval: float = 30.0
+    ) -> Dict[str, str]:
+        """
+        Submit chat completion requests as one OpenAI Batch API job.
+        Maps each custom_id to its response content once the batch completes.
+        """
+        self._bind_loop()
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+            for custom_id, body in requests.items()
+        ]
+        batch_file = await self._client.files.create(
+            file=("batch_requests.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = await self._client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+        # Batches complete asynchronously; poll until a terminal status
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self._client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+        output = await self._client.files.content(batch.output_file_id)
+        results = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return results
+
+
+@lru_cache()
+def get_llm_client() -> AsyncLLMClient:
+    """Shared LLM client instance used by all agents."""
+    settings = get_settings()
+    return AsyncLLMClient(
+        api_key=settings.openai_api_key,
+        max_concurrent_requests=settings.llm_max_concurrent_requests,
+        max_requests_per_minute=settings.llm_max_requests_per_minute,
+        max_tokens_per_minute=settings.llm_max_tokens_per_minute
+    )
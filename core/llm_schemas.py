@@ -0,0 +1,85 @@
+"""
+LLM Schemas: Structured output models for agent LLM replies.
+Sent as strict JSON schemas so replies always parse into these models.
+"""
+from typing import Any, Dict, Literal, Type
+from pydantic import BaseModel
+
+
+class AnalystLLMResult(BaseModel):
+    """Market Analyst reply."""
+    assessment: Literal["bullish", "bearish", "neutral"]
+    signals: str
+    confidence: float
+    recommendation: Literal["buy", "sell", "hold"]
+
+
+class SentimentLLMResult(BaseModel):
+    """News & Sentiment reply."""
+    sentiment: Literal["positive", "negative", "neutral"]
+    themes: str
+    recommendation: Literal["buy", "sell", "hold"]
+    confidence: float
+
+
+class RiskLLMResult(BaseModel):
+    """Risk Management reply."""
+    assessment: Literal["approve", "caution", "reject"]
+    considerations: str
+    recommendation: Literal["buy", "sell", "hold", "modify"]
+    confidence: float
+
+
+class ExecutionLLMResult(BaseModel):
+    """Execution reply; decision and quantity come first so they stream first."""
+    decision: Literal["buy", "sell", "hold"]
+    quantity: int
+    rationale: str
+    confidence: float
+
+
+class FusedLLMResult(BaseModel):
+    """Fused reply covering the analyst, sentiment and execution roles."""
+    analyst: AnalystLLMResult
+    sentiment: SentimentLLMResult
+    execution: ExecutionLLMResult
+
+
+def _make_strict(schema: Dict[str, Any]):
+    """Require every property and forbid extras, as strict mode expects."""
+    if schema.get("type") == "object":
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema.get("properties", {}))
+    for definition in schema.get("$defs", {}).values():
+        _make_strict(definition)
+
+
+def _strict_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Strict JSON schema for the model."""
+    schema = model.model_json_schema()
+    _make_strict(schema)
+    return schema
+
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Chat completions response_format enforcing the model's JSON schema."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "strict": True,
+            "schema": _strict_schema(model)
+        }
+    }
+
+
+def text_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Responses API text format enforcing the model's JSON schema."""
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": model.__name__,
+            "strict": True,
+            "schema": _strict_schema(model)
+        }
+    }
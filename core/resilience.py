@@ -0,0 +1,63 @@
+"""
+Resilience helpers: circuit breaker and retry backoff.
+Shared by the LLM client and the tool registry.
+"""
+import random
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing provider for a while after repeated failures.
+    Closed -> open after fail_max consecutive failures; after reset_timeout
+    one trial call is let through (half-open) and decides whether to close.
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def check(self):
+        """
+        Raise CircuitOpenError if calls are currently rejected.
+        In half-open state only the first caller gets through as the trial call.
+        """
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(f"Circuit '{self.name}' is open; skipping call")
+        if state == "half_open":
+            # Re-arm the timer so concurrent callers stay rejected while the trial runs;
+            # a trial that never reports back just allows another one after reset_timeout
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        """Count a failure, opening (or re-opening) the circuit at the threshold."""
+        self.failures += 1
+        if self.failures >= self.fail_max or self.state == "half_open":
+            self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, min_wait: float = 1.0, max_wait: float = 20.0) -> float:
+    """Random exponential backoff (full jitter) for the given 0-based attempt."""
+    return random.uniform(min_wait, min(max_wait, min_wait * 2 ** (attempt + 1)))
@@ -2,6 +2,8 @@
 Main Entry Point for Agentic AI Stock Trading System
 """
 import asyncio
+import logging
+import signal
 import sys
 from pathlib import Path
 
@@ -9,27 +11,31 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from config import get_settings
-from tools.tool_registry import ToolRegistry
-from core.agent_manager import AgentManager
-from trading_floor.trading_floor import TradingFloor
-
-# Import MCP Servers
-from mcp_servers.market_data_server import MarketDataServer
-from mcp_servers.news_server import NewsServer
-from mcp_servers.strategy_server import StrategyServer
-from mcp_servers.risk_server import RiskServer
-from mcp_servers.notification_server import NotificationServer
-from mcp_servers.logging_server import LoggingServer
-
-# Import Agents
-from agents.market_analyst_agent import MarketAnalystAgent
-from agents.news_sentiment_agent import NewsSentimentAgent
-from agents.risk_management_agent import RiskManagementAgent
-from agents.execution_agent import ExecutionAgent
 
 
 def initialize_system():
     """Initialize the trading system: servers, tools, agents."""
+    # Imported here so --help and UI startup don't pay for the OpenAI client,
+    # server and agent imports until the system is actually built
+    from tools.tool_registry import ToolRegistry
+    from core.agent_manager import AgentManager
+    from core.llm_client import get_llm_client
+    from trading_floor.trading_floor import TradingFloor
+    
+    # Import MCP Servers
+    from mcp_servers.market_data_server import MarketDataServer
+    from mcp_servers.news_server import NewsServer
+    from mcp_servers.strategy_server import StrategyServer
+    from mcp_servers.risk_server import RiskServer
+    from mcp_servers.notification_server import NotificationServer
+    from mcp_servers.logging_server import LoggingServer
+    
+    # Import Agents
+    from agents.market_analyst_agent import MarketAnalystAgent
+    from agents.news_sentiment_agent import NewsSentimentAgent
+    from agents.risk_management_agent import RiskManagementAgent
+    from agents.execution_agent import ExecutionAgent
+    
     print("=" * 60)
     print("Initializing Agentic AI Stock Trading System")
     print("=" * 60)
@@ -58,11 +64,13 @@ def initialize_system():
     
     # Initialize Agents
     print("\nInitializing Agents...")
+    # One client (and HTTP/2 connection pool) shared by every agent
+    llm_client = get_llm_client()
     agents = [
-        MarketAnalystAgent(tool_registry, agent_manager.shared_memory),
-        NewsSentimentAgent(tool_registry, agent_manager.shared_memory),
-        RiskManagementAgent(tool_registry, agent_manager.shared_memory),
-        ExecutionAgent(tool_registry, agent_manager.shared_memory)
+        MarketAnalystAgent(tool_registry, agent_manager.shared_memory, llm_client),
+        NewsSentimentAgent(tool_registry, agent_manager.shared_memory, llm_client),
+        RiskManagementAgent(tool_registry, agent_manager.shared_memory, llm_client),
+        ExecutionAgent(tool_registry, agent_manager.shared_memory, llm_client)
     ]
     
     for agent in agents:
@@ -90,6 +98,7 @@ async def run_single_round():
     
     print("Executing single trading round...\n")
     result = await trading_floor.execute_round()
+    await trading_floor.aclose()
     
     print("\n📋 Round Results:")
     print(f"  Symbol: {result['symbol']}")
@@ -104,6 +113,26 @@ async def run_single_round():
     return result
 
 
+async def run_batch_round():
+    """Run a single round over all default tickers, batching LLM calls."""
+    trading_floor, _, _ = initialize_system()
+    
+    print("Executing batch trading round...\n")
+    result = await trading_floor.execute_batch_round()
+    await trading_floor.aclose()
+    
+    print("\n📋 Batch Round Results:")
+    print(f"  Round: {result['round']}")
+    
+    for symbol, decisions in result['decisions'].items():
+        exec_decision = decisions['execution']
+        if exec_decision:
+            print(f"  {symbol}: {exec_decision.get('decision', 'N/A').upper()} "
+                  f"(confidence: {exec_decision.get('confidence', 0):.2%})")
+    
+    return result
+
+
 async def run_continuous():
     """Run continuous trading rounds."""
     trading_floor, _, _ = initialize_system()
@@ -111,11 +140,46 @@ async def run_continuous():
     settings = get_settings()
     interval = 300  # 5 minutes
     
+    # First Ctrl+C stops the floor cleanly after the current round; a second one cancels that round
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    
+    def on_sigint():
+        if trading_floor.is_running:
+            print("\nStopping after the current round (Ctrl+C again to interrupt it)...")
+            trading_floor.stop()
+        else:
+            main_task.cancel()
+    
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_sigint)
+        sigint_installed = True
+    except NotImplementedError:  # Windows event loops
+        sigint_installed = False
+    
     try:
         await trading_floor.run_continuous(interval_seconds=interval)
-    except KeyboardInterrupt:
-        print("\nStopping trading floor...")
-        trading_floor.stop()
+    except asyncio.CancelledError:
+        print("\nTrading floor interrupted")
+    finally:
+        if sigint_installed:
+            loop.remove_signal_handler(signal.SIGINT)
+        await trading_floor.aclose()
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """New event loop, on uvloop's C implementation when installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.new_event_loop()
+    return uvloop.new_event_loop()
+
+
+def run(coro):
+    """Run a coroutine to completion on a fresh new_event_loop()."""
+    with asyncio.Runner(loop_factory=new_event_loop) as runner:
+        return runner.run(coro)
 
 
 def main():
@@ -125,17 +189,24 @@ def main():
     parser = argparse.ArgumentParser(description="Agentic AI Stock Trading System")
     parser.add_argument(
         "--mode",
-        choices=["single", "continuous", "ui"],
+        choices=["single", "batch", "continuous", "ui"],
         default="ui",
-        help="Run mode: single round, continuous, or UI (default: ui)"
+        help="Run mode: single round, batch round (all tickers), continuous, or UI (default: ui)"
     )
     
     args = parser.parse_args()
     
+    logging.basicConfig(
+        level=get_settings().log_level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    
     if args.mode == "single":
-        asyncio.run(run_single_round())
+        run(run_single_round())
+    elif args.mode == "batch":
+        run(run_batch_round())
     elif args.mode == "continuous":
-        asyncio.run(run_continuous())
+        run(run_continuous())
     else:  # UI mode
         # Import and run UI
         from ui.gradio_ui import launch_ui
@@ -1,4 +1,4 @@
 """MCP Servers package."""
-from mcp_servers.base_server import BaseMCPServer, Tool, ToolParameter, ToolParameterType
+from mcp_servers.base_server import BaseMCPServer, Tool, ToolParameter, ToolParameterType, ToolResult
 
-__all__ = ["BaseMCPServer", "Tool", "ToolParameter", "ToolParameterType"]
+__all__ = ["BaseMCPServer", "Tool", "ToolParameter", "ToolParameterType", "ToolResult"]
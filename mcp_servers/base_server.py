@@ -3,10 +3,16 @@ Base MCP Server Interface.
 MCP (Model Context Protocol) servers provide tools to agents.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Callable
-from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Any, Callable, Optional, Sequence, Tuple
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
 from enum import Enum
+from functools import wraps
 import asyncio
+import inspect
+import threading
+import time
 
 
 class ToolParameterType(str, Enum):
@@ -19,7 +25,7 @@ class ToolParameterType(str, Enum):
     OBJECT = "object"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ToolParameter:
     """Tool parameter definition."""
     name: str
@@ -37,6 +43,136 @@ class Tool:
     parameters: List[ToolParameter]
     handler: Callable
     server_name: str
+    required_params: FrozenSet[str] = field(default_factory=frozenset)
+    is_async: bool = False
+    blocking: bool = False  # Sync handler doing blocking I/O; run in a worker thread
+
+
+@dataclass(slots=True)
+class ToolResult:
+    """Outcome of a tool call."""
+    success: bool
+    result: Any = None
+    error: str = ""
+    error_type: Optional[str] = None  # Exception class name when the handler raised
+    tool: str = ""
+    server: str = ""
+    
+    def unwrap(self, default: Any = None) -> Any:
+        """The tool's result, or default if the call failed."""
+        return self.result if self.success else default
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict form (for JSON, logs and UI display)."""
+        if self.success:
+            return {"success": True, "tool": self.tool, "server": self.server, "result": self.result}
+        response = {"success": False, "error": self.error, "tool": self.tool, "server": self.server}
+        if self.error_type:
+            response["error_type"] = self.error_type
+        return response
+
+
+# (epoch second, ISO string) of the last now_iso() clock read
+_iso_second = (0, "")
+
+
+def now_iso(milliseconds: bool = False) -> str:
+    """Current local time in ISO format, reformatted at most once a second; optionally with .mmm."""
+    global _iso_second
+    t = time.time()
+    second = int(t)
+    if second != _iso_second[0]:
+        _iso_second = (second, datetime.fromtimestamp(second).isoformat())
+    if milliseconds:
+        return f"{_iso_second[1]}.{int((t - second) * 1000):03d}"
+    return _iso_second[1]
+
+
+def cacheable(result: Any) -> bool:
+    """Whether a handler result came from the real API (not a mock or error fallback); non-dicts never are."""
+    return (
+        isinstance(result, dict)
+        and result.get("source") != "mock" and "error" not in result and "note" not in result
+    )
+
+
+def cache_key_factory(handler: Callable) -> Callable[..., tuple]:
+    """
+    Key function for a ttl_cached handler's calls (arguments after self).
+    Arguments are bound to the handler's signature, so positional, keyword and
+    default forms of the same call share one key.
+    """
+    signature = inspect.signature(handler)
+    
+    def cache_key(*args, **kwargs) -> tuple:
+        bound = signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        return tuple(bound.arguments.items())[1:]
+    return cache_key
+
+
+def ttl_cached(cache_name: str):
+    """
+    Cache a server handler's API results in the named TTLCache attribute, keyed by its arguments.
+    Concurrent misses for the same key share one fetch. Mock fallbacks and error
+    replies are not cached so the API is retried next call.
+    The wrapper's cache_key(*args, **kwargs) gives the key of a call, for use with cache_begin.
+    """
+    def decorator(handler):
+        cache_key = cache_key_factory(handler)
+        
+        @wraps(handler)
+        def wrapper(self, *args, **kwargs):
+            key = cache_key(*args, **kwargs)
+            result, inflight = self.cache_begin(cache_name, key)
+            if result is not None:
+                return result
+            if inflight is not None:
+                return inflight.result()
+            
+            try:
+                result = handler(self, *args, **kwargs)
+            except BaseException as e:
+                self.cache_end(cache_name, key, error=e)
+                raise
+            self.cache_end(cache_name, key, result)
+            return result
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
+
+
+def async_ttl_cached(cache_name: str):
+    """ttl_cached for async handlers; concurrent misses await one shared task."""
+    def decorator(handler):
+        cache_key = cache_key_factory(handler)
+        
+        @wraps(handler)
+        async def wrapper(self, *args, **kwargs):
+            cache = getattr(self, cache_name)
+            key = (cache_name, cache_key(*args, **kwargs))
+            with self._cache_lock:
+                result = cache.get(key)
+            if result is not None:
+                return result
+            
+            # Tasks left over from an event loop that has since closed are ignored
+            task = self._inflight_tasks.get(key)
+            if task is None or task.get_loop() is not asyncio.get_running_loop():
+                task = asyncio.ensure_future(handler(self, *args, **kwargs))
+                self._inflight_tasks[key] = task
+                
+                def _store(t: asyncio.Task):
+                    if self._inflight_tasks.get(key) is t:
+                        del self._inflight_tasks[key]
+                    if not t.cancelled() and t.exception() is None and cacheable(t.result()):
+                        with self._cache_lock:
+                            cache[key] = t.result()
+                task.add_done_callback(_store)
+            return await asyncio.shield(task)
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
 
 
 class BaseMCPServer(ABC):
@@ -45,12 +181,47 @@ class BaseMCPServer(ABC):
     Servers expose tools that agents can call.
     """
     
+    # Set by servers whose sync handlers make blocking network calls
+    blocking_io = False
+    
     def __init__(self, server_name: str, description: str):
         self.server_name = server_name
         self.description = description
         self.tools: Dict[str, Tool] = {}
+        self._tools_cache: Optional[List[Dict[str, Any]]] = None
+        
+        # Guards ttl_cached caches; blocking handlers run in worker threads
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[tuple, Future] = {}  # (cache name, key) -> fetch in progress
+        self._inflight_tasks: Dict[tuple, asyncio.Task] = {}  # Same, for async_ttl_cached
         self._register_tools()
     
+    def cache_begin(self, cache_name: str, key: tuple) -> Tuple[Any, Optional[Future]]:
+        """
+        Start a ttl_cached lookup. Returns (result, None) on a hit, (None, future) while
+        another caller fetches the key, or (None, None) after claiming the fetch, which
+        the caller must then finish with cache_end.
+        """
+        with self._cache_lock:
+            result = getattr(self, cache_name).get(key)
+            if result is not None:
+                return result, None
+            inflight = self._inflight.get((cache_name, key))
+            if inflight is None:
+                self._inflight[(cache_name, key)] = Future()
+            return None, inflight
+    
+    def cache_end(self, cache_name: str, key: tuple, result: Any = None, error: Optional[BaseException] = None):
+        """Finish a fetch claimed with cache_begin: cache a cacheable result and wake its waiters."""
+        with self._cache_lock:
+            future = self._inflight.pop((cache_name, key))
+            if error is None and cacheable(result):
+                getattr(self, cache_name)[key] = result
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
     @abstractmethod
     def _register_tools(self):
         """Register all tools provided by this server."""
@@ -69,57 +240,71 @@ class BaseMCPServer(ABC):
             description=description,
             parameters=parameters,
             handler=handler,
-            server_name=self.server_name
+            server_name=self.server_name,
+            required_params=frozenset(p.name for p in parameters if p.required),
+            is_async=asyncio.iscoroutinefunction(handler),
+            blocking=self.blocking_io
         )
         self.tools[name] = tool
+        self._tools_cache = None
+    
+    def register_tool_table(self, table: Sequence[Tuple[str, str, Sequence[ToolParameter], str]]):
+        """Register tools from a static (name, description, parameters, handler name) table."""
+        for name, description, parameters, handler_name in table:
+            self.register_tool(name, description, parameters, getattr(self, handler_name))
     
-    async def call_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
+    async def call_tool(self, tool_name: str, **kwargs) -> ToolResult:
         """
         Call a tool by name with provided arguments.
         Returns a structured result.
         """
-        if tool_name not in self.tools:
-            return {
-                "success": False,
-                "error": f"Tool '{tool_name}' not found in server '{self.server_name}'"
-            }
-        
-        tool = self.tools[tool_name]
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return ToolResult(
+                success=False,
+                error=f"Tool '{tool_name}' not found in server '{self.server_name}'",
+                tool=tool_name,
+                server=self.server_name
+            )
         
         try:
             # Validate parameters
-            missing_params = [
-                p.name for p in tool.parameters
-                if p.required and p.name not in kwargs
-            ]
+            missing_params = tool.required_params - kwargs.keys()
             if missing_params:
-                return {
-                    "success": False,
-                    "error": f"Missing required parameters: {missing_params}"
-                }
+                return ToolResult(
+                    success=False,
+                    error=f"Missing required parameters: {sorted(missing_params)}",
+                    tool=tool_name,
+                    server=self.server_name
+                )
             
             # Call handler
-            if asyncio.iscoroutinefunction(tool.handler):
+            if tool.is_async:
                 result = await tool.handler(**kwargs)
+            elif tool.blocking:
+                # Keep the event loop free while the handler waits on the network
+                result = await asyncio.to_thread(tool.handler, **kwargs)
             else:
                 result = tool.handler(**kwargs)
             
-            return {
-                "success": True,
-                "tool": tool_name,
-                "server": self.server_name,
-                "result": result
-            }
+            return ToolResult(success=True, result=result, tool=tool_name, server=self.server_name)
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "tool": tool_name,
-                "server": self.server_name
-            }
+            return ToolResult(
+                success=False,
+                error=str(e),
+                error_type=type(e).__name__,
+                tool=tool_name,
+                server=self.server_name
+            )
     
     def get_tools(self) -> List[Dict[str, Any]]:
-        """Get list of all tools with metadata."""
+        """Get list of all tools with metadata (built once; tools are fixed after registration)."""
+        if self._tools_cache is None:
+            self._tools_cache = self._build_tool_metadata()
+        return list(self._tools_cache)
+    
+    def _build_tool_metadata(self) -> List[Dict[str, Any]]:
+        """Serialize the registered tools' metadata."""
         return [
             {
                 "name": tool.name,
@@ -133,7 +318,8 @@ class BaseMCPServer(ABC):
                     }
                     for p in tool.parameters
                 ],
-                "server": self.server_name
+                "server": self.server_name,
+                "full_name": f"{self.server_name}.{tool.name}"
             }
             for tool in self.tools.values()
         ]
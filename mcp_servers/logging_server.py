@@ -2,27 +2,184 @@
 Logging & Metrics MCP Server
 Provides structured logging and metrics tracking.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
+from dataclasses import dataclass, field
 from datetime import datetime
-import json
+import atexit
+import logging
+import numpy as np
+import orjson
 import os
+import queue
+import threading
+import time
 from pathlib import Path
 from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
-from config import get_settings
+
+
+log = logging.getLogger(__name__)
+
+# (epoch seconds, datetime) of the last coarse_now() clock read
+_now_cache = (0.0, datetime.fromtimestamp(0))
+
+
+def coarse_now() -> datetime:
+    """Current local time at 1 ms granularity; bursts of log calls share one datetime."""
+    global _now_cache
+    t = time.time()
+    if t - _now_cache[0] >= 0.001:
+        _now_cache = (t, datetime.fromtimestamp(t))
+    return _now_cache[1]
+
+
+# Typed log entries; orjson serializes slots dataclasses directly, fields in order
+@dataclass(slots=True)
+class AgentDecisionLog:
+    """Agent decision log line."""
+    timestamp: datetime = field(default_factory=coarse_now, init=False)
+    type: str = field(default="agent_decision", init=False)
+    agent_id: str
+    agent_role: str
+    decision: str
+    rationale: str
+    confidence: float
+    data: Dict[str, Any]
+
+
+@dataclass(slots=True)
+class TradeExecutionLog:
+    """Trade execution log line."""
+    timestamp: datetime = field(default_factory=coarse_now, init=False)
+    type: str = field(default="trade_execution", init=False)
+    symbol: str
+    action: str
+    quantity: Optional[int]
+    price: Optional[float]
+    agent_id: Optional[str]
+    rationale: Optional[str]
+
+
+@dataclass(slots=True)
+class MarketEventLog:
+    """Market event log line."""
+    timestamp: datetime = field(default_factory=coarse_now, init=False)
+    type: str = field(default="market_event", init=False)
+    event_type: str
+    symbol: Optional[str]
+    data: Dict[str, Any]
+
+
+@dataclass(slots=True)
+class SystemEventLog:
+    """System event log line."""
+    timestamp: datetime = field(default_factory=coarse_now, init=False)
+    type: str = field(default="system_event", init=False)
+    level: str
+    event: str
+    details: Dict[str, Any]
+
+
+class MetricBuckets:
+    """
+    Per-bucket metric aggregates held as parallel float64 arrays.
+    Window summaries are a mask plus a few NumPy reductions.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.n = 0
+        self.rows: Dict[int, int] = {}  # bucket id -> row
+        self.ids = np.empty(capacity, np.int64)
+        self.count = np.empty(capacity, np.int64)
+        self.sum = np.empty(capacity, np.float64)
+        self.min = np.empty(capacity, np.float64)
+        self.max = np.empty(capacity, np.float64)
+        self.latest = np.empty(capacity, np.float64)
+        self.latest_ts = np.empty(capacity, np.float64)
+    
+    def _grow(self):
+        """Double every array's capacity."""
+        for name in ("ids", "count", "sum", "min", "max", "latest", "latest_ts"):
+            old = getattr(self, name)
+            new = np.empty(len(old) * 2, old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+    
+    def add(self, bucket_id: int, value: float, ts: float):
+        """Fold one sample into its bucket's running aggregates."""
+        row = self.rows.get(bucket_id)
+        if row is None:
+            if self.n == len(self.ids):
+                self._grow()
+            row = self.rows[bucket_id] = self.n
+            self.n += 1
+            self.ids[row] = bucket_id
+            self.count[row] = 1
+            self.sum[row] = self.min[row] = self.max[row] = self.latest[row] = value
+            self.latest_ts[row] = ts
+            return
+        self.count[row] += 1
+        self.sum[row] += value
+        self.min[row] = min(self.min[row], value)
+        self.max[row] = max(self.max[row], value)
+        if ts >= self.latest_ts[row]:
+            self.latest[row] = value
+            self.latest_ts[row] = ts
+    
+    def summary(self, cutoff_bucket: int) -> Optional[Dict[str, Any]]:
+        """Merged aggregates of buckets from cutoff_bucket on, or None if there are none."""
+        mask = self.ids[:self.n] >= cutoff_bucket
+        if not mask.any():
+            return None
+        count = int(self.count[:self.n][mask].sum())
+        latest_ts = self.latest_ts[:self.n][mask]
+        return {
+            "count": count,
+            "min": float(self.min[:self.n][mask].min()),
+            "max": float(self.max[:self.n][mask].max()),
+            "avg": float(self.sum[:self.n][mask].sum()) / count,
+            "latest": float(self.latest[:self.n][mask][latest_ts.argmax()])
+        }
 
 
 class LoggingServer(BaseMCPServer):
     """Logging & Metrics Server - Structured logging and metrics."""
     
+    # The writer wakes on the first queued entry, gathers more for up to
+    # flush_interval seconds, and writes at most log_batch_entries / log_batch_bytes at once
+    log_batch_entries = 128
+    log_batch_bytes = 65536
+    flush_interval = 0.005
+    
+    # Batches go out as one vectored write where the platform has writev
+    log_batch_max_lines = os.sysconf("SC_IOV_MAX") if hasattr(os, "writev") else 1024
+    
+    # The active log is rotated past log_rotate_bytes; only the newest rotated files are kept
+    log_rotate_bytes = 16 * 1024 * 1024
+    log_keep_rotated = 5
+    
+    # Metrics are aggregated into buckets of this many seconds; raw samples are opt-in
+    metric_bucket_seconds = 60
+    keep_raw_metrics = False
+    
     def __init__(self):
         super().__init__(
             server_name="logging_metrics",
             description="Provides structured logging and metrics tracking"
         )
-        self.settings = get_settings()
         self.log_dir = Path("logs")
         self.log_dir.mkdir(exist_ok=True)
-        self.metrics: Dict[str, List[Dict[str, Any]]] = {}
+        self.metrics: Dict[str, List[Dict[str, Any]]] = {}  # Raw samples, if keep_raw_metrics
+        self.metric_buckets: Dict[str, MetricBuckets] = {}
+        
+        # Callers only enqueue; the writer thread owns the file and batches entries into writev() calls
+        self.log_file = self.log_dir / "trading_floor.jsonl"
+        self._prune_rotated_logs()
+        self._log_fh = self._open_log()
+        self._log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._write_error: Optional[Exception] = None  # Last writer failure, cleared by the next good write
+        self._writer = threading.Thread(target=self._write_batches, name="log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
     
     def _register_tools(self):
         """Register logging and metrics tools."""
@@ -126,18 +283,9 @@ class LoggingServer(BaseMCPServer):
         data: Dict = None
     ) -> Dict[str, Any]:
         """Log agent decision."""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "type": "agent_decision",
-            "agent_id": agent_id,
-            "agent_role": agent_role,
-            "decision": decision,
-            "rationale": rationale,
-            "confidence": confidence,
-            "data": data or {}
-        }
-        
-        self._write_log_entry(log_entry)
+        self._write_log_entry(AgentDecisionLog(
+            agent_id, agent_role, decision, rationale, confidence, data or {}
+        ))
         return {"success": True, "logged": True}
     
     def _log_trade_execution(
@@ -150,31 +298,12 @@ class LoggingServer(BaseMCPServer):
         rationale: str = None
     ) -> Dict[str, Any]:
         """Log trade execution."""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "type": "trade_execution",
-            "symbol": symbol,
-            "action": action,
-            "quantity": quantity,
-            "price": price,
-            "agent_id": agent_id,
-            "rationale": rationale
-        }
-        
-        self._write_log_entry(log_entry)
+        self._write_log_entry(TradeExecutionLog(symbol, action, quantity, price, agent_id, rationale))
         return {"success": True, "logged": True}
     
     def _log_market_event(self, event_type: str, symbol: str = None, data: Dict = None) -> Dict[str, Any]:
         """Log market event."""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "type": "market_event",
-            "event_type": event_type,
-            "symbol": symbol,
-            "data": data or {}
-        }
-        
-        self._write_log_entry(log_entry)
+        self._write_log_entry(MarketEventLog(event_type, symbol, data or {}))
         return {"success": True, "logged": True}
     
     def _record_metric(
@@ -182,64 +311,63 @@ class LoggingServer(BaseMCPServer):
         metric_name: str,
         value: float,
         tags: Dict = None,
-        timestamp: str = None
+        timestamp: Union[str, float, None] = None
     ) -> Dict[str, Any]:
-        """Record a metric."""
+        """Record a metric; timestamp may be ISO format or epoch seconds."""
+        # Epoch seconds are fixed once here so queries compare floats instead of parsing
         if timestamp is None:
-            timestamp = datetime.now().isoformat()
+            ts = time.time()
+        elif isinstance(timestamp, (int, float)):
+            ts = float(timestamp)
+        else:
+            ts = datetime.fromisoformat(timestamp).timestamp()
         
-        metric_entry = {
-            "timestamp": timestamp,
-            "metric_name": metric_name,
-            "value": value,
-            "tags": tags or {}
-        }
+        buckets = self.metric_buckets.get(metric_name)
+        if buckets is None:
+            buckets = self.metric_buckets[metric_name] = MetricBuckets()
+        buckets.add(int(ts // self.metric_bucket_seconds), value, ts)
         
-        if metric_name not in self.metrics:
-            self.metrics[metric_name] = []
-        self.metrics[metric_name].append(metric_entry)
+        if self.keep_raw_metrics:
+            self.metrics.setdefault(metric_name, []).append({
+                "timestamp": timestamp if isinstance(timestamp, str) else datetime.fromtimestamp(ts).isoformat(),
+                "_ts": ts,
+                "metric_name": metric_name,
+                "value": value,
+                "tags": tags or {}
+            })
         
         return {"success": True, "metric_recorded": True}
     
     def _get_metrics_summary(self, metric_name: str = None, time_window: int = 24) -> Dict[str, Any]:
         """Get metrics summary."""
-        cutoff_time = datetime.now().timestamp() - (time_window * 3600)
+        cutoff_bucket = int((time.time() - time_window * 3600) // self.metric_bucket_seconds)
         
         if metric_name:
-            if metric_name not in self.metrics:
-                return {"metric_name": metric_name, "count": 0, "summary": {}}
-            
-            values = [
-                m["value"] for m in self.metrics[metric_name]
-                if datetime.fromisoformat(m["timestamp"]).timestamp() > cutoff_time
-            ]
-            
-            if not values:
+            buckets = self.metric_buckets.get(metric_name)
+            agg = buckets.summary(cutoff_bucket) if buckets else None
+            if agg is None:
                 return {"metric_name": metric_name, "count": 0, "summary": {}}
             
             return {
                 "metric_name": metric_name,
-                "count": len(values),
+                "count": agg["count"],
                 "summary": {
-                    "min": min(values),
-                    "max": max(values),
-                    "avg": sum(values) / len(values),
-                    "latest": values[-1]
+                    "min": agg["min"],
+                    "max": agg["max"],
+                    "avg": agg["avg"],
+                    "latest": agg["latest"]
                 }
             }
         else:
             # All metrics
             summary = {}
-            for name, entries in self.metrics.items():
-                values = [
-                    m["value"] for m in entries
-                    if datetime.fromisoformat(m["timestamp"]).timestamp() > cutoff_time
-                ]
-                if values:
+            for name, buckets in self.metric_buckets.items():
+                agg = buckets.summary(cutoff_bucket)
+                if agg is not None:
                     summary[name] = {
-                        "count": len(values),
-                        "avg": sum(values) / len(values),
-                        "latest": values[-1]
+                        "count": agg["count"],
+                        "avg": agg["avg"],
+                        "latest": agg["latest"]
                     }
             return {"metrics": summary, "time_window_hours": time_window}
     
@@ -261,19 +389,107 @@ class LoggingServer(BaseMCPServer):
     
     def _log_system_event(self, event: str, level: str = "INFO", details: Dict = None) -> Dict[str, Any]:
         """Log system event."""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "type": "system_event",
-            "level": level,
-            "event": event,
-            "details": details or {}
-        }
-        
-        self._write_log_entry(log_entry)
+        self._write_log_entry(SystemEventLog(level, event, details or {}))
         return {"success": True, "logged": True}
     
-    def _write_log_entry(self, log_entry: Dict[str, Any]):
-        """Write log entry to file."""
-        log_file = self.log_dir / "trading_floor.jsonl"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
+    def _write_log_entry(self, log_entry: Any):
+        """Queue a log entry (dict or log dataclass) for the writer thread."""
+        if not self._writer.is_alive():
+            raise RuntimeError("Log writer is not running")
+        # orjson emits bytes and serializes datetimes and dataclasses natively
+        self._log_queue.put(orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE))
+        # While writes are failing, report it; the entry is still queued and the next good write clears this
+        if self._write_error is not None:
+            raise self._write_error
+    
+    def _write_batches(self):
+        """
+        Writer thread: block for an entry, gather a batch and write it.
+        Besides log lines the queue carries flush barriers (Events) and a None stop marker.
+        """
+        max_lines = min(self.log_batch_entries, self.log_batch_max_lines)
+        while True:
+            item = self._log_queue.get()
+            batch, size, barriers = [], 0, []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None or isinstance(item, threading.Event):
+                    barriers.append(item)
+                    break
+                batch.append(item)
+                size += len(item)
+                if len(batch) >= max_lines or size >= self.log_batch_bytes:
+                    break
+                try:
+                    item = self._log_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            
+            try:
+                if batch:
+                    if self._log_fh.closed:
+                        self._log_fh = self._open_log()
+                    self._write_lines(batch, size)
+                    self._bytes_written += size
+                    if self._bytes_written >= self.log_rotate_bytes:
+                        self._rotate_log()
+                    self._write_error = None
+            except (OSError, ValueError) as e:
+                # Disk full, I/O error or failed rotation: drop this batch but keep draining the queue
+                if self._write_error is None:
+                    log.error("Failed to write %d log entries", len(batch), exc_info=True)
+                self._write_error = e
+            finally:
+                for barrier in barriers:
+                    if barrier is not None:
+                        barrier.set()
+            if None in barriers:
+                self._log_fh.close()
+                return
+    
+    def flush(self):
+        """Block until every entry queued so far has been written."""
+        if self._writer.is_alive():
+            barrier = threading.Event()
+            self._log_queue.put(barrier)
+            barrier.wait()
+    
+    def _write_lines(self, lines: List[bytes], size: int):
+        """Write lines with writev, avoiding a join copy; finishes any short write with plain writes."""
+        if not hasattr(os, "writev"):
+            self._log_fh.write(b"".join(lines))
+            return
+        written = os.writev(self._log_fh.fileno(), lines)
+        if written < size:
+            rest = b"".join(lines)[written:]
+            while rest:
+                rest = rest[self._log_fh.write(rest):]
+    
+    def _open_log(self):
+        """Open the active log for appending; its size is read once here, then tracked in memory."""
+        fh = open(self.log_file, "ab", buffering=0)
+        self._bytes_written = fh.tell()
+        return fh
+    
+    def _rotate_log(self):
+        """Move the full active log aside and start a new one (writer thread only)."""
+        self._log_fh.close()
+        try:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            os.rename(self.log_file, self.log_file.with_suffix(f".{stamp}.jsonl"))
+            self._prune_rotated_logs()
+        finally:
+            # Keep writing (to the old file if the rename failed)
+            self._log_fh = self._open_log()
+    
+    def _prune_rotated_logs(self):
+        """Delete all but the newest log_keep_rotated rotated logs."""
+        rotated = sorted(self.log_dir.glob(f"{self.log_file.stem}.*.jsonl"))
+        for path in rotated[:-self.log_keep_rotated or None]:
+            path.unlink(missing_ok=True)
+    
+    def close(self):
+        """Write remaining entries, stop the writer and close the log file."""
+        if self._writer.is_alive():
+            self._log_queue.put(None)
+            self._writer.join()
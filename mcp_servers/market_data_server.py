@@ -5,23 +5,80 @@ Fallback to mock data if API unavailable.
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-import requests
-from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
+from cachetools import TTLCache
+import asyncio
+import httpx
+import importlib.util
+import numpy as np
+import orjson
+import pandas as pd
+import re
+from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType, ttl_cached
 from config import get_settings
 
 
+# Polygon aggregate bar fields -> candle keys
+BAR_COLUMNS = {"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume"}
+
+
+def bars_to_records(results: List[Dict[str, Any]], time_key: str, time_format: str) -> List[Dict[str, Any]]:
+    """
+    Convert Polygon aggregate bars to candle dicts column-wise.
+    Epoch-millisecond times are formatted in local time in one vectorized pass.
+    """
+    if not results:
+        return []
+    bars = pd.DataFrame.from_records(results, columns=["t", *BAR_COLUMNS])
+    local_tz = datetime.now().astimezone().tzinfo
+    times = pd.to_datetime(bars["t"], unit="ms", utc=True).dt.tz_convert(local_tz)
+    candles = bars[list(BAR_COLUMNS)].rename(columns=BAR_COLUMNS)
+    candles.insert(0, time_key, times.dt.strftime(time_format))
+    return candles.to_dict("records")
+
+
+# The last-quote ask price ("P"), read straight from the response bytes
+PRICE_RE = re.compile(rb'"P"\s*:\s*([0-9.eE+-]+)')
+
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); fall back to HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
 class MarketDataServer(BaseMCPServer):
     """Market Data Server - Polygon API integration."""
     
+    blocking_io = True
+    
     def __init__(self):
         super().__init__(
             server_name="market_data",
             description="Provides real-time and historical market data via Polygon API"
         )
-        self.settings = get_settings()
-        self.api_key = self.settings.polygon_api_key
+        self.api_key = get_settings().polygon_api_key
         self.base_url = "https://api.polygon.io"
-        self.cache: Dict[str, Any] = {}
+        
+        # One pooled client; over HTTP/2 back-to-back calls multiplex on a single TLS connection
+        self._auth_headers = {"Authorization": f"Bearer {self.api_key}"}
+        self._http = httpx.Client(
+            headers=self._auth_headers,
+            timeout=10.0,
+            transport=httpx.HTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                retries=2,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+            )
+        )
+        
+        # Async client for batched lookups, bound to the running event loop on first use
+        self._async_loop = None
+        self._async_client: httpx.AsyncClient = None
+        
+        # Bounded per-endpoint caches
+        self._price_cache = TTLCache(maxsize=2048, ttl=60)
+        self._candle_cache = TTLCache(maxsize=512, ttl=30)
+        self._daily_cache = TTLCache(maxsize=512, ttl=86400)
+        self._ticker_cache = TTLCache(maxsize=4096, ttl=3600)
+        self._status_cache = TTLCache(maxsize=1, ttl=10)
     
     def _register_tools(self):
         """Register market data tools."""
@@ -36,6 +93,16 @@ class MarketDataServer(BaseMCPServer):
             handler=self._get_latest_price
         )
         
+        # Tool 1b: Get latest prices for several symbols at once
+        self.register_tool(
+            name="get_prices_batch",
+            description="Get the latest prices for several stock symbols concurrently",
+            parameters=[
+                ToolParameter("symbols", ToolParameterType.ARRAY, "Stock ticker symbols", True)
+            ],
+            handler=self._get_prices_batch
+        )
+        
         # Tool 2: Get intraday candles
         self.register_tool(
             name="fetch_intraday_candles",
@@ -77,34 +144,93 @@ class MarketDataServer(BaseMCPServer):
             handler=self._get_market_status
         )
     
+    @ttl_cached("_price_cache")
     def _get_latest_price(self, symbol: str) -> Dict[str, Any]:
         """Get latest price for a symbol."""
-        cache_key = f"price_{symbol}"
-        if cache_key in self.cache:
-            cached_time, cached_data = self.cache[cache_key]
-            if (datetime.now() - cached_time).seconds < 60:  # 1 min cache
-                return cached_data
-        
         try:
             url = f"{self.base_url}/v2/last/nbbo/{symbol}"
-            params = {"apikey": self.api_key}
-            response = requests.get(url, params=params, timeout=5)
+            response = self._http.get(url, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
-                price_data = {
-                    "symbol": symbol,
-                    "price": data.get("results", {}).get("P", 0),
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "polygon"
-                }
-                self.cache[cache_key] = (datetime.now(), price_data)
-                return price_data
+                return self._price_data(symbol, response.content)
             else:
                 return self._mock_price(symbol)
         except Exception as e:
             return self._mock_price(symbol)
     
+    def _price_data(self, symbol: str, content: bytes) -> Dict[str, Any]:
+        """Price result from a Polygon last-quote response body."""
+        # Only one field is needed, so skip the full parse unless the regex misses
+        match = PRICE_RE.search(content)
+        if match:
+            price = float(match.group(1))
+        else:
+            price = orjson.loads(content).get("results", {}).get("P", 0)
+        return {
+            "symbol": symbol,
+            "price": price,
+            "timestamp": datetime.now().isoformat(),
+            "source": "polygon"
+        }
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Pooled async client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._async_loop:
+            self._async_loop = loop
+            self._async_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                headers=self._auth_headers,
+                limits=httpx.Limits(max_connections=64),
+                timeout=5
+            )
+        return self._async_client
+    
+    async def _fetch_price_async(self, client: httpx.AsyncClient, symbol: str) -> Dict[str, Any]:
+        """Fetch one latest price on the async client, falling back to mock data."""
+        try:
+            response = await client.get(f"{self.base_url}/v2/last/nbbo/{symbol}")
+            if response.status_code == 200:
+                return self._price_data(symbol, response.content)
+            return self._mock_price(symbol)
+        except Exception as e:
+            return self._mock_price(symbol)
+    
+    async def _get_prices_batch(self, symbols: List[str]) -> Dict[str, Any]:
+        """
+        Get latest prices for several symbols, fetching cache misses concurrently.
+        Shares the get_latest_price cache, so total latency is the slowest miss.
+        """
+        prices, waiting, missing = {}, {}, []
+        for symbol in dict.fromkeys(symbols):
+            key = self._get_latest_price.cache_key(symbol)
+            cached, inflight = self.cache_begin("_price_cache", key)
+            if cached is not None:
+                prices[symbol] = cached
+            elif inflight is not None:
+                # Another call is already fetching this symbol; share its result
+                waiting[symbol] = asyncio.wrap_future(inflight)
+            else:
+                missing.append((symbol, key))
+        
+        if missing:
+            client = self._get_async_client()
+            try:
+                fetched = await asyncio.gather(*(self._fetch_price_async(client, symbol) for symbol, _ in missing))
+            except BaseException as e:
+                for _, key in missing:
+                    self.cache_end("_price_cache", key, error=e)
+                raise
+            for (symbol, key), price_data in zip(missing, fetched):
+                self.cache_end("_price_cache", key, price_data)
+                prices[symbol] = price_data
+        for symbol, future in waiting.items():
+            prices[symbol] = await future
+        
+        prices = {symbol: prices[symbol] for symbol in dict.fromkeys(symbols)}
+        return {"prices": prices, "count": len(prices)}
+    
+    @ttl_cached("_candle_cache")
     def _fetch_intraday_candles(self, symbol: str, interval: str = "15min", limit: int = 100) -> Dict[str, Any]:
         """Fetch intraday candle data."""
         try:
@@ -114,29 +240,19 @@ class MarketDataServer(BaseMCPServer):
             timespan = "minute" if multiplier < 60 else "hour"
             
             url = f"{self.base_url}/v2/aggs/ticker/{symbol}/range/{multiplier}/{timespan}/{datetime.now().strftime('%Y-%m-%d')}/{datetime.now().strftime('%Y-%m-%d')}"
-            params = {"apikey": self.api_key, "limit": limit, "adjusted": "true"}
-            response = requests.get(url, params=params, timeout=10)
+            params = {"limit": limit, "adjusted": "true"}
+            response = self._http.get(url, params=params, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
-                results = data.get("results", [])
-                candles = [
-                    {
-                        "timestamp": datetime.fromtimestamp(r["t"] / 1000).isoformat(),
-                        "open": r["o"],
-                        "high": r["h"],
-                        "low": r["l"],
-                        "close": r["c"],
-                        "volume": r["v"]
-                    }
-                    for r in results
-                ]
+                data = orjson.loads(response.content)
+                candles = bars_to_records(data.get("results", []), "timestamp", "%Y-%m-%dT%H:%M:%S")
                 return {"symbol": symbol, "interval": interval, "candles": candles, "count": len(candles)}
             else:
                 return self._mock_candles(symbol, interval, limit)
         except Exception as e:
             return self._mock_candles(symbol, interval, limit)
     
+    @ttl_cached("_daily_cache")
     def _get_daily_aggregates(self, symbol: str, days: int = 30) -> Dict[str, Any]:
         """Get daily aggregates."""
         end_date = datetime.now()
@@ -144,38 +260,27 @@ class MarketDataServer(BaseMCPServer):
         
         try:
             url = f"{self.base_url}/v2/aggs/ticker/{symbol}/range/1/day/{start_date.strftime('%Y-%m-%d')}/{end_date.strftime('%Y-%m-%d')}"
-            params = {"apikey": self.api_key, "adjusted": "true", "sort": "asc"}
-            response = requests.get(url, params=params, timeout=10)
+            params = {"adjusted": "true", "sort": "asc"}
+            response = self._http.get(url, params=params, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
-                results = data.get("results", [])
-                daily_data = [
-                    {
-                        "date": datetime.fromtimestamp(r["t"] / 1000).strftime("%Y-%m-%d"),
-                        "open": r["o"],
-                        "high": r["h"],
-                        "low": r["l"],
-                        "close": r["c"],
-                        "volume": r["v"]
-                    }
-                    for r in results
-                ]
+                data = orjson.loads(response.content)
+                daily_data = bars_to_records(data.get("results", []), "date", "%Y-%m-%d")
                 return {"symbol": symbol, "days": days, "data": daily_data}
             else:
                 return self._mock_daily_data(symbol, days)
         except Exception as e:
             return self._mock_daily_data(symbol, days)
     
+    @ttl_cached("_ticker_cache")
     def _get_ticker_details(self, symbol: str) -> Dict[str, Any]:
         """Get ticker details."""
         try:
             url = f"{self.base_url}/v3/reference/tickers/{symbol}"
-            params = {"apikey": self.api_key}
-            response = requests.get(url, params=params, timeout=5)
+            response = self._http.get(url, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 result = data.get("results", {})
                 return {
                     "symbol": symbol,
@@ -190,15 +295,15 @@ class MarketDataServer(BaseMCPServer):
         except Exception as e:
             return {"symbol": symbol, "name": f"{symbol} Inc.", "error": str(e)}
     
+    @ttl_cached("_status_cache")
     def _get_market_status(self) -> Dict[str, Any]:
         """Get market status."""
         try:
             url = f"{self.base_url}/v1/marketstatus/now"
-            params = {"apikey": self.api_key}
-            response = requests.get(url, params=params, timeout=5)
+            response = self._http.get(url, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return {
                     "market": "open" if data.get("market") == "open" else "closed",
                     "exchanges": data.get("exchanges", {}),
@@ -220,40 +325,38 @@ class MarketDataServer(BaseMCPServer):
     
     def _mock_candles(self, symbol: str, interval: str, limit: int) -> Dict[str, Any]:
         """Mock candle data."""
-        import random
         base_prices = {"AAPL": 180, "MSFT": 380, "GOOGL": 140, "AMZN": 150, "TSLA": 250}
         base = base_prices.get(symbol, 100)
-        candles = []
-        current_price = base
+        rng = np.random.default_rng()
+        prices = base * np.cumprod(1 + rng.uniform(-0.01, 0.01, size=limit))
         
-        for i in range(limit):
-            current_price *= (1 + random.uniform(-0.01, 0.01))
-            candles.append({
-                "timestamp": (datetime.now() - timedelta(minutes=(limit-i)*15)).isoformat(),
-                "open": round(current_price * 0.999, 2),
-                "high": round(current_price * 1.002, 2),
-                "low": round(current_price * 0.998, 2),
-                "close": round(current_price, 2),
-                "volume": random.randint(1000000, 5000000)
-            })
+        candles = pd.DataFrame({
+            "timestamp": pd.date_range(
+                end=datetime.now() - timedelta(minutes=15), periods=limit, freq="15min"
+            ).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "open": np.round(prices * 0.999, 2),
+            "high": np.round(prices * 1.002, 2),
+            "low": np.round(prices * 0.998, 2),
+            "close": np.round(prices, 2),
+            "volume": rng.integers(1000000, 5000000, size=limit, endpoint=True)
+        }).to_dict("records")
         return {"symbol": symbol, "interval": interval, "candles": candles, "count": len(candles), "source": "mock"}
     
     def _mock_daily_data(self, symbol: str, days: int) -> Dict[str, Any]:
         """Mock daily data."""
-        import random
         base_prices = {"AAPL": 180, "MSFT": 380, "GOOGL": 140, "AMZN": 150, "TSLA": 250}
         base = base_prices.get(symbol, 100)
-        data = []
-        current_price = base
+        rng = np.random.default_rng()
+        prices = base * np.cumprod(1 + rng.uniform(-0.03, 0.03, size=days))
         
-        for i in range(days):
-            current_price *= (1 + random.uniform(-0.03, 0.03))
-            data.append({
-                "date": (datetime.now() - timedelta(days=days-i)).strftime("%Y-%m-%d"),
-                "open": round(current_price * 0.99, 2),
-                "high": round(current_price * 1.02, 2),
-                "low": round(current_price * 0.98, 2),
-                "close": round(current_price, 2),
-                "volume": random.randint(10000000, 50000000)
-            })
+        data = pd.DataFrame({
+            "date": pd.date_range(
+                end=datetime.now() - timedelta(days=1), periods=days, freq="D"
+            ).strftime("%Y-%m-%d"),
+            "open": np.round(prices * 0.99, 2),
+            "high": np.round(prices * 1.02, 2),
+            "low": np.round(prices * 0.98, 2),
+            "close": np.round(prices, 2),
+            "volume": rng.integers(10000000, 50000000, size=days, endpoint=True)
+        }).to_dict("records")
         return {"symbol": symbol, "days": days, "data": data, "source": "mock"}
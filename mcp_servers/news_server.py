@@ -4,10 +4,117 @@ Provides financial news and sentiment tools using Brave API.
 Fallback to mock data if API unavailable.
 """
 from typing import Dict, Any, List
+from collections import Counter
 from datetime import datetime
-import requests
-from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
+from functools import lru_cache
+from itertools import islice
+from cachetools import TTLCache
+import asyncio
+import httpx
+import importlib.util
+import numpy as np
+import orjson
+import re
+from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType, async_ttl_cached
 from config import get_settings
+from core.resilience import CircuitBreaker, CircuitOpenError
+
+
+# VADER (vaderSentiment) is optional; without it sentiment falls back to keyword scoring
+VADER_AVAILABLE = importlib.util.find_spec("vaderSentiment") is not None
+
+# Keyword sentiment lexicon. Keywords are stems matched at the start of a word
+# ("surge" hits "surges", "up" hits "upgrade" but not "support"); one group per
+# keyword so a match's lastindex names it
+POSITIVE_KEYWORDS = ("surge", "gain", "growth", "beat", "strong", "up", "rally", "profit")
+NEGATIVE_KEYWORDS = ("fall", "drop", "decline", "miss", "weak", "down", "loss", "risk")
+SENTIMENT_RE = re.compile(
+    r"\b(?:" + "|".join(f"({re.escape(kw)})" for kw in POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS) + ")"
+)
+SENTIMENT_SIGN = np.array([1] * len(POSITIVE_KEYWORDS) + [-1] * len(NEGATIVE_KEYWORDS))
+
+# Keyword extraction: words of 4+ letters, minus generic finance vocabulary
+WORD_RE = re.compile(r"\b[a-z]{4,}\b")
+FINANCIAL_TERMS = frozenset({
+    "stock", "market", "trading", "price", "earnings", "revenue", "profit",
+    "growth", "investor", "share", "dividend", "analyst", "forecast"
+})
+
+
+def normalized_text(article: Dict[str, Any]) -> str:
+    """Lowercased "title description" used by keyword scoring and extraction."""
+    return (article.get("title", "") + " " + article.get("description", "")).lower()
+
+
+def article_from_result(r: Dict[str, Any]) -> Dict[str, Any]:
+    """Article dict from one Brave search result."""
+    return {
+        "title": r.get("title", ""),
+        "url": r.get("url", ""),
+        "description": r.get("description", ""),
+        "published_time": r.get("age", ""),
+        "source": r.get("meta_url", {}).get("hostname", "")
+    }
+
+
+MOCK_TONES = ("strong", "mixed", "volatile")
+
+# Brave returns at most this many results per news search
+MAX_NEWS_COUNT = 20
+
+
+@lru_cache(maxsize=128)
+def mock_articles(query: str, count: int) -> tuple:
+    """Deterministic mock articles, built once per (query, count)."""
+    return tuple(
+        article_from_result({
+            "title": f"Financial News: {query} shows {MOCK_TONES[i % 3]} performance",
+            "url": f"https://example.com/news/{i}",
+            "description": f"Recent developments in {query} indicate market interest.",
+            "age": f"{count - i} hours ago",
+            "meta_url": {"hostname": "example.com"}
+        })
+        for i in range(count)
+    )
+
+
+# Static tool table: (name, description, parameters, handler method); parameters are shared across instances
+NEWS_TOOLS = (
+    # Tool 6: Search financial news
+    ("search_financial_news", "Search for financial news about a ticker or topic", (
+        ToolParameter("query", ToolParameterType.STRING, "Search query (ticker symbol or topic)", True),
+        ToolParameter("count", ToolParameterType.INTEGER, "Number of articles to return", False, 10),
+    ), "_search_financial_news"),
+
+    # Tool 7: Get ticker news
+    ("get_ticker_news", "Get recent news for a specific ticker", (
+        ToolParameter("symbol", ToolParameterType.STRING, "Stock ticker symbol", True),
+        ToolParameter("count", ToolParameterType.INTEGER, "Number of articles", False, 10),
+    ), "_get_ticker_news"),
+
+    # Tool 7b: Get news for several tickers
+    ("get_ticker_news_batch", "Get recent news for several tickers concurrently", (
+        ToolParameter("symbols", ToolParameterType.ARRAY, "Stock ticker symbols", True),
+        ToolParameter("count", ToolParameterType.INTEGER, "Number of articles per ticker", False, 10),
+    ), "_get_ticker_news_batch"),
+
+    # Tool 8: Summarize news sentiment
+    ("summarize_news_sentiment", "Analyze and summarize sentiment from news articles", (
+        ToolParameter("symbol", ToolParameterType.STRING, "Stock ticker symbol", True),
+        ToolParameter("news_articles", ToolParameterType.ARRAY, "Array of news article objects", False),
+        ToolParameter("method", ToolParameterType.STRING, "Scoring method: vader or keyword_based", False, "vader"),
+    ), "_summarize_news_sentiment"),
+
+    # Tool 9: Get market news
+    ("get_market_news", "Get general market news", (
+        ToolParameter("count", ToolParameterType.INTEGER, "Number of articles", False, 10),
+    ), "_get_market_news"),
+
+    # Tool 10: Extract news keywords
+    ("extract_news_keywords", "Extract key terms and keywords from news", (
+        ToolParameter("articles", ToolParameterType.ARRAY, "Array of news articles", True),
+    ), "_extract_news_keywords"),
+)
 
 
 class NewsServer(BaseMCPServer):
@@ -18,169 +125,155 @@ class NewsServer(BaseMCPServer):
             server_name="news_search",
             description="Provides financial news search and sentiment analysis via Brave API"
         )
-        self.settings = get_settings()
-        self.api_key = self.settings.brave_api_key
+        self.api_key = get_settings().brave_api_key
         self.base_url = "https://api.search.brave.com/res/v1"
-    
-    def _register_tools(self):
-        """Register news and sentiment tools."""
-        
-        # Tool 6: Search financial news
-        self.register_tool(
-            name="search_financial_news",
-            description="Search for financial news about a ticker or topic",
-            parameters=[
-                ToolParameter("query", ToolParameterType.STRING, "Search query (ticker symbol or topic)", True),
-                ToolParameter("count", ToolParameterType.INTEGER, "Number of articles to return", False, 10)
-            ],
-            handler=self._search_financial_news
-        )
         
-        # Tool 7: Get ticker news
-        self.register_tool(
-            name="get_ticker_news",
-            description="Get recent news for a specific ticker",
-            parameters=[
-                ToolParameter("symbol", ToolParameterType.STRING, "Stock ticker symbol", True),
-                ToolParameter("count", ToolParameterType.INTEGER, "Number of articles", False, 10)
-            ],
-            handler=self._get_ticker_news
-        )
+        # Repeat searches within five minutes are served from memory
+        self._news_cache = TTLCache(maxsize=256, ttl=300)
         
-        # Tool 8: Summarize news sentiment
-        self.register_tool(
-            name="summarize_news_sentiment",
-            description="Analyze and summarize sentiment from news articles",
-            parameters=[
-                ToolParameter("symbol", ToolParameterType.STRING, "Stock ticker symbol", True),
-                ToolParameter("news_articles", ToolParameterType.ARRAY, "Array of news article objects", False)
-            ],
-            handler=self._summarize_news_sentiment
-        )
+        # While Brave keeps failing, serve mock news instead of waiting out each timeout
+        self._brave_breaker = CircuitBreaker("brave", fail_max=3, reset_timeout=60.0)
         
-        # Tool 9: Get market news
-        self.register_tool(
-            name="get_market_news",
-            description="Get general market news",
-            parameters=[
-                ToolParameter("count", ToolParameterType.INTEGER, "Number of articles", False, 10)
-            ],
-            handler=self._get_market_news
-        )
+        # Keep-alive async client and a 4-request Brave limit, bound to the running loop on first use
+        self._loop = None
+        self._client: httpx.AsyncClient = None
+        self._brave_slots: asyncio.Semaphore = None
         
-        # Tool 10: Extract news keywords
-        self.register_tool(
-            name="extract_news_keywords",
-            description="Extract key terms and keywords from news",
-            parameters=[
-                ToolParameter("articles", ToolParameterType.ARRAY, "Array of news articles", True)
-            ],
-            handler=self._extract_news_keywords
-        )
+        # VADER analyzer, created on first use
+        self._sia = None
+    
+    def _register_tools(self):
+        """Register news and sentiment tools."""
+        self.register_tool_table(NEWS_TOOLS)
+    
+    def _bind_loop(self):
+        """(Re)create loop-bound HTTP resources when called from a new event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                headers={"X-Subscription-Token": self.api_key},
+                timeout=10,
+                limits=httpx.Limits(max_connections=20, keepalive_expiry=60),
+                transport=httpx.AsyncHTTPTransport(retries=2)
+            )
+            self._brave_slots = asyncio.Semaphore(4)
     
-    def _search_financial_news(self, query: str, count: int = 10) -> Dict[str, Any]:
+    @async_ttl_cached("_news_cache")
+    async def _search_financial_news(self, query: str, count: int = 10) -> Dict[str, Any]:
         """Search for financial news."""
+        self._bind_loop()
+        # Cap once so the Brave request, the slice below and the mock fallback agree
+        count = max(0, min(count, MAX_NEWS_COUNT))
         try:
+            self._brave_breaker.check()
             url = f"{self.base_url}/news/search"
-            headers = {"X-Subscription-Token": self.api_key}
             params = {
                 "q": f"{query} stock financial news",
-                "count": min(count, 20),
+                "count": count,
                 "freshness": "pw"  # Past week
             }
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get("web", {}).get("results", [])
-                articles = [
-                    {
-                        "title": r.get("title", ""),
-                        "url": r.get("url", ""),
-                        "description": r.get("description", ""),
-                        "published_time": r.get("age", ""),
-                        "source": r.get("meta_url", {}).get("hostname", "")
-                    }
-                    for r in results[:count]
-                ]
-                return {"query": query, "articles": articles, "count": len(articles)}
-            else:
-                return self._mock_news(query, count)
-        except Exception as e:
+            async with self._brave_slots:
+                response = await self._client.get(url, params=params)
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+        except CircuitOpenError:
             return self._mock_news(query, count)
+        except (httpx.HTTPError, ValueError):
+            # Network, HTTP status or JSON decode failure
+            self._brave_breaker.record_failure()
+            return self._mock_news(query, count)
+        self._brave_breaker.record_success()
+        
+        results = data.get("web", {}).get("results", [])
+        articles = list(map(article_from_result, islice(results, count)))
+        return {"query": query, "articles": articles, "count": len(articles)}
     
-    def _get_ticker_news(self, symbol: str, count: int = 10) -> Dict[str, Any]:
+    async def _get_ticker_news(self, symbol: str, count: int = 10) -> Dict[str, Any]:
         """Get news for a specific ticker."""
-        return self._search_financial_news(f"{symbol} stock", count)
+        return await self._search_financial_news(f"{symbol} stock", count)
+    
+    async def _get_ticker_news_batch(self, symbols: List[str], count: int = 10) -> Dict[str, Any]:
+        """Get news for several tickers, fetching them concurrently."""
+        symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(self._get_ticker_news(symbol, count) for symbol in symbols))
+        news = dict(zip(symbols, results))
+        return {"news": news, "count": len(news)}
     
-    def _summarize_news_sentiment(self, symbol: str, news_articles: List[Dict] = None) -> Dict[str, Any]:
-        """Summarize sentiment from news (simplified - would use LLM in production)."""
+    async def _summarize_news_sentiment(
+        self,
+        symbol: str,
+        news_articles: List[Dict] = None,
+        method: str = "vader"
+    ) -> Dict[str, Any]:
+        """Summarize sentiment from news with VADER, or keyword scoring if asked or VADER is missing."""
         if news_articles is None:
-            news_result = self._get_ticker_news(symbol, 10)
+            news_result = await self._get_ticker_news(symbol, 10)
             news_articles = news_result.get("articles", [])
         
-        # Simple keyword-based sentiment (in production, use LLM)
-        positive_keywords = ["surge", "gain", "growth", "beat", "strong", "up", "rally", "profit"]
-        negative_keywords = ["fall", "drop", "decline", "miss", "weak", "down", "loss", "risk"]
-        
-        sentiment_scores = []
-        for article in news_articles:
-            text = (article.get("title", "") + " " + article.get("description", "")).lower()
-            pos_count = sum(1 for kw in positive_keywords if kw in text)
-            neg_count = sum(1 for kw in negative_keywords if kw in text)
-            
-            if pos_count > neg_count:
-                sentiment_scores.append(1)
-            elif neg_count > pos_count:
-                sentiment_scores.append(-1)
-            else:
-                sentiment_scores.append(0)
-        
-        avg_sentiment = sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else 0
+        summary = {}
+        if method == "vader" and VADER_AVAILABLE:
+            # Mean VADER scores; compound is the overall -1..1 polarity
+            scores = self._vader_scores(news_articles)
+            avg_sentiment = float(scores[:, 3].mean()) if news_articles else 0
+            for column, name in enumerate(("pos", "neg", "neu", "compound")):
+                summary[name] = round(float(scores[:, column].mean()), 3) if news_articles else 0
+        else:
+            # Each article scores the sign of (distinct positive - distinct negative keywords present)
+            method = "keyword_based"
+            avg_sentiment = float(self._keyword_scores(news_articles).mean()) if news_articles else 0
         
         return {
             "symbol": symbol,
             "sentiment_score": round(avg_sentiment, 2),  # -1 to 1
             "sentiment_label": "positive" if avg_sentiment > 0.1 else "negative" if avg_sentiment < -0.1 else "neutral",
             "articles_analyzed": len(news_articles),
-            "method": "keyword_based"
+            "method": method,
+            **summary
         }
     
-    def _get_market_news(self, count: int = 10) -> Dict[str, Any]:
+    def _vader_scores(self, articles: List[Dict]) -> np.ndarray:
+        """Per-article VADER (pos, neg, neu, compound) rows."""
+        if self._sia is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            self._sia = SentimentIntensityAnalyzer()
+        rows = []
+        for article in articles:
+            polarity = self._sia.polarity_scores(article.get("title", "") + ". " + article.get("description", ""))
+            rows.append((polarity["pos"], polarity["neg"], polarity["neu"], polarity["compound"]))
+        return np.array(rows, dtype=np.float64).reshape(-1, 4)
+    
+    def _keyword_scores(self, articles: List[Dict]) -> np.ndarray:
+        """Per-article keyword sentiment (-1, 0 or 1) from one regex pass over all articles."""
+        texts = [normalized_text(article) for article in articles]
+        starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+        
+        # Mark which keywords occur in which article, then net them against the lexicon signs
+        present = np.zeros((len(texts), len(SENTIMENT_SIGN)), dtype=bool)
+        matches = list(SENTIMENT_RE.finditer("\n".join(texts)))
+        if matches:
+            rows = np.searchsorted(starts, [m.start() for m in matches], side="right") - 1
+            present[rows, [m.lastindex - 1 for m in matches]] = True
+        return np.sign(present @ SENTIMENT_SIGN)
+    
+    async def _get_market_news(self, count: int = 10) -> Dict[str, Any]:
         """Get general market news."""
-        return self._search_financial_news("stock market financial news", count)
+        return await self._search_financial_news("stock market financial news", count)
     
     def _extract_news_keywords(self, articles: List[Dict]) -> Dict[str, Any]:
         """Extract keywords from news articles."""
-        from collections import Counter
-        import re
-        
-        all_text = " ".join([
-            article.get("title", "") + " " + article.get("description", "")
-            for article in articles
-        ]).lower()
-        
-        # Extract words (simplified)
-        words = re.findall(r'\b[a-z]{4,}\b', all_text)
-        financial_terms = [
-            "stock", "market", "trading", "price", "earnings", "revenue", "profit",
-            "growth", "investor", "share", "dividend", "analyst", "forecast"
-        ]
-        
-        word_counts = Counter(words)
-        keywords = [word for word, count in word_counts.most_common(20) if word not in financial_terms]
+        # Count words article by article (simplified); no corpus-wide string or token list
+        word_counts = Counter()
+        for article in articles:
+            word_counts.update(match.group() for match in WORD_RE.finditer(normalized_text(article)))
+        for term in FINANCIAL_TERMS:
+            word_counts.pop(term, None)
         
-        return {"keywords": keywords[:10], "articles_processed": len(articles)}
+        keywords = [word for word, count in word_counts.most_common(10)]
+        return {"keywords": keywords, "articles_processed": len(articles)}
     
     def _mock_news(self, query: str, count: int) -> Dict[str, Any]:
         """Mock news data."""
-        articles = []
-        for i in range(count):
-            articles.append({
-                "title": f"Financial News: {query} shows {['strong', 'mixed', 'volatile'][i % 3]} performance",
-                "url": f"https://example.com/news/{i}",
-                "description": f"Recent developments in {query} indicate market interest.",
-                "published_time": f"{(count-i)} hours ago",
-                "source": "example.com"
-            })
+        # The cached mocks are shared; hand each caller its own copies
+        articles = [dict(article) for article in mock_articles(query, count)]
         return {"query": query, "articles": articles, "count": len(articles), "source": "mock"}
@@ -5,86 +5,95 @@ Fallback to console logging if API unavailable.
 """
 from typing import Dict, Any
 from datetime import datetime
+import atexit
+import queue
 import requests
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
 from config import get_settings
 
 
+# Shared fields of a failed Pushover reply
+PUSHOVER_ERROR = {"success": False, "method": "pushover"}
+
+
+def timestamped(message: str) -> str:
+    """Append the current time (YYYY-MM-DD HH:MM:SS) to an alert message."""
+    return f"{message}\n\nTime: {datetime.now().isoformat(sep=' ', timespec='seconds')}"
+
+
+# Static tool table: (name, description, parameters, handler method); parameters are shared across instances
+NOTIFICATION_TOOLS = (
+    # Tool 24: Send trade alert
+    ("send_trade_alert", "Send a trade execution alert", (
+        ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
+        ToolParameter("title", ToolParameterType.STRING, "Alert title", False, "Trading Alert"),
+        ToolParameter("priority", ToolParameterType.INTEGER, "Priority (0=normal, 1=high, 2=emergency)", False, 0),
+    ), "_send_trade_alert"),
+
+    # Tool 25: Send risk alert
+    ("send_risk_alert", "Send a risk management alert", (
+        ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
+        ToolParameter("risk_level", ToolParameterType.STRING, "Risk level (low/medium/high)", False, "medium"),
+    ), "_send_risk_alert"),
+
+    # Tool 26: Send portfolio update
+    ("send_portfolio_update", "Send portfolio status update", (
+        ToolParameter("portfolio_data", ToolParameterType.OBJECT, "Portfolio data dictionary", True),
+    ), "_send_portfolio_update"),
+
+    # Tool 27: Send market alert
+    ("send_market_alert", "Send market condition alert", (
+        ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
+        ToolParameter("symbol", ToolParameterType.STRING, "Stock symbol (optional)", False),
+    ), "_send_market_alert"),
+
+    # Tool 28: Send notification
+    ("send_notification", "Send a generic notification", (
+        ToolParameter("message", ToolParameterType.STRING, "Notification message", True),
+        ToolParameter("title", ToolParameterType.STRING, "Notification title", False, "Trading System"),
+        ToolParameter("notification_type", ToolParameterType.STRING, "Type: info, warning, error, success", False, "info"),
+    ), "_send_notification"),
+)
+
+
 class NotificationServer(BaseMCPServer):
     """Notification Server - Pushover API integration."""
     
+    blocking_io = True
+    
     def __init__(self):
         super().__init__(
             server_name="notification",
             description="Provides alert and notification services via Pushover API"
         )
-        self.settings = get_settings()
-        self.user_key = self.settings.pushover_user_key
-        self.api_token = self.settings.pushover_api_token
+        settings = get_settings()
+        self.user_key = settings.pushover_user_key
+        self.api_token = settings.pushover_api_token
         self.pushover_url = "https://api.pushover.net/1/messages.json"
+        
+        # Keep-alive session so repeat alerts skip the TCP and TLS handshake
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        ))
+        
+        # Non-emergency alerts are posted one at a time by a background worker
+        self._alerts: "queue.Queue" = queue.Queue()
+        threading.Thread(target=self._post_alerts, name="pushover", daemon=True).start()
+        atexit.register(self.flush)
     
     def _register_tools(self):
         """Register notification tools."""
-        
-        # Tool 24: Send trade alert
-        self.register_tool(
-            name="send_trade_alert",
-            description="Send a trade execution alert",
-            parameters=[
-                ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
-                ToolParameter("title", ToolParameterType.STRING, "Alert title", False, "Trading Alert"),
-                ToolParameter("priority", ToolParameterType.INTEGER, "Priority (0=normal, 1=high, 2=emergency)", False, 0)
-            ],
-            handler=self._send_trade_alert
-        )
-        
-        # Tool 25: Send risk alert
-        self.register_tool(
-            name="send_risk_alert",
-            description="Send a risk management alert",
-            parameters=[
-                ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
-                ToolParameter("risk_level", ToolParameterType.STRING, "Risk level (low/medium/high)", False, "medium")
-            ],
-            handler=self._send_risk_alert
-        )
-        
-        # Tool 26: Send portfolio update
-        self.register_tool(
-            name="send_portfolio_update",
-            description="Send portfolio status update",
-            parameters=[
-                ToolParameter("portfolio_data", ToolParameterType.OBJECT, "Portfolio data dictionary", True)
-            ],
-            handler=self._send_portfolio_update
-        )
-        
-        # Tool 27: Send market alert
-        self.register_tool(
-            name="send_market_alert",
-            description="Send market condition alert",
-            parameters=[
-                ToolParameter("message", ToolParameterType.STRING, "Alert message", True),
-                ToolParameter("symbol", ToolParameterType.STRING, "Stock symbol (optional)", False)
-            ],
-            handler=self._send_market_alert
-        )
-        
-        # Tool 28: Send notification
-        self.register_tool(
-            name="send_notification",
-            description="Send a generic notification",
-            parameters=[
-                ToolParameter("message", ToolParameterType.STRING, "Notification message", True),
-                ToolParameter("title", ToolParameterType.STRING, "Notification title", False, "Trading System"),
-                ToolParameter("notification_type", ToolParameterType.STRING, "Type: info, warning, error, success", False, "info")
-            ],
-            handler=self._send_notification
-        )
+        self.register_tool_table(NOTIFICATION_TOOLS)
     
     def _send_trade_alert(self, message: str, title: str = "Trading Alert", priority: int = 0) -> Dict[str, Any]:
         """Send trade execution alert."""
-        full_message = f"{message}\n\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        full_message = timestamped(message)
         return self._send_pushover(title, full_message, priority)
     
     def _send_risk_alert(self, message: str, risk_level: str = "medium") -> Dict[str, Any]:
@@ -92,7 +101,7 @@ class NotificationServer(BaseMCPServer):
         priority_map = {"low": 0, "medium": 1, "high": 2}
         priority = priority_map.get(risk_level, 1)
         title = f"Risk Alert: {risk_level.upper()}"
-        full_message = f"{message}\n\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        full_message = timestamped(message)
         return self._send_pushover(title, full_message, priority)
     
     def _send_portfolio_update(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -111,7 +120,7 @@ Positions: ${positions_value:,.2f}"""
     def _send_market_alert(self, message: str, symbol: str = None) -> Dict[str, Any]:
         """Send market condition alert."""
         title = f"Market Alert" + (f": {symbol}" if symbol else "")
-        full_message = f"{message}\n\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        full_message = timestamped(message)
         return self._send_pushover(title, full_message, 1)
     
     def _send_notification(self, message: str, title: str = "Trading System", notification_type: str = "info") -> Dict[str, Any]:
@@ -122,7 +131,7 @@ Positions: ${positions_value:,.2f}"""
         return self._send_pushover(full_title, message, 0)
     
     def _send_pushover(self, title: str, message: str, priority: int = 0) -> Dict[str, Any]:
-        """Send notification via Pushover API."""
+        """Send notification via Pushover API; non-emergency alerts are queued."""
         if not self.user_key or not self.api_token:
             # Fallback to console
             print(f"[PUSHOVER] {title}: {message}")
@@ -132,6 +141,34 @@ Positions: ${positions_value:,.2f}"""
                 "message": "Pushover not configured, logged to console"
             }
         
+        # Emergency alerts are sent inline so the caller knows they went out
+        if priority >= 2:
+            return self._post_pushover(title, message, priority)
+        self._alerts.put_nowait((title, message, priority))
+        return {
+            "success": True,
+            "method": "queued",
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _post_alerts(self):
+        """Worker thread: post queued alerts in order."""
+        while True:
+            title, message, priority = self._alerts.get()
+            try:
+                self._post_pushover(title, message, priority)
+            except Exception as e:
+                # Keep the worker alive; network errors are already handled in _post_pushover
+                print(f"[PUSHOVER ERROR] {e!r}")
+            finally:
+                self._alerts.task_done()
+    
+    def flush(self):
+        """Block until every queued alert has been posted."""
+        self._alerts.join()
+    
+    def _post_pushover(self, title: str, message: str, priority: int = 0) -> Dict[str, Any]:
+        """POST one notification to the Pushover API."""
         try:
             payload = {
                 "token": self.api_token,
@@ -141,7 +178,7 @@ Positions: ${positions_value:,.2f}"""
                 "priority": priority
             }
             
-            response = requests.post(self.pushover_url, data=payload, timeout=5)
+            response = self.session.post(self.pushover_url, data=payload, timeout=5)
             
             if response.status_code == 200:
                 return {
@@ -151,15 +188,7 @@ Positions: ${positions_value:,.2f}"""
                 }
             else:
                 print(f"[PUSHOVER ERROR] {response.status_code}: {response.text}")
-                return {
-                    "success": False,
-                    "method": "pushover",
-                    "error": f"HTTP {response.status_code}"
-                }
-        except Exception as e:
-            print(f"[PUSHOVER ERROR] {str(e)}")
-            return {
-                "success": False,
-                "method": "pushover",
-                "error": str(e)
-            }
+                return {**PUSHOVER_ERROR, "error": f"HTTP {response.status_code}"}
+        except requests.RequestException as e:
+            print(f"[PUSHOVER ERROR] {e}")
+            return {**PUSHOVER_ERROR, "error": str(e)}
@@ -3,9 +3,112 @@ Risk & Portfolio MCP Server
 Provides risk management and portfolio tracking tools.
 """
 from typing import Dict, Any, List, Optional
-from datetime import datetime
-from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
+from collections import deque
+from dataclasses import dataclass
+from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType, now_iso
 from config import get_settings
+import numpy as np
+
+
+# Risk score added by the position size, cash and concentration checks
+RISK_WEIGHTS = np.array([0.5, 1.0, 0.2])
+
+# Indexed by how many of the 0.3/0.7 level and 0.5/0.8 recommendation thresholds a score reaches
+RISK_LEVELS = ("low", "medium", "high")
+RISK_RECOMMENDATIONS = ("proceed", "caution", "reject")
+
+
+@dataclass(slots=True)
+class Position:
+    """Snapshot of one open position."""
+    quantity: int
+    avg_price: float
+    current_price: float
+
+
+class PositionBook:
+    """
+    Open positions held as parallel arrays of quantity, average price and current price.
+    Portfolio totals are dot products over the filled rows.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.n = 0
+        self.rows: Dict[str, int] = {}  # symbol -> row
+        self.symbols: List[str] = []  # row -> symbol
+        self.qty = np.empty(capacity, np.int64)
+        self.avg = np.empty(capacity, np.float64)
+        self.cur = np.empty(capacity, np.float64)
+    
+    def __len__(self) -> int:
+        return self.n
+    
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.rows
+    
+    def _grow(self):
+        """Double every array's capacity."""
+        for name in ("qty", "avg", "cur"):
+            old = getattr(self, name)
+            new = np.empty(len(old) * 2, old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+    
+    def get(self, symbol: str) -> Optional[Position]:
+        """Snapshot of a position, or None if not held."""
+        row = self.rows.get(symbol)
+        if row is None:
+            return None
+        return Position(int(self.qty[row]), float(self.avg[row]), float(self.cur[row]))
+    
+    def buy(self, symbol: str, quantity: int, price: float):
+        """Add shares, averaging the price into an existing position."""
+        row = self.rows.get(symbol)
+        if row is None:
+            if self.n == len(self.qty):
+                self._grow()
+            row = self.rows[symbol] = self.n
+            self.n += 1
+            self.symbols.append(symbol)
+            self.qty[row] = quantity
+            self.avg[row] = self.cur[row] = price
+            return
+        total_quantity = int(self.qty[row]) + quantity
+        self.avg[row] = (self.qty[row] * self.avg[row] + quantity * price) / total_quantity
+        self.qty[row] = total_quantity
+    
+    def sell(self, symbol: str, quantity: int):
+        """Remove shares, dropping the position once none are left."""
+        row = self.rows[symbol]
+        self.qty[row] -= quantity
+        if self.qty[row] == 0:
+            # Move the last row into the freed slot
+            last = self.n - 1
+            last_symbol = self.symbols.pop()
+            if row != last:
+                self.qty[row], self.avg[row], self.cur[row] = self.qty[last], self.avg[last], self.cur[last]
+                self.symbols[row] = last_symbol
+                self.rows[last_symbol] = row
+            del self.rows[symbol]
+            self.n = last
+    
+    def set_price(self, symbol: str, price: float):
+        """Update a held position's current price."""
+        row = self.rows.get(symbol)
+        if row is not None:
+            self.cur[row] = price
+    
+    def market_values(self) -> np.ndarray:
+        """Quantity * current price per position, in row order."""
+        return self.qty[:self.n] * self.cur[:self.n]
+    
+    def market_value(self) -> float:
+        """Total market value of all positions."""
+        return float(self.qty[:self.n] @ self.cur[:self.n])
+    
+    def cost_basis(self) -> float:
+        """Total cost basis of all positions."""
+        return float(self.qty[:self.n] @ self.avg[:self.n])
 
 
 class RiskServer(BaseMCPServer):
@@ -17,11 +120,19 @@ class RiskServer(BaseMCPServer):
             description="Provides risk management, position sizing, and portfolio tracking"
         )
         self.settings = get_settings()
+        # Cash is booked in integer cents so trades never leave sub-cent drift; "cash" mirrors it in dollars
+        self._cash_cents = round(self.settings.initial_capital * 100)
         self.portfolio = {
-            "cash": self.settings.initial_capital,
-            "positions": {},  # {symbol: {"quantity": int, "avg_price": float, "current_price": float}}
-            "trade_history": []
+            "cash": self._cash_cents / 100,
+            "trade_history": deque(maxlen=self.settings.trade_history_maxlen)
         }
+        self.positions = PositionBook()
+        # All trades ever recorded; trade_history only keeps the most recent
+        self._num_trades = 0
+        
+        # Bumped by every trade and price update; totals are reused while it is unchanged
+        self._state_version = 0
+        self._totals = (-1, 0.0, 0.0)  # (version, positions value, total value)
     
     def _register_tools(self):
         """Register risk and portfolio tools."""
@@ -39,6 +150,18 @@ class RiskServer(BaseMCPServer):
             handler=self._assess_trade_risk
         )
         
+        # Tool 16b: Assess several candidate buys
+        self.register_tool(
+            name="assess_trade_risk_batch",
+            description="Assess risk for several proposed buys in one call",
+            parameters=[
+                ToolParameter("symbols", ToolParameterType.ARRAY, "Stock ticker symbols", True),
+                ToolParameter("quantities", ToolParameterType.ARRAY, "Number of shares per symbol", True),
+                ToolParameter("prices", ToolParameterType.ARRAY, "Trade price per symbol", True)
+            ],
+            handler=self._assess_trade_risk_batch
+        )
+        
         # Tool 17: Calculate position size
         self.register_tool(
             name="calculate_position_size",
@@ -113,44 +236,66 @@ class RiskServer(BaseMCPServer):
     
     def _assess_trade_risk(self, symbol: str, action: str, quantity: int = None, price: float = 0) -> Dict[str, Any]:
         """Assess risk for a trade."""
-        portfolio_value = self._get_portfolio_value()["total_value"]
-        
         if action == "buy" and quantity and price:
             trade_value = quantity * price
-            position_pct = (trade_value / portfolio_value) if portfolio_value > 0 else 0
-            
-            risk_score = 0.0
-            risk_factors = []
-            
-            # Check position size limit
-            if position_pct > self.settings.max_position_size:
-                risk_score += 0.5
+            portfolio_value = self._get_portfolio_value()["total_value"]
+            flags = self._risk_flags(np.array([trade_value], dtype=np.float64), portfolio_value)[0]
+            return self._risk_report(symbol, action, trade_value, portfolio_value, flags)
+        else:
+            return {"symbol": symbol, "action": action, "risk_score": 0.0, "risk_level": "low"}
+    
+    def _assess_trade_risk_batch(self, symbols: List[str], quantities: List[int], prices: List[float]) -> Dict[str, Any]:
+        """Assess several candidate buys against the current portfolio at once."""
+        trade_values = np.asarray(quantities, dtype=np.float64) * np.asarray(prices, dtype=np.float64)
+        portfolio_value = self._get_portfolio_value()["total_value"]
+        flags = self._risk_flags(trade_values, portfolio_value)
+        assessments = [
+            self._risk_report(symbol, "buy", trade_value, portfolio_value, trade_flags)
+            for symbol, trade_value, trade_flags in zip(symbols, trade_values.tolist(), flags)
+        ]
+        return {"assessments": assessments, "count": len(assessments)}
+    
+    def _risk_flags(self, trade_values: np.ndarray, portfolio_value: float) -> np.ndarray:
+        """Position size, cash and concentration violations, one row per trade value."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            position_pct = trade_values / portfolio_value if portfolio_value > 0 else np.zeros_like(trade_values)
+            concentration = (self.positions.market_value() + trade_values) / portfolio_value
+        return np.column_stack((
+            position_pct > self.settings.max_position_size,
+            trade_values > self.portfolio["cash"],
+            concentration > 0.8
+        ))
+    
+    def _risk_report(
+        self,
+        symbol: str,
+        action: str,
+        trade_value: float,
+        portfolio_value: float,
+        flags: np.ndarray
+    ) -> Dict[str, Any]:
+        """Risk score, level and recommendation from one trade's violation flags."""
+        risk_score = float(flags @ RISK_WEIGHTS)
+        
+        # Messages are only built for trades that trip a check
+        risk_factors = []
+        if risk_score > 0:
+            if flags[0]:
+                position_pct = trade_value / portfolio_value
                 risk_factors.append(f"Exceeds max position size ({position_pct:.2%} > {self.settings.max_position_size:.2%})")
-            
-            # Check available cash
-            if trade_value > self.portfolio["cash"]:
-                risk_score = 1.0
+            if flags[1]:
                 risk_factors.append("Insufficient cash")
-            
-            # Check concentration risk
-            current_positions_value = sum(
-                pos["quantity"] * pos.get("current_price", pos["avg_price"])
-                for pos in self.portfolio["positions"].values()
-            )
-            if (current_positions_value + trade_value) / portfolio_value > 0.8:
-                risk_score += 0.2
+            if flags[2]:
                 risk_factors.append("High portfolio concentration")
-            
-            return {
-                "symbol": symbol,
-                "action": action,
-                "risk_score": min(risk_score, 1.0),  # 0-1 scale
-                "risk_level": "low" if risk_score < 0.3 else "medium" if risk_score < 0.7 else "high",
-                "risk_factors": risk_factors,
-                "recommendation": "proceed" if risk_score < 0.5 else "caution" if risk_score < 0.8 else "reject"
-            }
-        else:
-            return {"symbol": symbol, "action": action, "risk_score": 0.0, "risk_level": "low"}
+        
+        return {
+            "symbol": symbol,
+            "action": action,
+            "risk_score": min(risk_score, 1.0),  # 0-1 scale
+            "risk_level": RISK_LEVELS[(risk_score >= 0.3) + (risk_score >= 0.7)],
+            "risk_factors": risk_factors,
+            "recommendation": RISK_RECOMMENDATIONS[(risk_score >= 0.5) + (risk_score >= 0.8)]
+        }
     
     def _calculate_position_size(self, symbol: str, entry_price: float, stop_loss: float = None, risk_amount: float = None) -> Dict[str, Any]:
         """Calculate position size based on risk."""
@@ -191,35 +336,34 @@ class RiskServer(BaseMCPServer):
     
     def _get_portfolio_value(self) -> Dict[str, Any]:
         """Get portfolio total value."""
-        positions_value = sum(
-            pos["quantity"] * pos.get("current_price", pos["avg_price"])
-            for pos in self.portfolio["positions"].values()
-        )
-        total_value = self.portfolio["cash"] + positions_value
+        if self._totals[0] != self._state_version:
+            positions_value = self.positions.market_value()
+            self._totals = (self._state_version, positions_value, self.portfolio["cash"] + positions_value)
+        _, positions_value, total_value = self._totals
         
         return {
-            "cash": round(self.portfolio["cash"], 2),
+            "cash": self.portfolio["cash"],
             "positions_value": round(positions_value, 2),
             "total_value": round(total_value, 2),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     
     def _get_position_info(self, symbol: str) -> Dict[str, Any]:
         """Get position information."""
-        position = self.portfolio["positions"].get(symbol)
+        position = self.positions.get(symbol)
         if not position:
             return {"symbol": symbol, "position": None, "message": "No position found"}
         
-        current_value = position["quantity"] * position.get("current_price", position["avg_price"])
-        cost_basis = position["quantity"] * position["avg_price"]
+        current_value = position.quantity * position.current_price
+        cost_basis = position.quantity * position.avg_price
         unrealized_pnl = current_value - cost_basis
         unrealized_pnl_pct = (unrealized_pnl / cost_basis * 100) if cost_basis > 0 else 0
         
         return {
             "symbol": symbol,
-            "quantity": position["quantity"],
-            "avg_price": position["avg_price"],
-            "current_price": position.get("current_price", position["avg_price"]),
+            "quantity": position.quantity,
+            "avg_price": position.avg_price,
+            "current_price": position.current_price,
             "cost_basis": round(cost_basis, 2),
             "current_value": round(current_value, 2),
             "unrealized_pnl": round(unrealized_pnl, 2),
@@ -252,16 +396,15 @@ class RiskServer(BaseMCPServer):
     
     def _get_portfolio_allocation(self) -> Dict[str, Any]:
         """Get portfolio allocation."""
-        portfolio_value = self._get_portfolio_value()
-        total_value = portfolio_value["total_value"]
+        # One pass over the positions gives both the total and the per-symbol values
+        position_values = self.positions.market_values()
+        total_value = round(self.portfolio["cash"] + float(position_values.sum()), 2)
         
         if total_value == 0:
             return {"cash_pct": 100, "positions": {}}
         
-        allocations = {}
-        for symbol, position in self.portfolio["positions"].items():
-            position_value = position["quantity"] * position.get("current_price", position["avg_price"])
-            allocations[symbol] = round((position_value / total_value) * 100, 2)
+        position_pcts = (position_values / total_value * 100).tolist()
+        allocations = {symbol: round(pct, 2) for symbol, pct in zip(self.positions.symbols, position_pcts)}
         
         cash_pct = round((self.portfolio["cash"] / total_value) * 100, 2)
         
@@ -280,13 +423,10 @@ class RiskServer(BaseMCPServer):
         total_return_pct = (total_return / initial_capital * 100) if initial_capital > 0 else 0
         
         # Count trades
-        num_trades = len(self.portfolio["trade_history"])
+        num_trades = self._num_trades
         
         # Calculate unrealized P&L
-        unrealized_pnl = sum(
-            (pos["quantity"] * pos.get("current_price", pos["avg_price"])) - (pos["quantity"] * pos["avg_price"])
-            for pos in self.portfolio["positions"].values()
-        )
+        unrealized_pnl = self.positions.market_value() - self.positions.cost_basis()
         
         return {
             "initial_capital": initial_capital,
@@ -295,50 +435,37 @@ class RiskServer(BaseMCPServer):
             "total_return_pct": round(total_return_pct, 2),
             "unrealized_pnl": round(unrealized_pnl, 2),
             "num_trades": num_trades,
-            "num_positions": len(self.portfolio["positions"])
+            "num_positions": len(self.positions)
         }
     
     def _record_trade(self, symbol: str, action: str, quantity: int, price: float, timestamp: str = None) -> Dict[str, Any]:
         """Record a trade in portfolio."""
         if timestamp is None:
-            timestamp = datetime.now().isoformat()
+            # Trades can land within the same second, so keep milliseconds
+            timestamp = now_iso(milliseconds=True)
         
         trade_value = quantity * price
+        trade_cents = round(trade_value * 100)
         
         if action == "buy":
-            if trade_value > self.portfolio["cash"]:
+            if trade_cents > self._cash_cents:
                 return {"success": False, "error": "Insufficient cash"}
             
-            self.portfolio["cash"] -= trade_value
-            
-            if symbol in self.portfolio["positions"]:
-                # Update existing position
-                pos = self.portfolio["positions"][symbol]
-                total_cost = (pos["quantity"] * pos["avg_price"]) + trade_value
-                total_quantity = pos["quantity"] + quantity
-                pos["avg_price"] = total_cost / total_quantity
-                pos["quantity"] = total_quantity
-            else:
-                # New position
-                self.portfolio["positions"][symbol] = {
-                    "quantity": quantity,
-                    "avg_price": price,
-                    "current_price": price
-                }
+            self._cash_cents -= trade_cents
+            self.positions.buy(symbol, quantity, price)
         
         elif action == "sell":
-            if symbol not in self.portfolio["positions"]:
+            pos = self.positions.get(symbol)
+            if pos is None:
                 return {"success": False, "error": "No position to sell"}
             
-            pos = self.portfolio["positions"][symbol]
-            if quantity > pos["quantity"]:
+            if quantity > pos.quantity:
                 return {"success": False, "error": "Insufficient shares"}
             
-            self.portfolio["cash"] += trade_value
-            pos["quantity"] -= quantity
-            
-            if pos["quantity"] == 0:
-                del self.portfolio["positions"][symbol]
+            self._cash_cents += trade_cents
+            self.positions.sell(symbol, quantity)
+        
+        self.portfolio["cash"] = self._cash_cents / 100
         
         # Record in trade history
         trade_record = {
@@ -350,10 +477,12 @@ class RiskServer(BaseMCPServer):
             "timestamp": timestamp
         }
         self.portfolio["trade_history"].append(trade_record)
+        self._state_version += 1
+        self._num_trades += 1
         
         return {"success": True, "trade": trade_record, "portfolio": self._get_portfolio_value()}
     
     def update_position_price(self, symbol: str, current_price: float):
         """Update current price for a position (called externally)."""
-        if symbol in self.portfolio["positions"]:
-            self.portfolio["positions"][symbol]["current_price"] = current_price
+        self.positions.set_price(symbol, current_price)
+        self._state_version += 1
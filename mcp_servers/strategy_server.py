@@ -2,14 +2,41 @@
 Strategy Reasoning MCP Server
 Provides LLM-based strategy and technical analysis tools.
 """
-from typing import Dict, Any, List
-from datetime import datetime
-from openai import OpenAI
-from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType
+from typing import Dict, Any, FrozenSet, List
+from cachetools import TTLCache
+from mcp_servers.base_server import BaseMCPServer, ToolParameter, ToolParameterType, async_ttl_cached, now_iso
+from core.llm_client import get_llm_client
+from tools.indicators import StreamingRSI, compute_indicators, compute_indicators_batch
 from config import get_settings
-import json
-import pandas as pd
-import numpy as np
+import asyncio
+import orjson
+
+
+# Top-level snapshot times that differ between otherwise identical tool inputs
+VOLATILE_KEYS = frozenset({"timestamp", "generated_at"})
+
+
+def canonical(obj: Any, drop: FrozenSet[str] = VOLATILE_KEYS) -> Any:
+    """Tool input with floats rounded to 4 places and top-level snapshot times dropped."""
+    if isinstance(obj, float):
+        return round(obj, 4)
+    if isinstance(obj, dict):
+        return {key: canonical(value, frozenset()) for key, value in obj.items() if key not in drop}
+    if isinstance(obj, (list, tuple)):
+        return [canonical(value, frozenset()) for value in obj]
+    return obj
+
+
+def prompt_json(obj: Any) -> str:
+    """
+    Indented, canonical JSON for embedding tool inputs in a prompt.
+    Inputs differing only in key order, float noise or snapshot time share an LLM cache entry.
+    """
+    return orjson.dumps(
+        canonical(obj),
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS,
+        default=str
+    ).decode()
 
 
 class StrategyServer(BaseMCPServer):
@@ -21,8 +48,15 @@ class StrategyServer(BaseMCPServer):
             description="Provides LLM-based strategy reasoning and technical analysis"
         )
         self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        # Shared rate-limited async client, so LLM tools never block the event loop
+        self.llm = get_llm_client()
         self.model = self.settings.openai_model
+        
+        # Parsed replies to repeated prompts (agent retries, backtests) are reused for five minutes
+        self._llm_cache = TTLCache(maxsize=512, ttl=300)
+        
+        # Per-symbol RSI state for streaming price updates
+        self._rsi_state: Dict[str, StreamingRSI] = {}
     
     def _register_tools(self):
         """Register strategy and reasoning tools."""
@@ -38,6 +72,17 @@ class StrategyServer(BaseMCPServer):
             handler=self._analyze_market_trend
         )
         
+        # Tool 11b: Analyze several market trends
+        self.register_tool(
+            name="analyze_market_trend_batch",
+            description="Analyze market trends for several symbols concurrently",
+            parameters=[
+                ToolParameter("symbols", ToolParameterType.ARRAY, "Stock ticker symbols", True),
+                ToolParameter("price_data", ToolParameterType.OBJECT, "Price data per symbol", False)
+            ],
+            handler=self._analyze_market_trend_batch
+        )
+        
         # Tool 12: Generate trade rationale
         self.register_tool(
             name="generate_trade_rationale",
@@ -61,6 +106,29 @@ class StrategyServer(BaseMCPServer):
             handler=self._compute_technical_indicators
         )
         
+        # Tool 13b: Compute indicators for several symbols
+        self.register_tool(
+            name="compute_technical_indicators_batch",
+            description="Calculate technical indicators for several symbols in one call",
+            parameters=[
+                ToolParameter("prices", ToolParameterType.OBJECT, "Close prices per symbol", True),
+                ToolParameter("indicators", ToolParameterType.ARRAY, "List of indicators to compute", False)
+            ],
+            handler=self._compute_technical_indicators_batch
+        )
+        
+        # Tool 13c: Update streaming RSI
+        self.register_tool(
+            name="update_rsi",
+            description="Advance a symbol's RSI by one new price without recomputing its history",
+            parameters=[
+                ToolParameter("symbol", ToolParameterType.STRING, "Stock ticker symbol", True),
+                ToolParameter("price", ToolParameterType.FLOAT, "Latest close price", True),
+                ToolParameter("period", ToolParameterType.INTEGER, "RSI period", False, 14)
+            ],
+            handler=self._update_rsi
+        )
+        
         # Tool 14: Evaluate strategy
         self.register_tool(
             name="evaluate_strategy",
@@ -83,14 +151,38 @@ class StrategyServer(BaseMCPServer):
             handler=self._generate_market_summary
         )
     
-    def _analyze_market_trend(self, symbol: str, price_data: Dict = None) -> Dict[str, Any]:
+    @async_ttl_cached("_llm_cache")
+    async def _chat_json(self, system: str, user: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """
+        Chat completion parsed as JSON, cached per (system, user, temperature, max_tokens).
+        A reply that is not a JSON object is returned as {"raw_text": reply}.
+        """
+        response = await self.llm.chat_completion(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        
+        result_text = response.choices[0].message.content
+        try:
+            parsed = orjson.loads(result_text)
+        except (TypeError, ValueError):
+            parsed = None
+        # Callers merge the reply into a dict, so valid JSON lists, scalars and null count as raw text too
+        return parsed if isinstance(parsed, dict) else {"raw_text": result_text}
+    
+    async def _analyze_market_trend(self, symbol: str, price_data: Dict = None) -> Dict[str, Any]:
         """Analyze market trend using LLM."""
         if price_data is None:
             price_data = {"message": "No price data provided"}
         
         prompt = f"""
         Analyze the market trend for {symbol} based on the following data:
-        {json.dumps(price_data, indent=2)}
+        {prompt_json(price_data)}
         
         Provide:
         1. Trend direction (bullish/bearish/neutral)
@@ -102,33 +194,32 @@ class StrategyServer(BaseMCPServer):
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a quantitative analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=300
+            result = await self._chat_json(
+                "You are a quantitative analyst. Respond with valid JSON only.", prompt, 0.3, 300
             )
-            
-            result_text = response.choices[0].message.content
-            # Try to parse JSON from response
-            try:
-                result = json.loads(result_text)
-            except:
-                result = {"trend": "neutral", "summary": result_text, "confidence": 0.5}
+            if "raw_text" in result:
+                result = {"trend": "neutral", "summary": result["raw_text"], "confidence": 0.5}
             
             return {"symbol": symbol, **result}
         except Exception as e:
             return {"symbol": symbol, "trend": "unknown", "error": str(e)}
     
-    def _generate_trade_rationale(self, symbol: str, action: str, context: Dict) -> Dict[str, Any]:
+    async def _analyze_market_trend_batch(self, symbols: List[str], price_data: Dict = None) -> Dict[str, Any]:
+        """Analyze several market trends, running the LLM calls concurrently."""
+        symbols = list(dict.fromkeys(symbols))
+        price_data = price_data or {}
+        results = await asyncio.gather(
+            *(self._analyze_market_trend(symbol, price_data.get(symbol)) for symbol in symbols)
+        )
+        trends = dict(zip(symbols, results))
+        return {"trends": trends, "count": len(trends)}
+    
+    async def _generate_trade_rationale(self, symbol: str, action: str, context: Dict) -> Dict[str, Any]:
         """Generate trade rationale using LLM."""
         prompt = f"""
         Generate a concise trade rationale for {symbol}:
         - Action: {action}
-        - Context: {json.dumps(context, indent=2)}
+        - Context: {prompt_json(context)}
         
         Provide:
         1. Rationale (2-3 sentences explaining why)
@@ -139,21 +230,11 @@ class StrategyServer(BaseMCPServer):
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a trading analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=250
+            result = await self._chat_json(
+                "You are a trading analyst. Respond with valid JSON only.", prompt, 0.4, 250
             )
-            
-            result_text = response.choices[0].message.content
-            try:
-                result = json.loads(result_text)
-            except:
-                result = {"rationale": result_text}
+            if "raw_text" in result:
+                result = {"rationale": result["raw_text"]}
             
             return {"symbol": symbol, "action": action, **result}
         except Exception as e:
@@ -161,46 +242,24 @@ class StrategyServer(BaseMCPServer):
     
     def _compute_technical_indicators(self, prices: List[float], indicators: List[str] = None) -> Dict[str, Any]:
         """Compute technical indicators."""
-        if indicators is None:
-            indicators = ["rsi", "sma", "ema"]
-        
-        # Convert to pandas Series
-        price_series = pd.Series(prices)
-        result = {}
-        
-        # RSI
-        if "rsi" in indicators:
-            result["rsi"] = self._calculate_rsi(price_series, period=14)
-        
-        # SMA
-        if "sma" in indicators:
-            result["sma_20"] = float(price_series.tail(20).mean()) if len(price_series) >= 20 else None
-            result["sma_50"] = float(price_series.tail(50).mean()) if len(price_series) >= 50 else None
-        
-        # EMA
-        if "ema" in indicators:
-            result["ema_12"] = float(price_series.ewm(span=12).mean().iloc[-1])
-            result["ema_26"] = float(price_series.ewm(span=26).mean().iloc[-1])
-        
-        # MACD
-        if "macd" in indicators:
-            ema12 = price_series.ewm(span=12).mean()
-            ema26 = price_series.ewm(span=26).mean()
-            macd_line = ema12 - ema26
-            signal_line = macd_line.ewm(span=9).mean()
-            result["macd"] = float(macd_line.iloc[-1])
-            result["macd_signal"] = float(signal_line.iloc[-1])
-        
-        return {"indicators": result, "periods": len(prices)}
+        # NumPy implementation shared with the market analyst's local path
+        return {"indicators": compute_indicators(prices, indicators), "periods": len(prices)}
     
-    def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> float:
-        """Calculate RSI."""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return float(rsi.iloc[-1]) if not rsi.empty else 50.0
+    def _compute_technical_indicators_batch(
+        self,
+        prices: Dict[str, List[float]],
+        indicators: List[str] = None
+    ) -> Dict[str, Any]:
+        """Compute technical indicators for several symbols."""
+        results = compute_indicators_batch(prices, indicators)
+        return {"indicators": results, "count": len(results)}
+    
+    def _update_rsi(self, symbol: str, price: float, period: int = 14) -> Dict[str, Any]:
+        """Advance the symbol's streaming RSI by one price."""
+        state = self._rsi_state.get(symbol)
+        if state is None or state.period != period:
+            state = self._rsi_state[symbol] = StreamingRSI(period)
+        return {"symbol": symbol, "rsi": state.update(price), "period": period}
     
     def _evaluate_strategy(self, symbol: str, strategy_data: Dict) -> Dict[str, Any]:
         """Evaluate strategy performance."""
@@ -208,34 +267,24 @@ class StrategyServer(BaseMCPServer):
         return {
             "symbol": symbol,
             "evaluation": "Strategy evaluation based on performance metrics",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     
-    def _generate_market_summary(self, symbols: List[str], market_data: Dict = None) -> Dict[str, Any]:
+    async def _generate_market_summary(self, symbols: List[str], market_data: Dict = None) -> Dict[str, Any]:
         """Generate market summary using LLM."""
         prompt = f"""
         Provide a brief market summary for these symbols: {', '.join(symbols)}.
-        {f'Market data: {json.dumps(market_data, indent=2)}' if market_data else ''}
+        {f'Market data: {prompt_json(market_data)}' if market_data else ''}
         
         Format as JSON with: summary, key_insights, overall_sentiment.
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a market analyst. Respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=200
+            result = await self._chat_json(
+                "You are a market analyst. Respond with valid JSON only.", prompt, 0.3, 200
             )
-            
-            result_text = response.choices[0].message.content
-            try:
-                result = json.loads(result_text)
-            except:
-                result = {"summary": result_text}
+            if "raw_text" in result:
+                result = {"summary": result["raw_text"]}
             
             return {"symbols": symbols, **result}
         except Exception as e:
@@ -1,4 +1,5 @@
 """Tools package."""
 from tools.tool_registry import ToolRegistry
+from tools.indicators import compute_indicators, compute_indicators_batch
 
-__all__ = ["ToolRegistry"]
+__all__ = ["ToolRegistry", "compute_indicators", "compute_indicators_batch"]
@@ -0,0 +1,174 @@
+"""
+Technical Indicators: Local, vectorized indicator math.
+Lets agents compute indicators in-process instead of via a tool call.
+"""
+from typing import Dict, Any, List, Optional
+from collections import deque
+import importlib.util
+import numpy as np
+import pandas as pd
+
+
+# Numba is optional; with it EMA and MACD run as one compiled pass instead of three pandas ewm calls
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+# Columns of indicator_rows() and the indicator each belongs to
+INDICATOR_COLUMNS = (
+    ("rsi", "rsi"), ("sma_20", "sma"), ("sma_50", "sma"),
+    ("ema_12", "ema"), ("ema_26", "ema"), ("macd", "macd"), ("macd_signal", "macd")
+)
+
+if NUMBA_AVAILABLE:
+    from numba import njit, prange
+
+    @njit(cache=True)
+    def ema_macd(closes):
+        """
+        Final EMA12, EMA26, MACD and MACD signal in one pass over the closes.
+        Uses the adjusted EMA weighting of pandas ewm(span=...).mean().
+        """
+        d12, d26, d9 = 1 - 2 / 13, 1 - 2 / 27, 1 - 2 / 10
+        num12 = den12 = num26 = den26 = num9 = den9 = 0.0
+        ema12 = ema26 = macd = signal = np.nan
+        for price in closes:
+            num12 = price + d12 * num12
+            den12 = 1 + d12 * den12
+            num26 = price + d26 * num26
+            den26 = 1 + d26 * den26
+            ema12 = num12 / den12
+            ema26 = num26 / den26
+            macd = ema12 - ema26
+            num9 = macd + d9 * num9
+            den9 = 1 + d9 * den9
+            signal = num9 / den9
+        return ema12, ema26, macd, signal
+
+    @njit(cache=True, parallel=True, error_model="numpy")
+    def indicator_rows(prices):
+        """
+        INDICATOR_COLUMNS for every row of a (symbols, bars) close array, rows in parallel.
+        Values match compute_indicators; SMAs are NaN when there are too few bars.
+        """
+        n, bars = prices.shape
+        out = np.empty((n, 7))
+        for i in prange(n):
+            row = prices[i]
+            out[i, 0] = np.nan
+            if bars > 14:
+                delta = np.diff(row[bars - 15:])
+                gain = np.where(delta > 0, delta, 0.0).mean()
+                loss = np.where(delta < 0, -delta, 0.0).mean()
+                out[i, 0] = 100 - 100 / (1 + gain / loss)
+            out[i, 1] = row[bars - 20:].mean() if bars >= 20 else np.nan
+            out[i, 2] = row[bars - 50:].mean() if bars >= 50 else np.nan
+            out[i, 3], out[i, 4], out[i, 5], out[i, 6] = ema_macd(row)
+        return out
+
+
+def compute_indicators(prices: List[float], indicators: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compute technical indicators from close prices.
+    Same keys and values as strategy_reasoning.compute_technical_indicators.
+    """
+    if indicators is None:
+        indicators = ["rsi", "sma", "ema"]
+
+    closes = np.asarray(prices, dtype=np.float64)
+    result = {}
+
+    # RSI
+    if "rsi" in indicators:
+        result["rsi"] = rsi(closes, period=14)
+
+    # SMA
+    if "sma" in indicators:
+        result["sma_20"] = float(closes[-20:].mean()) if len(closes) >= 20 else None
+        result["sma_50"] = float(closes[-50:].mean()) if len(closes) >= 50 else None
+
+    # EMA and MACD share the same exponential averages
+    if ("ema" in indicators or "macd" in indicators) and NUMBA_AVAILABLE and len(closes):
+        ema12, ema26, macd, signal = ema_macd(closes)
+        if "ema" in indicators:
+            result["ema_12"] = float(ema12)
+            result["ema_26"] = float(ema26)
+        if "macd" in indicators:
+            result["macd"] = float(macd)
+            result["macd_signal"] = float(signal)
+    elif "ema" in indicators or "macd" in indicators:
+        series = pd.Series(closes)
+        ema12 = series.ewm(span=12).mean()
+        ema26 = series.ewm(span=26).mean()
+        if "ema" in indicators:
+            result["ema_12"] = float(ema12.iloc[-1])
+            result["ema_26"] = float(ema26.iloc[-1])
+        if "macd" in indicators:
+            macd_line = ema12 - ema26
+            result["macd"] = float(macd_line.iloc[-1])
+            result["macd_signal"] = float(macd_line.ewm(span=9).mean().iloc[-1])
+
+    return result
+
+
+
+def compute_indicators_batch(
+    prices_by_symbol: Dict[str, List[float]],
+    indicators: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    compute_indicators for several symbols.
+    Equal-length histories run as one parallel Numba kernel when it is available.
+    """
+    if indicators is None:
+        indicators = ["rsi", "sma", "ema"]
+
+    lengths = {len(prices) for prices in prices_by_symbol.values()}
+    if not NUMBA_AVAILABLE or len(lengths) != 1 or 0 in lengths:
+        return {symbol: compute_indicators(prices, indicators) for symbol, prices in prices_by_symbol.items()}
+
+    bars = lengths.pop()
+    rows = indicator_rows(np.array(list(prices_by_symbol.values()), dtype=np.float64))
+    columns = [(j, name) for j, (name, indicator) in enumerate(INDICATOR_COLUMNS) if indicator in indicators]
+    too_short = {name for name, window in (("sma_20", 20), ("sma_50", 50)) if bars < window}
+    return {
+        symbol: {name: None if name in too_short else values[j] for j, name in columns}
+        for symbol, values in zip(prices_by_symbol, rows.tolist())
+    }
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> float:
+    """RSI from the simple average gain/loss over the last period price changes."""
+    if len(closes) <= period:
+        return float("nan")
+    delta = np.diff(closes[-(period + 1):])
+    gain = np.where(delta > 0, delta, 0.0).mean()
+    loss = np.where(delta < 0, -delta, 0.0).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(100 - 100 / (1 + gain / loss))
+
+
+class StreamingRSI:
+    """
+    RSI updated one price at a time, keeping only the last period price changes.
+    Same definition as rsi(), so a stream and a full recompute agree.
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.last_price: Optional[float] = None
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+
+    def update(self, price: float) -> float:
+        """Fold in the next price and return the RSI (NaN until period changes are seen)."""
+        if self.last_price is not None:
+            delta = price - self.last_price
+            self.gains.append(max(delta, 0.0))
+            self.losses.append(max(-delta, 0.0))
+        self.last_price = price
+        if len(self.gains) < self.period:
+            return float("nan")
+        gain = sum(self.gains) / self.period
+        loss = sum(self.losses) / self.period
+        if loss == 0:
+            return 100.0 if gain > 0 else float("nan")
+        return 100 - 100 / (1 + gain / loss)
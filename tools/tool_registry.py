@@ -2,9 +2,59 @@
 Tool Registry: Central registry for all tools from MCP servers.
 Provides unified tool access interface for agents.
 """
-from typing import Dict, Any, List, Optional
-from mcp_servers.base_server import BaseMCPServer
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
+from collections import OrderedDict
+from mcp_servers.base_server import BaseMCPServer, ToolResult
+from core.resilience import CircuitBreaker, CircuitOpenError, backoff_delay
 import asyncio
+import json
+import orjson
+import time
+
+
+# Default time-to-live (seconds) for cached tool results
+DEFAULT_CACHE_TTLS: Dict[str, float] = {
+    "market_data.get_latest_price": 1.0,
+    "risk_portfolio.get_portfolio_value": 1.0,
+    "news_search.get_ticker_news": 60.0
+}
+
+# Handler exceptions that indicate a flaky dependency rather than a bug
+TRANSIENT_ERROR_TYPES = {"ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout", "TimeoutError", "ConnectError"}
+
+# Registry-level tool letting an LLM fan out several tool calls in one step
+BATCH_TOOL: Dict[str, Any] = {
+    "name": "batch",
+    "description": "Call several tools concurrently and return their results in order",
+    "parameters": [
+        {
+            "name": "invocations",
+            "type": "array",
+            "description": "Tool calls to run, each {tool_name, arguments}",
+            "required": True
+        }
+    ],
+    "json_schema": {
+        "type": "object",
+        "properties": {
+            "invocations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "tool_name": {"type": "string"},
+                        "arguments": {"type": "object"}
+                    },
+                    "required": ["tool_name", "arguments"]
+                }
+            }
+        },
+        "required": ["invocations"]
+    },
+    "server": "registry",
+    "server_instance": None,
+    "full_name": "registry.batch"
+}
 
 
 class ToolRegistry:
@@ -13,57 +63,193 @@ class ToolRegistry:
     Agents use this to discover and call tools.
     """
     
-    def __init__(self):
+    def __init__(self, cache_ttls: Optional[Dict[str, float]] = None, cache_size: int = 256):
         self.servers: Dict[str, BaseMCPServer] = {}
-        self.all_tools: Dict[str, Dict[str, Any]] = {}
+        self.all_tools: Dict[str, Dict[str, Any]] = {BATCH_TOOL["full_name"]: BATCH_TOOL}
+        # Short tool name -> {full name: tool info}, so short-name calls skip a scan
+        self._tools_by_short_name: Dict[str, Dict[str, Dict[str, Any]]] = {
+            BATCH_TOOL["name"]: {BATCH_TOOL["full_name"]: BATCH_TOOL}
+        }
+        self._tools_by_servers: Dict[FrozenSet[str], Tuple[Dict[str, Any], ...]] = {}
+        self._schema_json: Optional[bytes] = None
+        
+        # (tool_name, kwargs) -> (expires_at, task); in-flight tasks are shared
+        self.cache_ttls: Dict[str, float] = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        
+        # Per-server circuit breakers and retry budget for tool calls
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.tool_max_attempts = 3
     
     def register_server(self, server: BaseMCPServer):
         """Register an MCP server and its tools."""
         self.servers[server.server_name] = server
+        self._tools_by_servers.clear()
+        self._schema_json = None
         tools = server.get_tools()
         
         for tool in tools:
-            tool_key = f"{server.server_name}.{tool['name']}"
-            self.all_tools[tool_key] = {
-                **tool,
-                "server_instance": server,
-                "full_name": tool_key
-            }
+            tool_key = tool["full_name"]
+            tool_info = self.all_tools[tool_key] = {**tool, "server_instance": server}
+            self._tools_by_short_name.setdefault(tool["name"], {})[tool_key] = tool_info
         
         print(f"Registered server '{server.server_name}' with {len(tools)} tools")
     
-    async def call_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
+    async def call_tool(self, tool_name: str, **kwargs) -> ToolResult:
         """
         Call a tool by its full name (server.tool_name) or short name.
         Returns structured result.
         """
-        # Try full name first
-        if tool_name in self.all_tools:
-            tool_info = self.all_tools[tool_name]
-            server = tool_info["server_instance"]
-            actual_tool_name = tool_info["name"]
-            return await server.call_tool(actual_tool_name, **kwargs)
+        # Try full name first, then short name (unique across servers)
+        tool_info = self.all_tools.get(tool_name)
+        if tool_info is None:
+            matches = self._tools_by_short_name.get(tool_name, {})
+            if len(matches) > 1:
+                return ToolResult(
+                    success=False,
+                    error=f"Tool name '{tool_name}' is ambiguous; use one of {sorted(matches)}",
+                    tool=tool_name
+                )
+            tool_info = next(iter(matches.values()), None)
+        if tool_info is None:
+            return ToolResult(success=False, error=f"Tool '{tool_name}' not found", tool=tool_name)
+        if tool_info is BATCH_TOOL:
+            return await self._call_batch_tool(kwargs.get("invocations") or [])
         
-        # Try short name (search across servers)
-        for full_name, tool_info in self.all_tools.items():
-            if tool_info["name"] == tool_name:
-                server = tool_info["server_instance"]
-                return await server.call_tool(tool_name, **kwargs)
+        server = tool_info["server_instance"]
+        breaker = self._breakers.setdefault(server.server_name, CircuitBreaker(server.server_name))
         
-        return {
-            "success": False,
-            "error": f"Tool '{tool_name}' not found"
-        }
+        for attempt in range(self.tool_max_attempts):
+            try:
+                breaker.check()
+            except CircuitOpenError as e:
+                return ToolResult(success=False, error=str(e), tool=tool_info["name"], server=server.server_name)
+            
+            result = await server.call_tool(tool_info["name"], **kwargs)
+            error_type = result.error_type
+            if error_type is None:
+                breaker.record_success()
+                return result
+            
+            # Handler raised; only network-style failures trip the breaker or are retried
+            if error_type not in TRANSIENT_ERROR_TYPES:
+                return result
+            breaker.record_failure()
+            if attempt == self.tool_max_attempts - 1:
+                return result
+            await asyncio.sleep(backoff_delay(attempt, min_wait=0.2, max_wait=2.0))
+        
+    async def call_tool_cached(self, tool_name: str, ttl: Optional[float] = None, **kwargs) -> ToolResult:
+        """
+        Call a tool, sharing results of identical calls made within the TTL.
+        Concurrent callers await the same in-flight task, so one round only
+        hits the underlying API once per (tool_name, kwargs).
+        """
+        if ttl is None:
+            ttl = self.cache_ttls.get(tool_name, 1.0)
+        key = (tool_name, json.dumps(kwargs, sort_keys=True, default=str))
+        now = time.monotonic()
+        
+        entry = self._cache.get(key)
+        if entry and entry[0] > now:
+            self._cache.move_to_end(key)
+            return await asyncio.shield(entry[1])
+        
+        task = asyncio.create_task(self.call_tool(tool_name, **kwargs))
+        self._cache[key] = (now + ttl, task)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        
+        # Failed or cancelled calls are not worth sharing with later callers
+        def _evict_on_failure(t: asyncio.Task, key=key):
+            if t.cancelled() or t.exception() or not t.result().success:
+                if self._cache.get(key, (None, None))[1] is t:
+                    del self._cache[key]
+        task.add_done_callback(_evict_on_failure)
+        
+        return await asyncio.shield(task)
+    
+    async def call_tool_result(self, tool_name: str, **kwargs) -> Dict[str, Any]:
+        """Call a tool and return its result dict, or an empty dict on failure."""
+        return (await self.call_tool(tool_name, **kwargs)).unwrap({})
+    
+    async def call_tool_cached_result(self, tool_name: str, **kwargs) -> Dict[str, Any]:
+        """call_tool_cached, returning the result dict or an empty dict on failure."""
+        return (await self.call_tool_cached(tool_name, **kwargs)).unwrap({})
+    
+    async def call_tools_batch(
+        self,
+        invocations: List[Tuple[str, Dict[str, Any]]],
+        cached: bool = False
+    ) -> List[ToolResult]:
+        """
+        Run (tool_name, kwargs) calls concurrently, returning responses in order.
+        A call that raises yields a failed response instead of aborting the rest.
+        """
+        call = self.call_tool_cached if cached else self.call_tool
+        responses = await asyncio.gather(
+            *(call(tool_name, **kwargs) for tool_name, kwargs in invocations),
+            return_exceptions=True
+        )
+        return [
+            ToolResult(success=False, error=str(r), error_type=type(r).__name__, tool=tool_name)
+            if isinstance(r, BaseException) else r
+            for (tool_name, _), r in zip(invocations, responses)
+        ]
+    
+    async def call_tools_batch_results(
+        self,
+        invocations: List[Tuple[str, Dict[str, Any]]],
+        cached: bool = False
+    ) -> List[Dict[str, Any]]:
+        """call_tools_batch, returning each result dict or an empty dict on failure."""
+        return [r.unwrap({}) for r in await self.call_tools_batch(invocations, cached=cached)]
+    
+    async def _call_batch_tool(self, invocations: List[Dict[str, Any]]) -> ToolResult:
+        """Handler for the LLM-visible batch tool."""
+        responses = await self.call_tools_batch([
+            (inv.get("tool_name", ""), inv.get("arguments") or {}) for inv in invocations
+        ])
+        return ToolResult(
+            success=True,
+            result={"results": [r.as_dict() for r in responses]},
+            tool=BATCH_TOOL["name"],
+            server=BATCH_TOOL["server"]
+        )
+    
+    def invalidate_cache(self, tool_name: Optional[str] = None):
+        """Drop cached results for one tool, or all tools if none given."""
+        if tool_name is None:
+            self._cache.clear()
+            return
+        for key in [k for k in self._cache if k[0] == tool_name]:
+            del self._cache[key]
     
     def get_tools(self, server_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all tools, optionally filtered by server."""
         if server_name:
-            return [
-                tool for tool in self.all_tools.values()
-                if tool["server"] == server_name
-            ]
+            return list(self.get_tools_for_servers(frozenset((server_name,))))
         return list(self.all_tools.values())
     
+    def get_tools_for_servers(self, servers: FrozenSet[str]) -> Tuple[Dict[str, Any], ...]:
+        """Tools from the given servers, memoized until another server registers."""
+        tools = self._tools_by_servers.get(servers)
+        if tools is None:
+            tools = tuple(tool for tool in self.all_tools.values() if tool["server"] in servers)
+            self._tools_by_servers[servers] = tools
+        return tools
+    
+    def get_schema_json(self) -> bytes:
+        """All tools' metadata as JSON (without server instances), encoded once per registration."""
+        if self._schema_json is None:
+            self._schema_json = orjson.dumps([
+                {key: value for key, value in tool.items() if key != "server_instance"}
+                for tool in self.all_tools.values()
+            ])
+        return self._schema_json
+    
     def get_tool_info(self, tool_name: str) -> Optional[Dict[str, Any]]:
         """Get information about a specific tool."""
         return self.all_tools.get(tool_name)
@@ -2,15 +2,27 @@
 Trading Floor Orchestrator
 Coordinates the multi-agent trading system.
 """
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional
 from datetime import datetime
 import asyncio
+import time
 from core.agent_manager import AgentManager
 from core.base_agent import AgentDecision
 from tools.tool_registry import ToolRegistry
+from tools.indicators import compute_indicators, compute_indicators_batch
+from mcp_servers.risk_server import RiskServer
 from config import get_settings
 
 
+# Agent role -> key of its decision in a round result
+ROUND_KEYS = {
+    "market_analyst": "analyst",
+    "news_sentiment": "sentiment",
+    "risk_management": "risk",
+    "execution": "execution"
+}
+
+
 class TradingFloor:
     """
     Trading Floor - Main orchestrator for the agentic trading system.
@@ -23,12 +35,30 @@ class TradingFloor:
         self.settings = get_settings()
         self.is_running = False
         self.execution_rounds = 0
+        self._stop_event: Optional[asyncio.Event] = None
+        self._orchestrator = None
+        self._orchestrator_agents: tuple = ()
+        
+        # Servers are registered before the floor is built, so look the risk server up once
+        self._risk_server: Optional[RiskServer] = next(
+            (s for s in tool_registry.servers.values() if isinstance(s, RiskServer)),
+            None
+        )
     
     async def execute_round(self, symbols: List[str] = None) -> Dict[str, Any]:
         """
         Execute one round of agent reasoning and trading.
         Returns summary of decisions and actions.
         """
+        async for result in self.stream_round(symbols):
+            pass
+        return result
+    
+    async def stream_round(self, symbols: List[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        execute_round, yielding the round result again after each agent decision.
+        Pending decisions are None; the last result yielded is the complete one.
+        """
         if symbols is None:
             symbols = self.settings.default_tickers
         
@@ -41,90 +71,200 @@ class TradingFloor:
             "timestamp": datetime.now().isoformat(),
             "round": self.execution_rounds
         }
+        decisions = dict.fromkeys(ROUND_KEYS.values())
         
-        # Execute agent reasoning round
-        # Agents are run in order: Market Analyst -> News Sentiment -> Risk Management -> Execution
-        decisions = await self.agent_manager.orchestrate_round(context)
-        
-        # Extract decisions by agent role
-        analyst_decision = next((d for d in decisions if d.agent_role == "market_analyst"), None)
-        sentiment_decision = next((d for d in decisions if d.agent_role == "news_sentiment"), None)
-        risk_decision = next((d for d in decisions if d.agent_role == "risk_management"), None)
-        execution_decision = next((d for d in decisions if d.agent_role == "execution"), None)
-        
-        # Update context for execution agent (in a real system, this would be via messages)
-        if execution_decision:
-            # Re-run execution with context from other agents
-            execution_context = {
-                **context,
-                "analyst_decision": analyst_decision.__dict__ if analyst_decision else {},
-                "sentiment_decision": sentiment_decision.__dict__ if sentiment_decision else {},
-                "risk_decision": risk_decision.__dict__ if risk_decision else {}
+        def round_result() -> Dict[str, Any]:
+            return {
+                "round": context["round"] + 1,
+                "timestamp": context["timestamp"],
+                "symbol": symbol,
+                "decisions": dict(decisions),
+                "portfolio": self.agent_manager.memory().get("portfolio", {})
             }
-            # Note: In a full implementation, execution agent would have access to these via messages
-            # For simplicity, we pass via context
+        
+        # Execute agent reasoning round
+        # Market Analyst, News Sentiment and Risk Management run concurrently, then Execution
+        orchestrator = self._get_orchestrator() if self.settings.fused_reasoning else None
+        if orchestrator:
+            # The fused call returns every decision at once
+            async def fused_decisions():
+                for decision in await orchestrator.reason_fused(context):
+                    yield decision
+            decision_stream = fused_decisions()
+        else:
+            decision_stream = self.agent_manager.stream_round(context)
+        
+        async for decision in decision_stream:
+            key = ROUND_KEYS.get(decision.agent_role)
+            if key:
+                decisions[key] = decision.to_dict()
+                yield round_result()
         
         # Update portfolio prices (for positions)
-        portfolio = self.agent_manager.shared_memory.get("portfolio", {})
-        if "positions" in portfolio:
-            from mcp_servers.risk_server import RiskServer
-            risk_server = next(
-                (s for s in self.tool_registry.servers.values() if isinstance(s, RiskServer)),
-                None
-            )
-            if risk_server:
-                for symbol_pos in symbols:
-                    price_result = await self.tool_registry.call_tool(
-                        "market_data.get_latest_price",
-                        symbol=symbol_pos
-                    )
-                    if price_result.get("success"):
-                        price = price_result.get("result", {}).get("price")
-                        if price:
-                            risk_server.update_position_price(symbol_pos, price)
+        await self._update_position_prices(symbols)
+        
+        self.execution_rounds += 1
+        
+        yield round_result()
+    
+    async def execute_batch_round(self, symbols: List[str] = None) -> Dict[str, Any]:
+        """
+        Execute one round covering every symbol at once.
+        With settings.use_batch_api, each agent submits one Batch API job
+        for all symbols (cheaper, but completes asynchronously).
+        """
+        if symbols is None:
+            symbols = self.settings.default_tickers
+        
+        timestamp = datetime.now().isoformat()
+        contexts = [
+            {
+                "symbols": [symbol],
+                "symbol": symbol,
+                "timestamp": timestamp,
+                "round": self.execution_rounds
+            }
+            for symbol in symbols
+        ]
+        
+        decisions_per_symbol = await self.agent_manager.orchestrate_batch(contexts)
+        
+        await self._update_position_prices(symbols)
         
         self.execution_rounds += 1
         
+        results = {}
+        for symbol, decisions in zip(symbols, decisions_per_symbol):
+            by_role = {d.agent_role: d.to_dict() for d in decisions}
+            results[symbol] = {key: by_role.get(role) for role, key in ROUND_KEYS.items()}
+        
         return {
             "round": self.execution_rounds,
-            "timestamp": context["timestamp"],
-            "symbol": symbol,
-            "decisions": {
-                "analyst": analyst_decision.__dict__ if analyst_decision else None,
-                "sentiment": sentiment_decision.__dict__ if sentiment_decision else None,
-                "risk": risk_decision.__dict__ if risk_decision else None,
-                "execution": execution_decision.__dict__ if execution_decision else None
-            },
-            "portfolio": self.agent_manager.shared_memory.get("portfolio", {})
+            "timestamp": timestamp,
+            "symbols": symbols,
+            "decisions": results,
+            "portfolio": self.agent_manager.memory().get("portfolio", {})
         }
     
+    def _get_orchestrator(self):
+        """The fused-call orchestrator over the registered agents (if all are present), built once per agent set."""
+        agents = tuple(self.agent_manager.agents.values())
+        if agents != self._orchestrator_agents:
+            self._orchestrator_agents = agents
+            self._orchestrator = self._build_orchestrator(agents)
+        return self._orchestrator
+    
+    @staticmethod
+    def _build_orchestrator(agents):
+        """Build the fused-call orchestrator from the given agents, if all roles are present."""
+        from agents.orchestrator_agent import OrchestratorAgent
+        by_role = {agent.role.value: agent for agent in agents}
+        if not all(role in by_role for role in ("market_analyst", "news_sentiment", "execution")):
+            return None
+        return OrchestratorAgent(
+            by_role["market_analyst"],
+            by_role["news_sentiment"],
+            by_role["execution"],
+            by_role.get("risk_management")
+        )
+    
+    async def _update_position_prices(self, symbols: List[str]):
+        """Refresh position prices in the risk server for the given symbols that are held."""
+        risk_server = self._risk_server
+        if risk_server is None:
+            return
+        # Flat on these symbols: nothing to price
+        symbols = [symbol for symbol in symbols if symbol in risk_server.positions]
+        if not symbols:
+            return
+        
+        if self.tool_registry.get_tool_info("market_data.get_prices_batch"):
+            # One batched call fetches every symbol concurrently; quick successive rounds reuse it
+            batch = await self.tool_registry.call_tool_cached_result(
+                "market_data.get_prices_batch",
+                ttl=self.settings.price_cache_ttl,
+                symbols=symbols
+            )
+            prices = batch.get("prices", {})
+        else:
+            # Market data servers without the batch tool: concurrent single-symbol calls
+            results = await self.tool_registry.call_tools_batch_results([
+                ("market_data.get_latest_price", {"symbol": symbol}) for symbol in symbols
+            ], cached=True)
+            prices = dict(zip(symbols, results))
+        update_price = risk_server.update_position_price
+        for symbol_pos, price_data in prices.items():
+            price = price_data.get("price")
+            if price:
+                update_price(symbol_pos, price)
+    
     async def run_continuous(self, interval_seconds: int = 300, symbols: List[str] = None):
         """
         Run continuous trading rounds at specified interval.
+        Rounds start on a fixed schedule; a failed round is retried with exponential backoff.
         """
         self.is_running = True
+        self._stop_event = asyncio.Event()
         print(f"Trading Floor started - Executing rounds every {interval_seconds} seconds")
         
+        backoff = 0.0
         while self.is_running:
+            started = time.monotonic()
             try:
-                round_result = await self.execute_round(symbols)
-                print(f"Round {round_result['round']} completed for {round_result['symbol']}")
-                await asyncio.sleep(interval_seconds)
-            except KeyboardInterrupt:
-                print("\nTrading Floor stopped by user")
-                self.is_running = False
-                break
+                # Monitoring isn't latency-critical, so batch all symbols when the Batch API is on
+                if self.settings.use_batch_api:
+                    # Batch jobs complete asynchronously, so they get no deadline
+                    round_result = await self.execute_batch_round(symbols)
+                    print(f"Round {round_result['round']} completed for {', '.join(round_result['symbols'])}")
+                else:
+                    round_result = await asyncio.wait_for(
+                        self.execute_round(symbols),
+                        timeout=self.settings.round_timeout_seconds
+                    )
+                    print(f"Round {round_result['round']} completed for {round_result['symbol']}")
+                backoff = 0.0
+                delay = interval_seconds - (time.monotonic() - started)
             except Exception as e:
-                print(f"Error in trading round: {e}")
-                await asyncio.sleep(interval_seconds)
+                backoff = min(interval_seconds, max(1.0, backoff * 2))
+                print(f"Error in trading round ({type(e).__name__}: {e}); retrying in {backoff:.0f}s")
+                delay = backoff
+            
+            # Sleep until the next round, waking early if stop() is called
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+        print("\nTrading Floor stopped")
     
     def stop(self):
-        """Stop the trading floor."""
+        """Stop the trading floor after the current round."""
         self.is_running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
+    
+    async def warmup(self):
+        """
+        Pay one-time startup costs (kernel compilation, schema encoding) before the first round.
+        Side-effect free: no LLM calls, no trades, no notifications.
+        """
+        self.tool_registry.get_schema_json()
+        
+        # Numba kernels compile (or load from the on-disk cache) on first call; keep that off the loop
+        prices = [100.0 + i % 7 for i in range(60)]
+        indicators = ["rsi", "sma", "ema", "macd"]
+        await asyncio.to_thread(compute_indicators, prices, indicators)
+        await asyncio.to_thread(compute_indicators_batch, {"A": prices, "B": prices}, indicators)
+        
+        # Read-only tool call, so the portfolio path is imported and cached
+        await self.tool_registry.call_tool_cached("risk_portfolio.get_portfolio_value")
+    
+    async def aclose(self):
+        """Finish pending background work (agent logging) before shutdown."""
+        await self.agent_manager.aclose()
     
     def get_status(self) -> Dict[str, Any]:
         """Get current trading floor status."""
-        portfolio = self.agent_manager.shared_memory.get("portfolio", {})
+        portfolio = self.agent_manager.memory().get("portfolio", {})
         
         return {
             "is_running": self.is_running,
@@ -4,9 +4,16 @@ Real-time monitoring dashboard for the Trading Floor.
 """
 import gradio as gr
 import asyncio
+import atexit
+import functools
+import inspect
 import json
-from typing import Dict, Any, List
-from datetime import datetime
+import socket
+import threading
+import time
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from collections import deque
+from concurrent.futures import Future, wait
 from pathlib import Path
 import sys
 
@@ -19,7 +26,53 @@ from core.agent_manager import AgentManager
 from trading_floor.trading_floor import TradingFloor
 
 # Import initialization
-from main import initialize_system
+from main import initialize_system, new_event_loop
+
+
+# Local-time format of the "Last Updated" stamps
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Round result sections: (decisions key, heading, decision label, rationale length limit)
+ROUND_SECTIONS = (
+    ("analyst", "Market Analyst", "Decision", 200),
+    ("sentiment", "News & Sentiment", "Decision", 200),
+    ("risk", "Risk Management", "Decision", 200),
+    ("execution", "Execution", "Final Decision", None)
+)
+
+
+def truncate(text: str, limit: Optional[int]) -> str:
+    """Text cut to limit characters, with an ellipsis only if something was cut."""
+    if limit is None or len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+def require_initialized(handler):
+    """Initialize the system on first use before running a UI handler (sync, async or streaming)."""
+    if inspect.isasyncgenfunction(handler):
+        @functools.wraps(handler)
+        async def stream_wrapper(self, *args, **kwargs):
+            if not self.is_initialized:
+                await asyncio.to_thread(self.initialize)
+            async for item in handler(self, *args, **kwargs):
+                yield item
+        return stream_wrapper
+    
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(self, *args, **kwargs):
+            if not self.is_initialized:
+                await asyncio.to_thread(self.initialize)
+            return await handler(self, *args, **kwargs)
+        return async_wrapper
+    
+    @functools.wraps(handler)
+    def wrapper(self, *args, **kwargs):
+        if not self.is_initialized:
+            self.initialize()
+        return handler(self, *args, **kwargs)
+    return wrapper
 
 
 class TradingUI:
@@ -30,105 +83,106 @@ class TradingUI:
         self.tool_registry: ToolRegistry = None
         self.agent_manager: AgentManager = None
         self.is_initialized = False
-        self.latest_results: List[Dict[str, Any]] = []
+        self._init_lock = threading.Lock()
+        self._warmup: Optional[Future] = None
+        self.latest_results: Deque[Dict[str, Any]] = deque(maxlen=50)  # Newest first
+        
+        # One long-lived event loop in its own thread, so loop-bound HTTP pools stay warm across clicks
+        self._loop = new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ui-event-loop", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def _run(self, coro):
+        """Run a coroutine on the UI's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    async def _await(self, coro):
+        """Run a coroutine on the UI's event loop from an async Gradio handler without blocking it."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+    
+    async def _stream(self, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Iterate an async generator on the UI's event loop from an async Gradio handler."""
+        async def next_item():
+            return await anext(stream, None)
+        
+        while (item := await self._await(next_item())) is not None:
+            yield item
+    
+    def close(self):
+        """Finish background work and stop the UI's event loop."""
+        if not self._loop.is_running():
+            return
+        if self.is_initialized:
+            # Let an in-flight warmup finish rather than destroying it with the loop
+            wait((self._warmup,))
+            self._run(self.trading_floor.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
     
     def initialize(self):
         """Initialize the trading system."""
-        if not self.is_initialized:
-            self.trading_floor, self.tool_registry, self.agent_manager = initialize_system()
-            self.is_initialized = True
-            return "System initialized!"
+        # Handlers initialize lazily from worker threads; only the first one builds the system
+        with self._init_lock:
+            if not self.is_initialized:
+                self.trading_floor, self.tool_registry, self.agent_manager = initialize_system()
+                self.is_initialized = True
+                # Warm up in the background; the first round just finds things already compiled
+                self._warmup = asyncio.run_coroutine_threadsafe(self.trading_floor.warmup(), self._loop)
+                return "System initialized! Warming up in the background."
         return "System already initialized"
     
-    async def execute_round_async(self, symbols_str: str):
-        """Execute a trading round asynchronously."""
-        if not self.is_initialized:
-            self.initialize()
-        
+    @require_initialized
+    async def execute_round_async(self, symbols_str: str) -> AsyncIterator[str]:
+        """Execute a trading round, streaming the result as each agent decides."""
         symbols = [s.strip().upper() for s in symbols_str.split(",") if s.strip()]
         if not symbols:
             symbols = None
         
-        result = await self.trading_floor.execute_round(symbols)
-        self.latest_results.insert(0, result)  # Add to front
-        if len(self.latest_results) > 50:  # Keep last 50
-            self.latest_results = self.latest_results[:50]
-        
-        return self._format_round_result(result)
-    
-    def execute_round(self, symbols_str: str):
-        """Execute a trading round (synchronous wrapper)."""
-        return asyncio.run(self.execute_round_async(symbols_str))
+        async for result in self._stream(self.trading_floor.stream_round(symbols)):
+            yield self._format_round_result(result)
+        self.latest_results.appendleft(result)
     
     def _format_round_result(self, result: Dict[str, Any]) -> str:
         """Format round result for display."""
-        output = []
-        output.append(f"## Round {result['round']} - {result['symbol']}")
-        output.append(f"**Timestamp:** {result['timestamp']}\n")
-        
         decisions = result['decisions']
-        
-        # Market Analyst
-        if decisions['analyst']:
-            a = decisions['analyst']
-            output.append(f"### Market Analyst")
-            output.append(f"- **Decision:** {a.get('decision', 'N/A').upper()}")
-            output.append(f"- **Confidence:** {a.get('confidence', 0):.2%}")
-            output.append(f"- **Rationale:** {a.get('rationale', 'N/A')[:200]}...\n")
-        
-        # News Sentiment
-        if decisions['sentiment']:
-            s = decisions['sentiment']
-            output.append(f"### News & Sentiment")
-            output.append(f"- **Decision:** {s.get('decision', 'N/A').upper()}")
-            output.append(f"- **Confidence:** {s.get('confidence', 0):.2%}")
-            output.append(f"- **Rationale:** {s.get('rationale', 'N/A')[:200]}...\n")
-        
-        # Risk Management
-        if decisions['risk']:
-            r = decisions['risk']
-            output.append(f"### Risk Management")
-            output.append(f"- **Decision:** {r.get('decision', 'N/A').upper()}")
-            output.append(f"- **Confidence:** {r.get('confidence', 0):.2%}")
-            output.append(f"- **Rationale:** {r.get('rationale', 'N/A')[:200]}...\n")
-        
-        # Execution
-        if decisions['execution']:
-            e = decisions['execution']
-            output.append(f"### Execution")
-            output.append(f"- **Final Decision:** {e.get('decision', 'N/A').upper()}")
-            output.append(f"- **Confidence:** {e.get('confidence', 0):.2%}")
-            output.append(f"- **Rationale:** {e.get('rationale', 'N/A')}\n")
-        
-        return "\n".join(output)
+        sections = [
+            f"### {title}\n"
+            f"- **{label}:** {d.get('decision', 'N/A').upper()}\n"
+            f"- **Confidence:** {d.get('confidence', 0):.2%}\n"
+            f"- **Rationale:** {truncate(d.get('rationale', 'N/A'), limit)}\n"
+            for key, title, label, limit in ROUND_SECTIONS
+            if (d := decisions[key])
+        ]
+        return "\n".join([
+            f"## Round {result['round']} - {result['symbol']}",
+            f"**Timestamp:** {result['timestamp']}\n",
+            *sections
+        ])
     
-    def get_portfolio_status(self):
+    @require_initialized
+    async def get_portfolio_status(self):
         """Get current portfolio status."""
-        if not self.is_initialized:
-            return "System not initialized. Click 'Initialize System' first."
-        
-        portfolio_result = asyncio.run(
+        portfolio_result = await self._await(
             self.tool_registry.call_tool("risk_portfolio.get_portfolio_value")
         )
         
-        if portfolio_result.get("success"):
-            portfolio_data = portfolio_result["result"]
+        if portfolio_result.success:
+            portfolio_data = portfolio_result.result
             return f"""## Portfolio Status
 
 **Cash:** ${portfolio_data.get('cash', 0):,.2f}
 **Positions Value:** ${portfolio_data.get('positions_value', 0):,.2f}
 **Total Value:** ${portfolio_data.get('total_value', 0):,.2f}
 
-**Last Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+**Last Updated:** {time.strftime(TIMESTAMP_FORMAT)}
 """
         else:
             return "Error retrieving portfolio status."
     
+    @require_initialized
     def get_agent_statuses(self):
         """Get status of all agents."""
-        if not self.is_initialized:
-            return "System not initialized. Click 'Initialize System' first."
-        
         statuses = self.agent_manager.get_agent_statuses()
         
         # Also get total decisions from all agents
@@ -146,12 +200,11 @@ class TradingUI:
         
         return "\n".join(output)
     
+    @require_initialized
     def get_system_info(self):
         """Get system information."""
-        if not self.is_initialized:
-            return "System not initialized."
-        
         floor_status = self.trading_floor.get_status()
+        settings = get_settings()
         
         info = f"""## System Information
 
@@ -160,12 +213,13 @@ class TradingUI:
 - **Execution Rounds:** {floor_status['execution_rounds']}
 - **Tools Count:** {floor_status['tools_count']}
 - **Servers Count:** {floor_status['servers_count']}
+- **Warmup:** {'Done' if self._warmup is None or self._warmup.done() else 'Running'}
 
 ### Configuration
-- **Paper Trading:** {get_settings().paper_trading}
-- **Initial Capital:** ${get_settings().initial_capital:,.2f}
-- **Max Position Size:** {get_settings().max_position_size:.1%}
-- **Risk Per Trade:** {get_settings().risk_per_trade:.1%}
+- **Paper Trading:** {settings.paper_trading}
+- **Initial Capital:** ${settings.initial_capital:,.2f}
+- **Max Position Size:** {settings.max_position_size:.1%}
+- **Risk Per Trade:** {settings.risk_per_trade:.1%}
 """
         return info
 
@@ -198,10 +252,12 @@ def create_ui():
             
             round_output = gr.Markdown(label="Round Results")
             
+            # Rounds share one trading floor (message bus, round counter), so run them one at a time
             execute_btn.click(
-                fn=ui.execute_round,
+                fn=ui.execute_round_async,
                 inputs=symbols_input,
-                outputs=round_output
+                outputs=round_output,
+                concurrency_limit=1
             )
         
         with gr.Tab("Portfolio"):
@@ -240,26 +296,37 @@ def create_ui():
         - **Paper Trading:** All trades are simulated
         """)
     
+    # Queue requests so several users' status refreshes overlap instead of serializing
+    demo.queue(default_concurrency_limit=4, max_size=32)
     return demo
 
 
+def port_free(port: int, host: str = "127.0.0.1") -> bool:
+    """Whether a TCP port can be bound on the host right now."""
+    with socket.socket() as sock:
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+
 def launch_ui():
     """Launch the Gradio UI."""
     import os
-    demo = create_ui()
     # Check for environment variable, otherwise try 7860, fallback to 7861
     port = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
     
-    # Try the requested port, fallback to next available
-    for attempt_port in [port, 7861, 7862, 7863]:
-        try:
-            print(f"Attempting to launch on port {attempt_port}...")
-            demo.launch(server_name="127.0.0.1", server_port=attempt_port, share=False, theme=gr.themes.Soft())
-            break
-        except OSError as e:
-            if attempt_port == 7863:  # Last attempt
-                raise e
-            print(f"Port {attempt_port} in use, trying next port...")
+    # Probe ports with a plain bind so a busy one never costs a Gradio startup
+    candidates = [port, 7861, 7862, 7863]
+    chosen_port = next((p for p in candidates if port_free(p)), None)
+    if chosen_port is None:
+        raise OSError(f"No free port among {candidates}")
+    if chosen_port != port:
+        print(f"Port {port} in use, using port {chosen_port}...")
+    
+    demo = create_ui()
+    demo.launch(server_name="127.0.0.1", server_port=chosen_port, share=False, max_threads=16, theme=gr.themes.Soft())
 
 
 if __name__ == "__main__":